@@ -7,16 +7,29 @@ from aiogram.client.default import DefaultBotProperties
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.fsm.storage.redis import RedisStorage, DefaultKeyBuilder
 from aiogram.types import BotCommand, BotCommandScopeAllPrivateChats
+from redis.asyncio import Redis
 
-from infrastructure.database.setup import create_session_pool
+from infrastructure.database.cache import TTLCache
+from infrastructure.database.setup import create_engine, create_session_pool, check_schema_version
 from tgbot.config import load_config, Config
 from tgbot.handlers import routers_list
 from tgbot.middlewares.config import ConfigMiddleware
+from tgbot.middlewares.database import DatabaseMiddleware
 from tgbot.services import broadcaster
+from tgbot.services.catalog import ProductCatalog
+from tgbot.services.invite_links import InviteLinkPool
+from tgbot.services.mailing import MailingWorker, PeakHours
+from tgbot.services.mailing_queue import MailingQueue, QueuedMailingWorker
+from tgbot.services.payment_checker import PaymentChecker
+from tgbot.services.rate_limiter import TokenBucket, RedisTokenBucket
+from tgbot.services.reconciler import PaymentReconciler
+from tgbot.services.request_scheduler import RequestScheduler
+from tgbot.services.sender import BroadcastSender
+from tgbot.utils.payment_utils import Payment
 
 
-async def on_startup(bot: Bot, admin_ids: list[int]):
-    await broadcaster.broadcast(bot, admin_ids, "Бот был запущен!")
+async def on_startup(bot: Bot, admin_ids: list[int], sender: BroadcastSender = None):
+    await broadcaster.broadcast(bot, admin_ids, "Бот был запущен!", sender=sender)
 
 
 async def set_default_commands(bot):
@@ -27,7 +40,8 @@ async def set_default_commands(bot):
         scope=BotCommandScopeAllPrivateChats()
     )
 
-def register_global_middlewares(dp: Dispatcher, config: Config, session_pool=None):
+def register_global_middlewares(dp: Dispatcher, config: Config, session_pool=None, user_cache=None,
+                                scenario_cache=None):
     """
     Register global middlewares for the given dispatcher.
     Global middlewares here are the ones that are applied to all the handlers (you specify the type of update)
@@ -36,11 +50,13 @@ def register_global_middlewares(dp: Dispatcher, config: Config, session_pool=Non
     :type dp: Dispatcher
     :param config: The configuration object from the loaded configuration.
     :param session_pool: Optional session pool object for the database using SQLAlchemy.
+    :param user_cache: Optional process-wide user existence cache shared by all repositories.
+    :param scenario_cache: Optional process-wide cache of compiled deeplink scenarios.
     :return: None
     """
     middleware_types = [
         ConfigMiddleware(config),
-        # DatabaseMiddleware(session_pool),
+        DatabaseMiddleware(session_pool, user_cache, scenario_cache),
     ]
 
     for middleware_type in middleware_types:
@@ -48,6 +64,62 @@ def register_global_middlewares(dp: Dispatcher, config: Config, session_pool=Non
         dp.callback_query.outer_middleware(middleware_type)
 
 
+def create_api_limiter(config: Config, redis: Redis = None):
+    """
+    Global Bot API budget of the process. With MAILING_MODE=redis it is a Redis bucket shared
+    with the mailing_worker.py processes, so bot and worker traffic together stay within API_RATE.
+    """
+    if redis is None:
+        return TokenBucket(rate=config.request_scheduler.rate)
+    return RedisTokenBucket(redis, rate=config.request_scheduler.rate, key=RequestScheduler.shared_limiter_key)
+
+
+def create_mailing_worker(config: Config, bot: Bot, session_pool, redis: Redis = None,
+                          user_cache: TTLCache = None) -> MailingWorker:
+    """
+    Builds the mailing worker with its sender.
+
+    With MAILING_MODE=redis the rate limit lives in Redis and is shared with the separate
+    `mailing_worker.py` processes, and the bot process only queues recipient batches for them.
+    """
+    if redis is not None:
+        limiter = RedisTokenBucket(redis, rate=config.mailing.rate)
+    else:
+        limiter = TokenBucket(rate=config.mailing.rate)
+    sender = BroadcastSender(
+        limiter,
+        concurrency=config.mailing.concurrency,
+        max_retries=config.mailing.max_retries,
+    )
+    peak_hours = None
+    if config.mailing.peak_hours_enabled:
+        peak_hours = PeakHours(
+            start=config.mailing.peak_start,
+            end=config.mailing.peak_end,
+            rate_factor=config.mailing.peak_rate_factor,
+            large_job_size=config.mailing.large_job_size,
+            timezone=config.mailing.timezone,
+        )
+        logging.info(
+            f"Mailing peak hours: {peak_hours.start}:00-{peak_hours.end}:00 {peak_hours.timezone}, "
+            f"jobs from {peak_hours.large_job_size} recipients at {peak_hours.rate_factor:.0%} of the rate"
+        )
+    worker_kwargs = dict(
+        batch_size=config.mailing.batch_size,
+        poll_interval=config.mailing.poll_interval,
+        progress_interval=config.mailing.progress_interval,
+        reports_dir=config.mailing.reports_dir,
+        report_retention_days=config.mailing.report_retention_days,
+        peak_hours=peak_hours,
+        user_cache=user_cache,
+    )
+    if redis is not None:
+        return QueuedMailingWorker(
+            bot, session_pool, sender, MailingQueue(redis), max_backlog=config.mailing.max_backlog, **worker_kwargs
+        )
+    return MailingWorker(bot, session_pool, sender, **worker_kwargs)
+
+
 def setup_logging():
     """
     Set up logging configuration for the application.
@@ -100,17 +172,91 @@ async def main():
     config = load_config(".env")
     storage = get_storage(config)
 
+    engine = create_engine(config.db)
+    await check_schema_version(engine)
+    session_pool = create_session_pool(engine)
+    user_cache = TTLCache(
+        maxsize=config.cache.user_cache_size,
+        ttl=config.cache.user_cache_ttl,
+        enabled=config.cache.user_cache_enabled,
+    )
+    scenario_cache = TTLCache(
+        maxsize=config.cache.scenario_cache_size,
+        ttl=config.cache.scenario_cache_ttl,
+    )
+
+    catalog = ProductCatalog(session_pool, config.cache.catalog_refresh_interval)
+    await catalog.start()
+
     bot = Bot(token=config.tg_bot.token, default=DefaultBotProperties(parse_mode='HTML'))
-    dp = Dispatcher(storage=storage)
+    redis = Redis.from_url(config.redis.dsn(), decode_responses=True) \
+        if config.mailing.mode == "redis" else None
+    request_scheduler = RequestScheduler(
+        rate=config.request_scheduler.rate,
+        per_chat_rate=config.request_scheduler.per_chat_rate,
+        per_chat_burst=config.request_scheduler.per_chat_burst,
+        exempt_chats=[*config.tg_bot.admin_ids, config.tg_bot.channel_id],
+        limiter=create_api_limiter(config, redis),
+    )
+    bot.session.middleware(request_scheduler)
+    mailing_worker = create_mailing_worker(config, bot, session_pool, redis, user_cache)
+    sender = mailing_worker.sender
+    # One client per process, so all payment calls share its connection pool
+    payment = Payment(
+        config.payment.terminal_key,
+        config.payment.password,
+        timeout=config.payment.timeout,
+        deadline=config.payment.deadline,
+    )
+    invite_links = InviteLinkPool(
+        bot,
+        session_pool,
+        config.tg_bot.channel_id,
+        size=config.invite_links.pool_size,
+        low_watermark=config.invite_links.low_watermark,
+        refill_interval=config.invite_links.refill_interval,
+    )
+    reconciler = PaymentReconciler(
+        bot,
+        config,
+        session_pool,
+        payment,
+        invite_links,
+        interval=config.payment.reconcile_interval,
+        max_age_hours=config.payment.reconcile_max_age_hours,
+        concurrency=config.payment.reconcile_concurrency,
+    )
+    payment_checker = PaymentChecker(
+        bot, config, session_pool, payment, invite_links, cache_ttl=config.payment.check_cache_ttl
+    )
+    dp = Dispatcher(storage=storage, catalog=catalog, mailing_worker=mailing_worker, sender=sender,
+                    request_scheduler=request_scheduler, payment=payment, payment_checker=payment_checker,
+                    invite_links=invite_links)
 
     dp.include_routers(*routers_list)
 
-    register_global_middlewares(dp, config)
+    register_global_middlewares(dp, config, session_pool, user_cache, scenario_cache)
 
-    await create_session_pool(config.db)
-    await on_startup(bot, config.tg_bot.admin_ids)
+    await on_startup(bot, config.tg_bot.admin_ids, sender)
     await set_default_commands(bot)
-    await dp.start_polling(bot)
+    await mailing_worker.start()
+    await invite_links.start()
+    await reconciler.start()
+    try:
+        await dp.start_polling(bot)
+    finally:
+        await reconciler.stop()
+        await payment_checker.stop()
+        await invite_links.stop()
+        await mailing_worker.stop()
+        logging.info(f"User cache stats: {user_cache.stats()}")
+        logging.info(f"Request lanes: {request_scheduler.stats()}")
+        await request_scheduler.close()
+        await payment.close()
+        await catalog.stop()
+        await engine.dispose()
+        if redis is not None:
+            await redis.aclose()
 
 
 if __name__ == "__main__":
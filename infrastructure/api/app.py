@@ -3,10 +3,16 @@ import logging
 import betterlogging as bl
 import fastapi
 from aiogram import Bot
-from fastapi import FastAPI
-from starlette.responses import JSONResponse
+from fastapi import FastAPI, BackgroundTasks
+from starlette.responses import JSONResponse, PlainTextResponse
 
+from infrastructure.database.models import MailingStatus
+from infrastructure.database.repo.requests import RequestsRepo
+from infrastructure.database.setup import create_engine, create_session_pool
 from tgbot.config import load_config, Config
+from tgbot.services.access import deliver_access
+from tgbot.services.invite_links import InviteLinkPool
+from tgbot.utils.payment_utils import Payment
 
 app = FastAPI()
 log_level = logging.INFO
@@ -15,8 +21,109 @@ log = logging.getLogger(__name__)
 
 config: Config = load_config(".env")
 bot = Bot(token=config.tg_bot.token)
+session_pool = create_session_pool(create_engine(config.db))
+payment = Payment(config.payment.terminal_key, config.payment.password)
+# Only issues links here; the bot process refills the pool
+invite_links = InviteLinkPool(bot, session_pool, config.tg_bot.channel_id)
 
 
 @app.post("/api")
 async def webhook_endpoint(request: fastapi.Request):
     return JSONResponse(status_code=200, content={"status": "ok"})
+
+
+@app.post("/webhook/tinkoff", response_class=PlainTextResponse)
+async def tinkoff_notification(request: fastapi.Request, background_tasks: BackgroundTasks):
+    """
+    HTTP notifications of Tinkoff acquiring (NotificationURL of the terminal).
+
+    A signed CONFIRMED notification marks the purchase paid; the invite and the admin
+    notification are sent after the response. The pending invite is recorded in the database,
+    so if this process fails to send it, the bot's reconciler does. Tinkoff repeats a notification until it gets "OK",
+    so repeats and notifications for purchases that are already paid are answered "OK" and
+    change nothing.
+    """
+    try:
+        data = await request.json()
+    except ValueError:
+        log.warning("Rejected payment notification: body is not JSON")
+        return PlainTextResponse("Bad request", status_code=400)
+    if not isinstance(data, dict):
+        log.warning("Rejected payment notification: body is not a JSON object")
+        return PlainTextResponse("Bad request", status_code=400)
+
+    if not payment.verify_notification(data):
+        log.warning(f"Rejected payment notification for order {data.get('OrderId')}: bad token")
+        return PlainTextResponse("Invalid token", status_code=403)
+
+    if data.get("Status") != "CONFIRMED" or not data.get("Success"):
+        return PlainTextResponse("OK")
+
+    # The notification is signed, so malformed fields will not get better on a repeat: log and answer "OK"
+    try:
+        order_id = int(data["OrderId"])
+        payment_id = int(data["PaymentId"])
+        amount = int(data["Amount"])
+    except (KeyError, TypeError, ValueError):
+        log.error(f"Malformed payment notification: OrderId {data.get('OrderId')!r}, "
+                  f"PaymentId {data.get('PaymentId')!r}, Amount {data.get('Amount')!r}")
+        return PlainTextResponse("OK")
+
+    async with session_pool() as session:
+        repo = RequestsRepo(session)
+        purchase = await repo.purchases.get_purchase_by_id(order_id)
+        if purchase is None:
+            log.error(f"Payment notification for unknown order {order_id}")
+            return PlainTextResponse("OK")
+        if payment_id != purchase.payment_id:
+            log.error(f"Payment notification for order {purchase.id}: payment {payment_id} "
+                      f"does not match {purchase.payment_id}")
+            return PlainTextResponse("OK")
+        if amount != purchase.amount * 100:
+            log.error(f"Payment notification for order {purchase.id}: amount {amount} "
+                      f"does not match {purchase.amount * 100}")
+            return PlainTextResponse("OK")
+
+        paid = await repo.purchases.mark_paid(purchase.id)
+        user = await repo.users.get_user_by_id(purchase.user_id) if paid else None
+        await session.commit()
+
+    if paid:
+        log.info(f"Purchase {paid.id} paid (notification, payment {payment_id})")
+        background_tasks.add_task(deliver_access, bot, config, session_pool, invite_links, paid,
+                                  user.username if user else None)
+    return PlainTextResponse("OK")
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def mailing_metrics():
+    """
+    Progress of recent mailings in the Prometheus text format.
+    Counters and the send rate are the ones the mailing worker checkpoints after every batch.
+    """
+    async with session_pool() as session:
+        mailings = await RequestsRepo(session).mailings.get_recent_mailings()
+
+    metrics = {
+        "mailing_sent": ("Messages delivered", lambda m: m.success),
+        "mailing_failed": ("Recipients that could not be reached", lambda m: m.failed),
+        "mailing_retried": ("Recipients re-queued after a flood wait", lambda m: m.retried),
+        "mailing_remaining": (
+            "Recipients left to process",
+            lambda m: max((m.total or 0) - m.success - m.failed, 0),
+        ),
+        "mailing_send_rate": ("Messages per second at the last checkpoint", lambda m: m.send_rate or 0),
+        "mailing_eta_seconds": (
+            "Estimated seconds until the mailing is done",
+            lambda m: max((m.total or 0) - m.success - m.failed, 0) / m.send_rate
+            if m.status == MailingStatus.RUNNING and m.send_rate else 0,
+        ),
+    }
+
+    lines = []
+    for name, (description, value) in metrics.items():
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} gauge")
+        for mailing in mailings:
+            lines.append(f'{name}{{mailing_id="{mailing.id}",status="{mailing.status}"}} {value(mailing)}')
+    return PlainTextResponse("\n".join(lines) + "\n")
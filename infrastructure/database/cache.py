@@ -0,0 +1,72 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class TTLCache:
+    """
+    Bounded in-memory cache with a per-entry TTL and LRU eviction.
+
+    The cache lives in one process only, so entries are kept short-lived and every
+    write path that can change the cached value must call invalidate().
+
+    Attributes:
+        maxsize (int): Maximum number of entries, the least recently used one is evicted first.
+        ttl (float): Entry lifetime in seconds.
+        enabled (bool): When False every lookup is a miss and nothing is stored.
+        hits (int): Number of lookups served from the cache.
+        misses (int): Number of lookups that fell through to the caller.
+    """
+
+    def __init__(self, maxsize: int = 10_000, ttl: float = 300, enabled: bool = True) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        if not self.enabled:
+            return default
+
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return default
+
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if not self.enabled:
+            return
+
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def __len__(self) -> int:
+        return len(self._data)
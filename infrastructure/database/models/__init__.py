@@ -4,3 +4,5 @@ from .products import Product
 from .purchases import Purchase
 from .deeplink import Deeplink
 from .lessons import Lesson
+from .mailings import Mailing, MailingStatus
+from .invite_links import InviteLink
@@ -1,6 +1,5 @@
 from sqlalchemy import Integer, String, JSON
-from sqlalchemy.orm import Mapped
-from sqlalchemy.testing.schema import mapped_column
+from sqlalchemy.orm import Mapped, mapped_column
 
 from .base import Base, TimestampMixin, TableNameMixin
 
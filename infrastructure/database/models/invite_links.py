@@ -0,0 +1,29 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import BIGINT, String, TIMESTAMP, Index, text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import Base, TimestampMixin
+
+
+class InviteLink(Base, TimestampMixin):
+    """
+    Single-use invite link to a channel, created ahead of time by the invite link pool.
+    A link is free while `user_id` is empty; issuing it records who got it and when.
+    `user_id` has no foreign key: credit approvals may go to chats that never started the bot.
+    """
+    __tablename__ = "invite_links"
+    __table_args__ = (
+        # Свободные ссылки пула: выдача и подсчёт смотрят только на них
+        Index('ix_invite_links_free', 'chat_id', 'id', postgresql_where=text('user_id IS NULL')),
+    )
+
+    id: Mapped[int] = mapped_column(BIGINT, primary_key=True, autoincrement=True)
+    chat_id: Mapped[int] = mapped_column(BIGINT, nullable=False)
+    link: Mapped[str] = mapped_column(String, nullable=False, unique=True)
+    user_id: Mapped[Optional[int]] = mapped_column(BIGINT, nullable=True, index=True)
+    issued_at: Mapped[Optional[datetime]] = mapped_column(TIMESTAMP, nullable=True)
+
+    def __repr__(self):
+        return f"<InviteLink {self.id} {self.chat_id} {self.user_id}>"
@@ -7,7 +7,7 @@ from .base import Base, TimestampMixin, TableNameMixin
 
 class Lesson(Base, TimestampMixin, TableNameMixin):
     id: Mapped[int] = mapped_column(BIGINT, primary_key=True, autoincrement=True)
-    user_id: Mapped[int] = mapped_column(BIGINT, ForeignKey('users.id'), nullable=False)
+    user_id: Mapped[int] = mapped_column(BIGINT, ForeignKey('users.id'), nullable=False, unique=True)
     lesson_number: Mapped[int] = mapped_column(Integer, nullable=False)
     completed_at: Mapped[Optional[str]] = mapped_column(TIMESTAMP, default=func.now())
 
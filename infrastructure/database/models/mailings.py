@@ -0,0 +1,50 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import BIGINT, Float, Integer, String, JSON, TIMESTAMP, text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import Base, TimestampMixin, TableNameMixin
+
+
+class MailingStatus:
+    SCHEDULED = "scheduled"
+    RUNNING = "running"
+    PAUSED = "paused"
+    CANCELLED = "cancelled"
+    DONE = "done"
+
+
+class Mailing(Base, TimestampMixin, TableNameMixin):
+    """
+    Persistent mailing job. Recipients are processed in users.id order and `cursor`
+    holds the last processed id, so a job resumes after a restart where it stopped.
+
+    The content is the admin's own message (or album): `source_chat_id` and `source_message_ids`
+    point at it and it is copied to every recipient.
+    """
+    id: Mapped[int] = mapped_column(BIGINT, primary_key=True, autoincrement=True)
+    status: Mapped[str] = mapped_column(String(16), nullable=False, server_default=text("'running'"))
+    created_by: Mapped[int] = mapped_column(BIGINT, nullable=False)
+
+    content_type: Mapped[str] = mapped_column(String(32), nullable=False)
+    buttons: Mapped[Optional[list]] = mapped_column(JSON, nullable=True)
+    source_chat_id: Mapped[Optional[int]] = mapped_column(BIGINT, nullable=True)
+    source_message_ids: Mapped[Optional[list]] = mapped_column(JSON, nullable=True)
+
+    audience: Mapped[str] = mapped_column(String(16), nullable=False)
+    private_user_id: Mapped[Optional[int]] = mapped_column(BIGINT, nullable=True)
+
+    cursor: Mapped[int] = mapped_column(BIGINT, nullable=False, server_default=text("0"))
+    success: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
+    failed: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
+    retried: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
+    total: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    send_rate: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    status_message_id: Mapped[Optional[int]] = mapped_column(BIGINT, nullable=True)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(TIMESTAMP, nullable=True)
+    # UTC; задание в статусе scheduled переводится в running, когда наступает это время
+    scheduled_at: Mapped[Optional[datetime]] = mapped_column(TIMESTAMP, nullable=True)
+
+    def __repr__(self):
+        return f"<Mailing {self.id} {self.status} {self.audience} cursor={self.cursor}>"
@@ -1,19 +1,37 @@
-from sqlalchemy import BIGINT, Integer, ForeignKey, String, Boolean, Sequence
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import BIGINT, Integer, ForeignKey, String, Boolean, Sequence, Index, TIMESTAMP, text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from .base import Base, TimestampMixin, TableNameMixin
 
 
 class Purchase(Base, TimestampMixin, TableNameMixin):
+    __table_args__ = (
+        # Частичный индекс: в выборках оплаченных покупок участвуют только is_paid = true
+        Index('ix_purchases_paid_user_id', 'user_id', postgresql_where=text('is_paid')),
+        # Сверка платежей: неоплаченные покупки с созданным платежом, по давности
+        Index('ix_purchases_unpaid_created_at', 'created_at',
+              postgresql_where=text('NOT is_paid AND payment_id IS NOT NULL')),
+        # Повторная выдача доступа: оплаченные покупки, которым ещё не отправлено приглашение
+        Index('ix_purchases_undelivered_created_at', 'created_at',
+              postgresql_where=text('is_paid AND access_sent_at IS NULL')),
+    )
+
     id: Mapped[int] = mapped_column(BIGINT, primary_key=True,
                                     autoincrement=True,
                                     default=Sequence('purchase_id_seq', start=75))
     payment_id: Mapped[int] = mapped_column(BIGINT, nullable=True)
-    user_id: Mapped[int] = mapped_column(BIGINT, ForeignKey('users.id'), nullable=False)
+    user_id: Mapped[int] = mapped_column(BIGINT, ForeignKey('users.id'), nullable=False, index=True)
     product_id: Mapped[int] = mapped_column(BIGINT, ForeignKey('products.id'), nullable=False)
     link: Mapped[str] = mapped_column(String, nullable=True)
     amount: Mapped[int] = mapped_column(Integer, nullable=False)
     is_paid: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
+    # Приглашение в канал отправлено; пока NULL у оплаченной покупки, сверка повторяет выдачу
+    access_sent_at: Mapped[Optional[datetime]] = mapped_column(TIMESTAMP, nullable=True)
+    # Выдачу взял процесс; по истечении аренды (см. access.delivery_lease) её может взять другой
+    delivery_claimed_at: Mapped[Optional[datetime]] = mapped_column(TIMESTAMP, nullable=True)
 
     def __repr__(self):
         return f"<Purchase {self.id} {self.user_id} {self.product_id} {self.amount}>"
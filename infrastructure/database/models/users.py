@@ -1,6 +1,7 @@
+from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import String, BIGINT, Boolean
+from sqlalchemy import String, BIGINT, Boolean, TIMESTAMP, text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from .base import Base, TimestampMixin, TableNameMixin
@@ -10,8 +11,11 @@ class User(Base, TimestampMixin, TableNameMixin):
     id: Mapped[int] = mapped_column(BIGINT, primary_key=True, autoincrement=False)
     full_name: Mapped[str] = mapped_column(String)
     username: Mapped[Optional[str]] = mapped_column(String(128))
-    deeplink: Mapped[int] = mapped_column(BIGINT, nullable=True)
+    deeplink: Mapped[int] = mapped_column(BIGINT, nullable=True, index=True)
     is_premium: Mapped[bool] = mapped_column(Boolean, nullable=True)
+    # False, когда бот заблокирован пользователем или чат не найден; такие пользователи не попадают в рассылки
+    is_active: Mapped[bool] = mapped_column(Boolean, nullable=False, server_default=text("true"))
+    deactivated_at: Mapped[Optional[datetime]] = mapped_column(TIMESTAMP, nullable=True)
 
     def __repr__(self):
         return f"<User {self.id} {self.username}>"
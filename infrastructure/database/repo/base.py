@@ -5,6 +5,9 @@ class BaseRepo:
     """
     A class representing a base repository for handling database operations.
 
+    Repositories never commit: the transaction belongs to whoever owns the session
+    (DatabaseMiddleware for updates), so an update is committed or rolled back once.
+
     Attributes:
         session (AsyncSession): The database session used by the repository.
 
@@ -1,13 +1,21 @@
-from typing import Optional, List
+from typing import Optional, List, Tuple
 
+from sqlalchemy import Text, cast, func
 from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.future import select
 
+from infrastructure.database.cache import TTLCache
 from infrastructure.database.models.deeplink import Deeplink
 from infrastructure.database.repo.base import BaseRepo
 
 
 class DeeplinkRepo(BaseRepo):
+    def __init__(self, session, cache: Optional[TTLCache] = None):
+        super().__init__(session)
+        # Кэш скомпилированных сценариев по id диплинка: (версия, сценарий).
+        # Сбрасывается при изменении диплинка в этом процессе, правки из других процессов ловит версия
+        self.cache = cache
+
     async def create_deeplink(self, source: str, target: str, link: Optional[str] = None) -> Deeplink:
         insert_stmt = (
             insert(Deeplink)
@@ -15,8 +23,6 @@ class DeeplinkRepo(BaseRepo):
             .returning(Deeplink)
         )
         result = await self.session.execute(insert_stmt)
-
-        await self.session.commit()
         return result.scalar_one()
 
     async def get_deeplink_by_id(self, deeplink_id: int) -> Optional[Deeplink]:
@@ -25,32 +31,60 @@ class DeeplinkRepo(BaseRepo):
         )
         return result.scalar_one_or_none()  # Avoids exception handling manually
 
+    @staticmethod
+    def _scenario_version():
+        return func.md5(cast(Deeplink.scenario, Text))
+
+    async def get_scenario_version(self, deeplink_id: int) -> Optional[str]:
+        """
+        Версия сценария - md5 его JSON, считается в базе: для проверки кэша не читается сам сценарий.
+        None, если диплинка нет.
+        """
+        result = await self.session.execute(
+            select(self._scenario_version()).where(Deeplink.id == deeplink_id)
+        )
+        return result.scalar_one_or_none()
+
+    async def get_deeplink_with_version(self, deeplink_id: int) -> Optional[Tuple[Deeplink, str]]:
+        """Диплинк вместе с версией сценария (см. get_scenario_version)"""
+        result = await self.session.execute(
+            select(Deeplink, self._scenario_version()).where(Deeplink.id == deeplink_id)
+        )
+        row = result.one_or_none()
+        return (row[0], row[1]) if row else None
+
     async def get_all_deeplinks(self) -> List[Deeplink]:
         result = await self.session.execute(select(Deeplink))
         return result.scalars().all()
 
-    async def update_deeplink(self, deeplink_id: int, source: Optional[str] = None, target: Optional[str] = None, link: Optional[str] = None) -> Optional[Deeplink]:
-        async with self.session.begin():
-            deeplink = await self.get_deeplink_by_id(deeplink_id)
-            if deeplink:
-                if source is not None:
-                    deeplink.source = source
-                if target is not None:
-                    deeplink.target = target
-                if link is not None:
-                    deeplink.link = link
-                await self.session.commit()
-                return deeplink
+    async def update_deeplink(self, deeplink_id: int, source: Optional[str] = None, target: Optional[str] = None, link: Optional[str] = None, scenario: Optional[dict] = None) -> Optional[Deeplink]:
+        if self.cache is not None:
+            self.cache.invalidate(deeplink_id)
+
+        deeplink = await self.get_deeplink_by_id(deeplink_id)
+        if deeplink:
+            if source is not None:
+                deeplink.source = source
+            if target is not None:
+                deeplink.target = target
+            if link is not None:
+                deeplink.link = link
+            if scenario is not None:
+                deeplink.scenario = scenario
+            await self.session.flush()
+            return deeplink
         return None
 
     async def delete_deeplink(self, deeplink_id: int) -> bool:
-        async with self.session.begin():
-            result = await self.session.execute(
-                select(Deeplink).where(Deeplink.id == deeplink_id)
-            )
-            deeplink = result.scalar_one_or_none()
-            if deeplink:
-                await self.session.delete(deeplink)
-                await self.session.commit()
-                return True
+        if self.cache is not None:
+            self.cache.invalidate(deeplink_id)
+
+        result = await self.session.execute(
+            select(Deeplink).where(Deeplink.id == deeplink_id)
+        )
+        deeplink = result.scalar_one_or_none()
+        if deeplink:
+            await self.session.delete(deeplink)
+            await self.session.flush()
+            return True
         return False
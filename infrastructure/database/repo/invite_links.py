@@ -0,0 +1,67 @@
+from typing import Optional, List
+
+from sqlalchemy import update, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.future import select
+
+from infrastructure.database.models.invite_links import InviteLink
+from infrastructure.database.repo.base import BaseRepo
+
+
+class InviteLinkRepo(BaseRepo):
+    async def add_links(self, chat_id: int, links: List[str]) -> None:
+        """Добавление свободных ссылок в пул"""
+        if not links:
+            return
+        await self.session.execute(
+            insert(InviteLink).values([{"chat_id": chat_id, "link": link} for link in links])
+        )
+
+    async def count_free(self, chat_id: int) -> int:
+        """Количество свободных ссылок в пуле"""
+        result = await self.session.execute(
+            select(func.count(InviteLink.id)).where(InviteLink.chat_id == chat_id, InviteLink.user_id == None)
+        )
+        return result.scalar_one()
+
+    async def claim(self, chat_id: int, user_id: int) -> Optional[str]:
+        """
+        Выдача свободной ссылки пользователю.
+        SKIP LOCKED: параллельные выдачи (бот, API) берут разные ссылки и не ждут друг друга.
+        """
+        free_link = (
+            select(InviteLink.id)
+            .where(InviteLink.chat_id == chat_id, InviteLink.user_id == None)
+            .order_by(InviteLink.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        result = await self.session.execute(
+            update(InviteLink)
+            .where(InviteLink.id == free_link)
+            .values(user_id=user_id, issued_at=func.now())
+            .returning(InviteLink.link)
+        )
+        return result.scalar_one_or_none()
+
+    async def add_issued(self, chat_id: int, user_id: int, link: str) -> None:
+        """Запись ссылки, созданной сразу для пользователя (пул был пуст)"""
+        await self.session.execute(
+            insert(InviteLink).values(chat_id=chat_id, link=link, user_id=user_id, issued_at=func.now())
+        )
+
+    async def release(self, link: str) -> None:
+        """Возврат выданной ссылки в пул, если сообщение с ней не было доставлено"""
+        await self.session.execute(
+            update(InviteLink)
+            .where(InviteLink.link == link)
+            .values(user_id=None, issued_at=None)
+        )
+
+    async def get_user_links(self, user_id: int) -> List[InviteLink]:
+        """Ссылки, выданные пользователю"""
+        result = await self.session.execute(
+            select(InviteLink).where(InviteLink.user_id == user_id).order_by(InviteLink.issued_at)
+        )
+        return result.scalars().all()
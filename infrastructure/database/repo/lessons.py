@@ -7,45 +7,37 @@ from infrastructure.database.repo.base import BaseRepo
 
 class LessonRepo(BaseRepo):
     async def get_or_create_lesson_progress(self, user_id: int) -> Lesson:
-        # Проверка, существует ли уже прогресс для данного пользователя и урока
-        lesson = await self.session.execute(
-            select(Lesson).filter_by(user_id=user_id)
-        )
-        lesson = lesson.scalar_one_or_none()
-
-        if lesson:
-            # If lesson exists, update the lesson_number if needed (it could be updated based on your logic)
-            return lesson
-
-        # Если прогресс не найден, создаем новый
+        # Один запрос: при конфликте по lessons.user_id прогресс не меняется,
+        # а RETURNING отдаёт уже существующую строку
         insert_stmt = (
             insert(Lesson)
             .values(user_id=user_id, lesson_number=1)
+            .on_conflict_do_update(
+                index_elements=[Lesson.user_id],
+                set_={"lesson_number": Lesson.lesson_number},
+            )
             .returning(Lesson)
+            .execution_options(populate_existing=True)
         )
         result = await self.session.execute(insert_stmt)
-        await self.session.commit()
-
         return result.scalar_one()
 
     async def update_lesson_progress(self, user_id: int) -> Optional[Lesson]:
         """Автоматическое обновление номера урока до 3 включительно для пользователя"""
-        async with self.session as session:
-            await session.begin()
-            lesson = await self.session.execute(
-                select(Lesson).filter_by(user_id=user_id)
-            )
-            lesson = lesson.scalar_one_or_none()
+        lesson = await self.session.execute(
+            select(Lesson).filter_by(user_id=user_id)
+        )
+        lesson = lesson.scalar_one_or_none()
 
-            if not lesson:
-                return None
+        if not lesson:
+            return None
 
-            # Проверяем, что номер урока меньше 3, и увеличиваем его
-            if lesson.lesson_number < 3:
-                lesson.lesson_number += 1
+        # Проверяем, что номер урока меньше 3, и увеличиваем его
+        if lesson.lesson_number < 3:
+            lesson.lesson_number += 1
 
-            await self.session.commit()
-            return lesson
+        await self.session.flush()
+        return lesson
 
     async def get_lesson_progress_by_user(self, user_id: int) -> Optional[Lesson]:
         """Получение прогресса уроков для пользователя"""
@@ -0,0 +1,147 @@
+from datetime import datetime
+from typing import Optional, List, Sequence
+
+from sqlalchemy import update, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.future import select
+
+from infrastructure.database.models.mailings import Mailing, MailingStatus
+from infrastructure.database.repo.base import BaseRepo
+
+
+class MailingRepo(BaseRepo):
+    async def create_mailing(
+            self,
+            created_by: int,
+            content_type: str,
+            audience: str,
+            buttons: Optional[list] = None,
+            source_chat_id: Optional[int] = None,
+            source_message_ids: Optional[list[int]] = None,
+            private_user_id: Optional[int] = None,
+            status_message_id: Optional[int] = None,
+            scheduled_at: Optional[datetime] = None,
+    ) -> Mailing:
+        """
+        Создание задания рассылки. С scheduled_at (UTC) задание создаётся в статусе scheduled
+        и запускается воркером в указанное время.
+        """
+        insert_stmt = (
+            insert(Mailing)
+            .values(
+                created_by=created_by,
+                content_type=content_type,
+                buttons=buttons,
+                source_chat_id=source_chat_id,
+                source_message_ids=source_message_ids,
+                audience=audience,
+                private_user_id=private_user_id,
+                status_message_id=status_message_id,
+                status=MailingStatus.SCHEDULED if scheduled_at else MailingStatus.RUNNING,
+                scheduled_at=scheduled_at,
+            )
+            .returning(Mailing)
+        )
+        result = await self.session.execute(insert_stmt)
+        return result.scalar_one()
+
+    async def get_mailing(self, mailing_id: int) -> Optional[Mailing]:
+        """Получение задания рассылки по ID"""
+        result = await self.session.execute(
+            select(Mailing).where(Mailing.id == mailing_id)
+        )
+        return result.scalar_one_or_none()
+
+    async def get_unfinished_mailings(self) -> List[Mailing]:
+        """Запланированные, запущенные и приостановленные рассылки"""
+        result = await self.session.execute(
+            select(Mailing)
+            .where(Mailing.status.in_((MailingStatus.SCHEDULED, MailingStatus.RUNNING, MailingStatus.PAUSED)))
+            .order_by(Mailing.id)
+        )
+        return result.scalars().all()
+
+    async def get_recent_mailings(self, limit: int = 20) -> List[Mailing]:
+        """Последние рассылки, новые первыми"""
+        result = await self.session.execute(
+            select(Mailing).order_by(Mailing.id.desc()).limit(limit)
+        )
+        return result.scalars().all()
+
+    async def get_next_running_mailing(self) -> Optional[Mailing]:
+        """Самая старая запущенная рассылка"""
+        result = await self.session.execute(
+            select(Mailing)
+            .where(Mailing.status == MailingStatus.RUNNING)
+            .order_by(Mailing.id)
+            .limit(1)
+        )
+        return result.scalar_one_or_none()
+
+    async def start_due_mailings(self, now: datetime) -> List[int]:
+        """Переводит в running запланированные рассылки, время которых наступило"""
+        result = await self.session.execute(
+            update(Mailing)
+            .where(Mailing.status == MailingStatus.SCHEDULED, Mailing.scheduled_at <= now)
+            .values(status=MailingStatus.RUNNING)
+            .returning(Mailing.id)
+        )
+        return result.scalars().all()
+
+    async def get_next_scheduled_at(self) -> Optional[datetime]:
+        """Время ближайшей запланированной рассылки"""
+        result = await self.session.execute(
+            select(func.min(Mailing.scheduled_at)).where(Mailing.status == MailingStatus.SCHEDULED)
+        )
+        return result.scalar_one_or_none()
+
+    async def get_status(self, mailing_id: int) -> Optional[str]:
+        result = await self.session.execute(
+            select(Mailing.status).where(Mailing.id == mailing_id)
+        )
+        return result.scalar_one_or_none()
+
+    async def set_status(self, mailing_id: int, status: str, from_statuses: Sequence[str]) -> bool:
+        """
+        Переводит рассылку в status, только если текущий статус входит в from_statuses.
+        Возвращает True, если переход выполнен.
+        """
+        values = {"status": status}
+        if status in (MailingStatus.DONE, MailingStatus.CANCELLED):
+            values["finished_at"] = func.now()
+
+        result = await self.session.execute(
+            update(Mailing)
+            .where(Mailing.id == mailing_id, Mailing.status.in_(from_statuses))
+            .values(**values)
+            .returning(Mailing.id)
+        )
+        return result.scalar_one_or_none() is not None
+
+    async def set_total(self, mailing_id: int, total: int) -> None:
+        """Сохраняет размер аудитории рассылки"""
+        await self.session.execute(
+            update(Mailing).where(Mailing.id == mailing_id).values(total=total)
+        )
+
+    async def checkpoint(self, mailing_id: int, cursor: Optional[int], success: int, failed: int, retried: int = 0,
+                         send_rate: Optional[float] = None) -> None:
+        """
+        Сохраняет прогресс: последний обработанный user_id, приращения счётчиков за пачку
+        и текущую скорость отправки. cursor и send_rate не меняются, если переданы как None.
+        """
+        values = dict(
+            success=Mailing.success + success,
+            failed=Mailing.failed + failed,
+            retried=Mailing.retried + retried,
+        )
+        if cursor is not None:
+            values["cursor"] = cursor
+        if send_rate is not None:
+            values["send_rate"] = send_rate
+
+        await self.session.execute(
+            update(Mailing)
+            .where(Mailing.id == mailing_id)
+            .values(**values)
+        )
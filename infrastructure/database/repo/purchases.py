@@ -1,8 +1,9 @@
-from typing import Optional, List
+from datetime import timedelta
+from typing import Optional, List, Tuple
 
 from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.future import select
-from sqlalchemy import update, func
+from sqlalchemy import update, func, or_
 
 from infrastructure.database.models import User
 from infrastructure.database.models.purchases import Purchase
@@ -20,8 +21,6 @@ class PurchaseRepo(BaseRepo):
             .returning(Purchase)
         )
         result = await self.session.execute(insert_stmt)
-
-        await self.session.commit()
         return result.scalar_one()
 
     async def get_purchase_by_id(self, purchase_id: int) -> Optional[Purchase]:
@@ -31,10 +30,16 @@ class PurchaseRepo(BaseRepo):
         )
         return result.scalar_one_or_none()  # Avoids try-except
 
-    async def get_purchase_by_user(self, user_id: int) -> Purchase:
-        """Получение всех покупок пользователя"""
+    async def get_purchase_by_user(self, user_id: int) -> Optional[Purchase]:
+        """
+        Получение последней покупки пользователя.
+        Покупок может быть несколько (например, оплата в рассрочку), берётся самая новая.
+        """
         result = await self.session.execute(
-            select(Purchase).where(Purchase.user_id == user_id)
+            select(Purchase)
+            .where(Purchase.user_id == user_id)
+            .order_by(Purchase.id.desc())
+            .limit(1)
         )
         return result.scalar_one_or_none()
 
@@ -53,9 +58,6 @@ class PurchaseRepo(BaseRepo):
         # Execute the update and fetch the updated record
         await self.session.execute(update_stmt)
 
-        # Commit the transaction
-        await self.session.commit()
-
     async def toggle_is_paid(
             self,
             id: int,
@@ -69,20 +71,114 @@ class PurchaseRepo(BaseRepo):
         # Execute the update and fetch the updated record
         await self.session.execute(update_stmt)
 
-        # Commit the transaction
-        await self.session.commit()
+    async def mark_paid(self, id: int) -> Optional[Purchase]:
+        """
+        Отмечает покупку оплаченной, если она ещё не оплачена.
+        Возвращает покупку только тому вызову, который её перевёл: доступ выдаётся один раз,
+        сколько бы раз ни пришло подтверждение оплаты.
+        """
+        result = await self.session.execute(
+            update(Purchase)
+            .where(Purchase.id == id, Purchase.is_paid == False)
+            .values(is_paid=True)
+            .returning(Purchase)
+        )
+        return result.scalar_one_or_none()
+
+    async def get_unpaid_with_payment(self, max_age: timedelta) -> List[Tuple[Purchase, float]]:
+        """
+        Неоплаченные покупки с созданным платежом не старше max_age (частичный индекс).
+        Возвращает пары (покупка, возраст в секундах); возраст считается по часам базы.
+        """
+        age = func.extract('epoch', func.now() - Purchase.created_at)
+        result = await self.session.execute(
+            select(Purchase, age)
+            .where(
+                Purchase.is_paid == False,
+                Purchase.payment_id != None,
+                Purchase.created_at >= func.now() - max_age,
+            )
+            .order_by(Purchase.created_at)
+        )
+        return [(purchase, float(seconds)) for purchase, seconds in result.all()]
+
+    async def mark_paid_many(self, ids: List[int]) -> List[Purchase]:
+        """
+        Отмечает оплаченными покупки из ids одним UPDATE.
+        Возвращает только те, которые перевёл этот вызов (см. mark_paid).
+        """
+        if not ids:
+            return []
+        result = await self.session.execute(
+            update(Purchase)
+            .where(Purchase.id.in_(ids), Purchase.is_paid == False)
+            .values(is_paid=True)
+            .returning(Purchase)
+        )
+        return result.scalars().all()
+
+    async def get_undelivered_paid(self, max_age: timedelta, lease: timedelta) -> List[Purchase]:
+        """
+        Оплаченные покупки не старше max_age, которым ещё не отправлено приглашение
+        и выдачу которых сейчас никто не держит (нет аренды или она старше lease).
+        """
+        result = await self.session.execute(
+            select(Purchase)
+            .where(
+                Purchase.is_paid == True,
+                Purchase.access_sent_at == None,
+                Purchase.created_at >= func.now() - max_age,
+                or_(Purchase.delivery_claimed_at == None, Purchase.delivery_claimed_at < func.now() - lease),
+            )
+            .order_by(Purchase.created_at)
+        )
+        return result.scalars().all()
+
+    async def claim_delivery(self, id: int, lease: timedelta) -> Optional[Purchase]:
+        """
+        Берёт выдачу доступа по оплаченной покупке на время lease.
+        Возвращает покупку только тому вызову, который её взял: пока аренда действует,
+        другие процессы (вебхук, проверка оплаты, сверка) приглашение не отправляют.
+        """
+        result = await self.session.execute(
+            update(Purchase)
+            .where(
+                Purchase.id == id,
+                Purchase.is_paid == True,
+                Purchase.access_sent_at == None,
+                or_(Purchase.delivery_claimed_at == None, Purchase.delivery_claimed_at < func.now() - lease),
+            )
+            .values(delivery_claimed_at=func.now())
+            .returning(Purchase)
+        )
+        return result.scalar_one_or_none()
+
+    async def mark_delivered(self, id: int) -> None:
+        """Отмечает, что приглашение по покупке отправлено"""
+        await self.session.execute(
+            update(Purchase)
+            .where(Purchase.id == id, Purchase.access_sent_at == None)
+            .values(access_sent_at=func.now())
+        )
+
+    async def release_delivery(self, id: int) -> None:
+        """Снимает аренду после неудачной выдачи, чтобы следующая сверка повторила её сразу"""
+        await self.session.execute(
+            update(Purchase)
+            .where(Purchase.id == id, Purchase.access_sent_at == None)
+            .values(delivery_claimed_at=None)
+        )
 
     async def delete_purchase(self, purchase_id: int) -> bool:
         """Удаление покупки"""
-        async with self.session.begin():
-            result = await self.session.execute(
-                select(Purchase).where(Purchase.id == purchase_id)
-            )
-            purchase = result.scalar_one_or_none()
-            if purchase:
-                await self.session.delete(purchase)
-                await self.session.commit()
-                return True
+        result = await self.session.execute(
+            select(Purchase).where(Purchase.id == purchase_id)
+        )
+        purchase = result.scalar_one_or_none()
+        if purchase:
+            await self.session.delete(purchase)
+            await self.session.flush()
+            return True
         return False
 
     async def count_users(self) -> int:
@@ -1,9 +1,13 @@
 from dataclasses import dataclass
+from typing import Optional
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from infrastructure.database.cache import TTLCache
 from infrastructure.database.repo.deeplink import DeeplinkRepo
+from infrastructure.database.repo.invite_links import InviteLinkRepo
 from infrastructure.database.repo.lessons import LessonRepo
+from infrastructure.database.repo.mailings import MailingRepo
 from infrastructure.database.repo.products import ProductRepo
 from infrastructure.database.repo.purchases import PurchaseRepo
 from infrastructure.database.repo.users import UserRepo
@@ -17,10 +21,12 @@ class RequestsRepo:
     """
 
     session: AsyncSession
+    user_cache: Optional[TTLCache] = None
+    scenario_cache: Optional[TTLCache] = None
 
     @property
     def users(self) -> UserRepo:
-        return UserRepo(self.session)
+        return UserRepo(self.session, self.user_cache)
 
     @property
     def purchases(self) -> PurchaseRepo:
@@ -32,8 +38,16 @@ class RequestsRepo:
 
     @property
     def deeplink(self) -> DeeplinkRepo:
-        return DeeplinkRepo(self.session)
+        return DeeplinkRepo(self.session, self.scenario_cache)
 
     @property
     def lessons(self) -> LessonRepo:
         return LessonRepo(self.session)
+
+    @property
+    def mailings(self) -> MailingRepo:
+        return MailingRepo(self.session)
+
+    @property
+    def invite_links(self) -> InviteLinkRepo:
+        return InviteLinkRepo(self.session)
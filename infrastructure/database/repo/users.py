@@ -1,25 +1,48 @@
-from typing import Optional, List
+from typing import Optional, List, AsyncIterator
 
-from sqlalchemy import or_
+from sqlalchemy import event, or_, exists, func, update
 from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.future import select
 from sqlalchemy.orm import aliased
 
+from infrastructure.database.cache import TTLCache
 from infrastructure.database.models import User, Purchase, Lesson
 from infrastructure.database.repo.base import BaseRepo
 
 
 class UserRepo(BaseRepo):
-    async def get_or_create_user(self, id: int, full_name: str, is_premium: bool, username: Optional[str] = None, deeplink: Optional[int] = None) -> User:
-        """Получение или создание пользователя"""
-        # Check if the user already exists
-        user = await self.session.execute(select(User).filter_by(id=id))
-        user = user.scalar_one_or_none()
+    def __init__(self, session, cache: Optional[TTLCache] = None):
+        super().__init__(session)
+        self.cache = cache
 
-        if user:
-            return user
+    def _cache_after_commit(self, user_id: int) -> None:
+        """
+        Отмечает пользователя существующим в кэше только после фиксации транзакции:
+        при откате в кэше не остаётся пользователя, которого нет в базе.
+        """
+        if self.cache is None:
+            return
+        info = self.session.info
+        if "user_cache_pending" not in info:
+            info["user_cache_pending"] = set()
+            cache = self.cache
+
+            def after_commit(session):
+                for pending_id in info.pop("user_cache_pending", ()):
+                    cache.set(pending_id, True)
 
+            def after_rollback(session):
+                info.pop("user_cache_pending", None)
+
+            event.listen(self.session.sync_session, "after_commit", after_commit, once=True)
+            event.listen(self.session.sync_session, "after_rollback", after_rollback, once=True)
+        info["user_cache_pending"].add(user_id)
+
+    async def get_or_create_user(self, id: int, full_name: str, is_premium: bool, username: Optional[str] = None, deeplink: Optional[int] = None) -> User:
+        """Получение или создание пользователя"""
+        # Один запрос: INSERT ... ON CONFLICT DO UPDATE ... RETURNING.
+        # Для существующего пользователя обновляются только данные профиля, deeplink остаётся первым.
         insert_stmt = (
             insert(User)
             .values(
@@ -29,12 +52,70 @@ class UserRepo(BaseRepo):
                 deeplink=deeplink,
                 is_premium=is_premium
             )
+            .on_conflict_do_update(
+                index_elements=[User.id],
+                set_=dict(
+                    full_name=full_name,
+                    username=username,
+                    is_premium=is_premium,
+                    is_active=True,
+                    deactivated_at=None,
+                ),
+            )
             .returning(User)
+            .execution_options(populate_existing=True)
         )
         result = await self.session.execute(insert_stmt)
+        user = result.scalar_one()
 
-        await self.session.commit()
-        return result.scalar_one()
+        self._cache_after_commit(user.id)
+        return user
+
+    async def reactivate_user(self, user_id: int) -> None:
+        """Возвращает пользователя в рассылки, если он ранее был отмечен неактивным"""
+        await self.session.execute(
+            update(User)
+            .where(User.id == user_id, User.is_active.is_(False))
+            .values(is_active=True, deactivated_at=None)
+        )
+
+    async def user_exists_active(self, user_id: int) -> bool:
+        """
+        Проверка существования пользователя для /start с возвратом в рассылки.
+        Попадание в кэш не делает запросов: кэш заполняется только активными пользователями,
+        а отключённых рассылкой пользователей из него вытесняет воркер рассылок (save_batch_result).
+        При промахе читается is_active, UPDATE выполняется только для неактивного пользователя.
+        """
+        if self.cache is not None and self.cache.get(user_id):
+            return True
+
+        result = await self.session.execute(select(User.is_active).where(User.id == user_id))
+        is_active = result.scalar_one_or_none()
+        if is_active is None:
+            return False
+
+        if is_active:
+            if self.cache is not None:
+                self.cache.set(user_id, True)
+        else:
+            await self.reactivate_user(user_id)
+            self._cache_after_commit(user_id)
+        return True
+
+    async def deactivate_users(self, user_ids: List[int]) -> None:
+        """
+        Одним запросом отмечает неактивными пользователей, заблокировавших бота или с ненайденным чатом.
+        """
+        if not user_ids:
+            return
+        if self.cache is not None:
+            for user_id in user_ids:
+                self.cache.invalidate(user_id)
+        await self.session.execute(
+            update(User)
+            .where(User.id.in_(user_ids), User.is_active == True)
+            .values(is_active=False, deactivated_at=func.now())
+        )
 
     async def get_user_by_id(self, user_id: int) -> Optional[User]:
         """Получение пользователя по ID"""
@@ -43,38 +124,37 @@ class UserRepo(BaseRepo):
 
     async def update_user(self, user_id: int, username: Optional[str] = None) -> Optional[User]:
         """Обновление данных пользователя"""
-        # Открываем асинхронную сессию и начинаем транзакцию
-        async with self.session as session:
-            await session.begin()
-            # begin() автоматически начнёт транзакцию
-            # Получаем пользователя из базы данных
-            result = await self.session.execute(select(User).filter_by(id=user_id))
-            user = result.scalar_one_or_none()  # Получаем пользователя или None
+        if self.cache is not None:
+            self.cache.invalidate(user_id)
 
-            if user:
-                if username is not None:
-                    user.username = username
-                # Если нужно, можно явно вызвать commit() для сохранения изменений
-                await self.session.commit()  # Обычно в async контексте commit нужно делать вручную
+        # Получаем пользователя из базы данных
+        result = await self.session.execute(select(User).filter_by(id=user_id))
+        user = result.scalar_one_or_none()  # Получаем пользователя или None
+
+        if user:
+            if username is not None:
+                user.username = username
+            # Фиксация транзакции выполняется один раз в DatabaseMiddleware
+            await self.session.flush()
 
         # Возвращаем обновленного пользователя
         return user
 
     async def delete_user(self, user_id: int) -> bool:
+        if self.cache is not None:
+            self.cache.invalidate(user_id)
+
         try:
-            # Начинаем транзакцию
-            async with self.session as session:
-                await session.begin()
-                # Открываем транзакцию
-                # Получаем пользователя из базы данных с использованием метода select
-                user = await self.session.get(User, user_id)
-
-                if user:
-                    # Удаляем пользователя
-                    await self.session.delete(user)
-                    return True  # Если пользователь найден и удален
-                else:
-                    return False  # Если пользователь не найден
+            # Получаем пользователя из базы данных с использованием метода select
+            user = await self.session.get(User, user_id)
+
+            if user:
+                # Удаляем пользователя
+                await self.session.delete(user)
+                await self.session.flush()
+                return True  # Если пользователь найден и удален
+            else:
+                return False  # Если пользователь не найден
         except SQLAlchemyError as e:
             # Логируем ошибку при работе с SQLAlchemy
             raise
@@ -136,3 +216,49 @@ class UserRepo(BaseRepo):
             }
             for row in rows
         ]
+
+    @staticmethod
+    def audience_query(audience: str, include_inactive: bool = False):
+        """
+        SELECT users.id для аудитории рассылки: all, bought, nonbought.
+        Выбирается только id в порядке первичного ключа, без ORM-объектов и JOIN.
+        Неактивные пользователи (заблокировали бота) исключаются, если не указан include_inactive.
+        """
+        paid = exists().where(Purchase.user_id == User.id, Purchase.is_paid == True)
+        stmt = select(User.id)
+        if not include_inactive:
+            stmt = stmt.where(User.is_active == True)
+
+        if audience == "bought":
+            stmt = stmt.where(paid)
+        elif audience == "nonbought":
+            stmt = stmt.where(~paid)
+        elif audience != "all":
+            raise ValueError(f"Unknown audience: {audience}")
+
+        return stmt.order_by(User.id)
+
+    async def count_audience(self, audience: str, after_id: int = 0, include_inactive: bool = False) -> int:
+        """
+        Количество получателей рассылки с id больше after_id.
+        """
+        stmt = self.audience_query(audience, include_inactive).where(User.id > after_id).order_by(None)
+        result = await self.session.execute(select(func.count()).select_from(stmt.subquery()))
+        return result.scalar_one()
+
+    async def iter_audience(self, audience: str, batch_size: int = 1000, after_id: int = 0,
+                            limit: Optional[int] = None, include_inactive: bool = False) -> AsyncIterator[int]:
+        """
+        Потоковая выборка id получателей через серверный курсор.
+        Память не зависит от размера аудитории, первые id доступны до окончания запроса.
+        after_id и limit позволяют читать аудиторию окнами по первичному ключу (keyset).
+        """
+        stmt = self.audience_query(audience, include_inactive).where(User.id > after_id)
+        if limit is not None:
+            stmt = stmt.limit(limit)
+
+        result = await self.session.stream_scalars(
+            stmt.execution_options(yield_per=batch_size)
+        )
+        async for user_id in result:
+            yield user_id
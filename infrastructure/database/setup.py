@@ -1,12 +1,15 @@
-from sqlalchemy.orm import sessionmaker
+from typing import Callable, AsyncContextManager
+
+from alembic.config import Config as AlembicConfig
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import inspect
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, AsyncEngine, async_sessionmaker
 
-from infrastructure.database.models import Base
 from tgbot.config import DbConfig
-from typing import Callable, AsyncContextManager
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 
 
-async def create_session_pool(db: DbConfig, echo=False) -> Callable[[], AsyncContextManager[AsyncSession]]:
+def create_engine(db: DbConfig, echo=False) -> AsyncEngine:
     engine = create_async_engine(
         db.construct_sqlalchemy_url(),
         query_cache_size=1200,
@@ -15,9 +18,42 @@ async def create_session_pool(db: DbConfig, echo=False) -> Callable[[], AsyncCon
         future=True,
         echo=echo,
     )
+    return engine
+
+
+async def check_schema_version(engine: AsyncEngine, alembic_ini: str = "alembic.ini") -> None:
+    """
+    Compares the Alembic head revision with the one stamped in the database.
+
+    Called once at startup instead of create_all: the schema is owned by migrations,
+    runtime code never issues DDL. Raises RuntimeError if the database is behind or ahead.
+
+    A database built by the old create_all code has tables but no revision. Its schema matches
+    revision 8d41c6f2a9b3 (users, products, purchases, deeplinks, lessons), so it is stamped
+    there and upgraded; `alembic stamp head` would skip every later migration.
+    """
+    script = ScriptDirectory.from_config(AlembicConfig(alembic_ini))
+    expected = set(script.get_heads())
+
+    def _current_heads(connection) -> set:
+        return set(MigrationContext.configure(connection).get_current_heads())
+
+    async with engine.connect() as conn:
+        current = await conn.run_sync(_current_heads)
+        legacy = not current and await conn.run_sync(lambda sync_conn: inspect(sync_conn).has_table("users"))
+
+    if legacy:
+        raise RuntimeError(
+            "Database has tables but no schema revision: it was built by create_all. "
+            "Run `alembic stamp 8d41c6f2a9b3`, then `alembic upgrade head`."
+        )
+    if current != expected:
+        raise RuntimeError(
+            f"Database schema revision {sorted(current) or 'none'} does not match "
+            f"migrations head {sorted(expected)}. Run `alembic upgrade head`."
+        )
 
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all, checkfirst=True)
 
-    session_pool = sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)
+def create_session_pool(engine: AsyncEngine) -> Callable[[], AsyncContextManager[AsyncSession]]:
+    session_pool = async_sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)
     return session_pool
@@ -0,0 +1,28 @@
+"""Add mailings progress columns
+
+Revision ID: 1d8f5b6a2e39
+Revises: e41a7c3b9d20
+Create Date: 2026-10-18 15:37:46.902154
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = '1d8f5b6a2e39'
+down_revision: Union[str, None] = 'e41a7c3b9d20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('mailings', sa.Column('total', sa.Integer(), nullable=True))
+    op.add_column('mailings', sa.Column('send_rate', sa.Float(), nullable=True))
+    op.add_column('mailings', sa.Column('status_message_id', sa.BIGINT(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('mailings', 'status_message_id')
+    op.drop_column('mailings', 'send_rate')
+    op.drop_column('mailings', 'total')
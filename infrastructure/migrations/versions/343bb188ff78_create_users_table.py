@@ -11,7 +11,6 @@ from alembic import op
 import sqlalchemy as sa
 from sqlalchemy.dialects import postgresql
 
-# revision identifiers, used by Alembic.
 revision: str = '343bb188ff78'
 down_revision: Union[str, None] = None
 branch_labels: Union[str, Sequence[str], None] = None
@@ -19,20 +18,16 @@ depends_on: Union[str, Sequence[str], None] = None
 
 
 def upgrade() -> None:
-    # ### commands auto generated by Alembic - please adjust! ###
     op.create_table('users',
-    sa.Column('user_id', sa.BIGINT(), autoincrement=False, nullable=False),
+    sa.Column('id', sa.BIGINT(), autoincrement=False, nullable=False),
+    sa.Column('full_name', sa.String(), nullable=False),
     sa.Column('username', sa.String(length=128), nullable=True),
-    sa.Column('full_name', sa.String(length=128), nullable=False),
-    sa.Column('active', sa.Boolean(), server_default=sa.text('true'), nullable=False),
-    sa.Column('language', sa.String(length=10), server_default=sa.text("'en'"), nullable=False),
+    sa.Column('deeplink', sa.BIGINT(), nullable=True),
+    sa.Column('is_premium', sa.Boolean(), nullable=True),
     sa.Column('created_at', postgresql.TIMESTAMP(), server_default=sa.func.now(), nullable=False),
-    sa.PrimaryKeyConstraint('user_id')
+    sa.PrimaryKeyConstraint('id')
     )
-    # ### end Alembic commands ###
 
 
 def downgrade() -> None:
-    # ### commands auto generated by Alembic - please adjust! ###
     op.drop_table('users')
-    # ### end Alembic commands ###
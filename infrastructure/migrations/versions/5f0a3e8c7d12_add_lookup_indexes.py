@@ -0,0 +1,37 @@
+"""Add indexes on hot lookup columns
+
+Revision ID: 5f0a3e8c7d12
+Revises: c27e91d4b0f5
+Create Date: 2026-10-18 12:26:05.904417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = '5f0a3e8c7d12'
+down_revision: Union[str, None] = 'c27e91d4b0f5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# lessons.user_id is already covered by the unique index lessons_user_id_key (c27e91d4b0f5).
+# CREATE INDEX CONCURRENTLY cannot run inside a transaction, hence the autocommit blocks.
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index('ix_purchases_user_id', 'purchases', ['user_id'],
+                        postgresql_concurrently=True)
+        op.create_index('ix_purchases_paid_user_id', 'purchases', ['user_id'],
+                        postgresql_where=sa.text('is_paid'), postgresql_concurrently=True)
+        op.create_index('ix_users_deeplink', 'users', ['deeplink'],
+                        postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_users_deeplink', table_name='users', postgresql_concurrently=True)
+        op.drop_index('ix_purchases_paid_user_id', table_name='purchases', postgresql_concurrently=True)
+        op.drop_index('ix_purchases_user_id', table_name='purchases', postgresql_concurrently=True)
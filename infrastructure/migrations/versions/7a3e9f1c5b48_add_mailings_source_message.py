@@ -0,0 +1,26 @@
+"""Add mailings source message columns
+
+Revision ID: 7a3e9f1c5b48
+Revises: 1d8f5b6a2e39
+Create Date: 2026-10-18 16:12:05.371902
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = '7a3e9f1c5b48'
+down_revision: Union[str, None] = '1d8f5b6a2e39'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('mailings', sa.Column('source_chat_id', sa.BIGINT(), nullable=True))
+    op.add_column('mailings', sa.Column('source_message_ids', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('mailings', 'source_message_ids')
+    op.drop_column('mailings', 'source_chat_id')
@@ -0,0 +1,68 @@
+"""Create products, purchases, deeplinks and lessons tables
+
+Revision ID: 8d41c6f2a9b3
+Revises: 343bb188ff78
+Create Date: 2026-10-18 10:12:41.318207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision: str = '8d41c6f2a9b3'
+down_revision: Union[str, None] = '343bb188ff78'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('products',
+    sa.Column('id', sa.BIGINT(), autoincrement=True, nullable=False),
+    sa.Column('name', sa.String(length=255), nullable=False),
+    sa.Column('info', sa.String(length=255), nullable=False),
+    sa.Column('description', sa.String(length=500), nullable=True),
+    sa.Column('price', sa.Integer(), nullable=False),
+    sa.Column('created_at', postgresql.TIMESTAMP(), server_default=sa.func.now(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute(sa.schema.CreateSequence(sa.Sequence('purchase_id_seq', start=75)))
+    op.create_table('purchases',
+    sa.Column('id', sa.BIGINT(), nullable=False),
+    sa.Column('payment_id', sa.BIGINT(), nullable=True),
+    sa.Column('user_id', sa.BIGINT(), nullable=False),
+    sa.Column('product_id', sa.BIGINT(), nullable=False),
+    sa.Column('link', sa.String(), nullable=True),
+    sa.Column('amount', sa.Integer(), nullable=False),
+    sa.Column('is_paid', sa.Boolean(), nullable=False),
+    sa.Column('created_at', postgresql.TIMESTAMP(), server_default=sa.func.now(), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('deeplinks',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('source', sa.String(), nullable=False),
+    sa.Column('scenario', sa.JSON(), nullable=False),
+    sa.Column('link', sa.String(), nullable=True),
+    sa.Column('created_at', postgresql.TIMESTAMP(), server_default=sa.func.now(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('lessons',
+    sa.Column('id', sa.BIGINT(), autoincrement=True, nullable=False),
+    sa.Column('user_id', sa.BIGINT(), nullable=False),
+    sa.Column('lesson_number', sa.Integer(), nullable=False),
+    sa.Column('completed_at', sa.TIMESTAMP(), nullable=True),
+    sa.Column('created_at', postgresql.TIMESTAMP(), server_default=sa.func.now(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('lessons')
+    op.drop_table('deeplinks')
+    op.drop_table('purchases')
+    op.execute(sa.schema.DropSequence(sa.Sequence('purchase_id_seq')))
+    op.drop_table('products')
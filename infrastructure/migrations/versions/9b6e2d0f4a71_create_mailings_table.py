@@ -0,0 +1,39 @@
+"""Create mailings table
+
+Revision ID: 9b6e2d0f4a71
+Revises: 5f0a3e8c7d12
+Create Date: 2026-10-18 13:41:52.117630
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision: str = '9b6e2d0f4a71'
+down_revision: Union[str, None] = '5f0a3e8c7d12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('mailings',
+    sa.Column('id', sa.BIGINT(), autoincrement=True, nullable=False),
+    sa.Column('status', sa.String(length=16), server_default=sa.text("'running'"), nullable=False),
+    sa.Column('created_by', sa.BIGINT(), nullable=False),
+    sa.Column('content_type', sa.String(length=32), nullable=False),
+    sa.Column('buttons', sa.JSON(), nullable=True),
+    sa.Column('audience', sa.String(length=16), nullable=False),
+    sa.Column('private_user_id', sa.BIGINT(), nullable=True),
+    sa.Column('cursor', sa.BIGINT(), server_default=sa.text('0'), nullable=False),
+    sa.Column('success', sa.Integer(), server_default=sa.text('0'), nullable=False),
+    sa.Column('failed', sa.Integer(), server_default=sa.text('0'), nullable=False),
+    sa.Column('finished_at', sa.TIMESTAMP(), nullable=True),
+    sa.Column('created_at', postgresql.TIMESTAMP(), server_default=sa.func.now(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('mailings')
@@ -0,0 +1,27 @@
+"""Add users.is_active and users.deactivated_at
+
+Revision ID: b85d2c7e4f16
+Revises: 7a3e9f1c5b48
+Create Date: 2026-10-18 16:48:30.226417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = 'b85d2c7e4f16'
+down_revision: Union[str, None] = '7a3e9f1c5b48'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # A constant server default does not rewrite the table on PostgreSQL 11+
+    op.add_column('users', sa.Column('is_active', sa.Boolean(), server_default=sa.text('true'), nullable=False))
+    op.add_column('users', sa.Column('deactivated_at', sa.TIMESTAMP(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'deactivated_at')
+    op.drop_column('users', 'is_active')
@@ -0,0 +1,33 @@
+"""Unique lessons.user_id for upserts
+
+Revision ID: c27e91d4b0f5
+Revises: 8d41c6f2a9b3
+Create Date: 2026-10-18 11:03:27.540912
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = 'c27e91d4b0f5'
+down_revision: Union[str, None] = '8d41c6f2a9b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Rows duplicated by concurrent get_or_create_lesson_progress calls: keep the most advanced one
+    op.execute(
+        """
+        DELETE FROM lessons l
+        USING lessons other
+        WHERE l.user_id = other.user_id
+          AND (l.lesson_number < other.lesson_number
+               OR (l.lesson_number = other.lesson_number AND l.id > other.id))
+        """
+    )
+    op.create_unique_constraint('lessons_user_id_key', 'lessons', ['user_id'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('lessons_user_id_key', 'lessons', type_='unique')
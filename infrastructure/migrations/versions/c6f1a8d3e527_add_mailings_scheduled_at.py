@@ -0,0 +1,24 @@
+"""Add mailings.scheduled_at
+
+Revision ID: c6f1a8d3e527
+Revises: b85d2c7e4f16
+Create Date: 2026-10-18 17:26:14.690338
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = 'c6f1a8d3e527'
+down_revision: Union[str, None] = 'b85d2c7e4f16'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('mailings', sa.Column('scheduled_at', sa.TIMESTAMP(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('mailings', 'scheduled_at')
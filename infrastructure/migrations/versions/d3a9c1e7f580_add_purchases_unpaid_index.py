@@ -0,0 +1,31 @@
+"""Add partial index of unpaid purchases with a payment
+
+Revision ID: d3a9c1e7f580
+Revises: c6f1a8d3e527
+Create Date: 2026-10-18 18:04:51.217930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = 'd3a9c1e7f580'
+down_revision: Union[str, None] = 'c6f1a8d3e527'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# CREATE INDEX CONCURRENTLY cannot run inside a transaction, hence the autocommit blocks.
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index('ix_purchases_unpaid_created_at', 'purchases', ['created_at'],
+                        postgresql_where=sa.text('NOT is_paid AND payment_id IS NOT NULL'),
+                        postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_purchases_unpaid_created_at', table_name='purchases', postgresql_concurrently=True)
@@ -0,0 +1,24 @@
+"""Add mailings.retried counter
+
+Revision ID: e41a7c3b9d20
+Revises: 9b6e2d0f4a71
+Create Date: 2026-10-18 15:02:11.408215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = 'e41a7c3b9d20'
+down_revision: Union[str, None] = '9b6e2d0f4a71'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('mailings', sa.Column('retried', sa.Integer(), server_default=sa.text('0'), nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('mailings', 'retried')
@@ -0,0 +1,39 @@
+"""Create invite_links table
+
+Revision ID: e8b2f4c6a913
+Revises: d3a9c1e7f580
+Create Date: 2026-10-18 18:52:37.408215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision: str = 'e8b2f4c6a913'
+down_revision: Union[str, None] = 'd3a9c1e7f580'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('invite_links',
+    sa.Column('id', sa.BIGINT(), autoincrement=True, nullable=False),
+    sa.Column('chat_id', sa.BIGINT(), nullable=False),
+    sa.Column('link', sa.String(), nullable=False),
+    sa.Column('user_id', sa.BIGINT(), nullable=True),
+    sa.Column('issued_at', sa.TIMESTAMP(), nullable=True),
+    sa.Column('created_at', postgresql.TIMESTAMP(), server_default=sa.func.now(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('link')
+    )
+    op.create_index('ix_invite_links_user_id', 'invite_links', ['user_id'])
+    op.create_index('ix_invite_links_free', 'invite_links', ['chat_id', 'id'],
+                    postgresql_where=sa.text('user_id IS NULL'))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_invite_links_free', table_name='invite_links')
+    op.drop_index('ix_invite_links_user_id', table_name='invite_links')
+    op.drop_table('invite_links')
@@ -0,0 +1,31 @@
+"""Add purchases.access_sent_at and delivery_claimed_at
+
+Revision ID: f5c2a7e1d804
+Revises: e8b2f4c6a913
+Create Date: 2026-10-18 21:14:06.382517
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = 'f5c2a7e1d804'
+down_revision: Union[str, None] = 'e8b2f4c6a913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('purchases', sa.Column('access_sent_at', sa.TIMESTAMP(), nullable=True))
+    op.add_column('purchases', sa.Column('delivery_claimed_at', sa.TIMESTAMP(), nullable=True))
+    # Purchases paid before this revision got their invite the old way; do not send it again
+    op.execute("UPDATE purchases SET access_sent_at = now() WHERE is_paid")
+    op.create_index('ix_purchases_undelivered_created_at', 'purchases', ['created_at'],
+                    postgresql_where=sa.text('is_paid AND access_sent_at IS NULL'))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_purchases_undelivered_created_at', table_name='purchases')
+    op.drop_column('purchases', 'delivery_claimed_at')
+    op.drop_column('purchases', 'access_sent_at')
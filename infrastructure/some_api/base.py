@@ -6,7 +6,7 @@ import ssl
 from typing import TYPE_CHECKING, Any
 
 import backoff
-from aiohttp import ClientError, ClientSession, TCPConnector, FormData
+from aiohttp import ClientError, ClientSession, ClientTimeout, TCPConnector, FormData
 from ujson import dumps, loads
 
 if TYPE_CHECKING:
@@ -19,20 +19,22 @@ if TYPE_CHECKING:
 class BaseClient:
     """Represents base API client."""
 
-    def __init__(self, base_url: str | URL) -> None:
+    def __init__(self, base_url: str | URL, timeout: ClientTimeout | None = None) -> None:
         self._base_url = base_url
+        self._timeout = timeout
         self._session: ClientSession | None = None
         self.log = logging.getLogger(self.__class__.__name__)
 
     async def _get_session(self) -> ClientSession:
         """Get aiohttp session with cache."""
         if self._session is None:
-            ssl_context = ssl.SSLContext()
-            connector = TCPConnector(ssl_context=ssl_context)
+            ssl_context = ssl.create_default_context()
+            connector = TCPConnector(ssl=ssl_context)
             self._session = ClientSession(
                 base_url=self._base_url,
                 connector=connector,
                 json_serialize=dumps,
+                timeout=self._timeout or ClientTimeout(total=30),
             )
 
         return self._session
@@ -51,7 +53,21 @@ class BaseClient:
         headers: Mapping[str, str] | None = None,
         data: FormData | None = None,
     ) -> tuple[int, dict[str, Any]]:
-        """Make request and return decoded json response."""
+        """Make request with retries on ClientError and return decoded json response."""
+        return await self._make_request_once(
+            method, url, params=params, json=json, headers=headers, data=data
+        )
+
+    async def _make_request_once(
+        self,
+        method: str,
+        url: str | URL,
+        params: Mapping[str, str] | None = None,
+        json: Mapping[str, str] | None = None,
+        headers: Mapping[str, str] | None = None,
+        data: FormData | None = None,
+    ) -> tuple[int, dict[str, Any]]:
+        """Make a single request, for non-idempotent calls, and return decoded json response."""
         session = await self._get_session()
 
         self.log.debug(
@@ -0,0 +1,86 @@
+"""
+Separate mailing worker for MAILING_MODE=redis.
+
+Takes recipient batches queued by the bot from Redis and sends them. Start as many processes
+as needed; they share one rate limit (MAILING_RATE) through Redis.
+
+Usage (from the repository root):
+    python mailing_worker.py [--name worker-1]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import socket
+
+import betterlogging as bl
+from aiogram import Bot
+from aiogram.client.default import DefaultBotProperties
+from redis.asyncio import Redis
+
+from infrastructure.database.setup import create_engine, create_session_pool, check_schema_version
+from tgbot.config import load_config
+from tgbot.services.mailing_queue import MailingQueue, BatchConsumer
+from tgbot.services.rate_limiter import RedisTokenBucket
+from tgbot.services.request_scheduler import RequestScheduler
+from tgbot.services.sender import BroadcastSender
+
+
+def setup_logging():
+    bl.basic_colorized_config(level=logging.INFO)
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(filename)s:%(lineno)d #%(levelname)-8s [%(asctime)s] - %(name)s - %(message)s",
+    )
+
+
+async def main(name: str):
+    setup_logging()
+
+    config = load_config(".env")
+
+    engine = create_engine(config.db)
+    await check_schema_version(engine)
+    session_pool = create_session_pool(engine)
+
+    redis = Redis.from_url(config.redis.dsn(), decode_responses=True)
+    bot = Bot(token=config.tg_bot.token, default=DefaultBotProperties(parse_mode='HTML'))
+    # Every request also takes a token from the global budget shared with the bot process
+    request_scheduler = RequestScheduler(
+        rate=config.request_scheduler.rate,
+        per_chat_rate=config.request_scheduler.per_chat_rate,
+        per_chat_burst=config.request_scheduler.per_chat_burst,
+        limiter=RedisTokenBucket(redis, rate=config.request_scheduler.rate, key=RequestScheduler.shared_limiter_key),
+    )
+    bot.session.middleware(request_scheduler)
+    sender = BroadcastSender(
+        RedisTokenBucket(redis, rate=config.mailing.rate),
+        concurrency=config.mailing.concurrency,
+        max_retries=config.mailing.max_retries,
+    )
+    consumer = BatchConsumer(
+        bot,
+        session_pool,
+        sender,
+        MailingQueue(redis),
+        name=name,
+        reports_dir=config.mailing.reports_dir,
+    )
+
+    try:
+        await consumer.run()
+    finally:
+        await request_scheduler.close()
+        await bot.session.close()
+        await redis.aclose()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--name", default=f"{socket.gethostname()}-{os.getpid()}",
+                        help="Consumer name in the Redis group; keep it stable to resume its pending batches.")
+    try:
+        asyncio.run(main(parser.parse_args().name))
+    except (KeyboardInterrupt, SystemExit):
+        logging.error("Воркер рассылок остановлен")
@@ -0,0 +1,173 @@
+"""
+Mailing throughput against the fake Bot API server: msgs/s, p99 send latency and peak memory.
+
+Starts scripts/mailing/fake_bot_api.py in a separate process (or uses --server), points a Bot
+at it and sends mailings of every size in --sizes to chat ids 1..N. "mailing" runs the worker
+path (BroadcastSender batches of send_mailing_message collected by BatchResult, copying one
+message); "broadcast" runs broadcaster.broadcast with a text message. Nothing touches the
+database or real users.
+
+Latency is the HTTP round trip of a single request as the session sees it. Peak memory is the
+Python heap peak of the run (tracemalloc) and the peak RSS of the process so far.
+
+With the default limits a 100k mailing takes over an hour, like in production; pass
+`--rate 1000 --limit 0` to measure the client overhead alone.
+
+Usage (from the repository root):
+    python scripts/mailing/benchmark_mailing.py [--sizes 1000,10000,100000] [--path mailing] [--rate 25]
+"""
+import argparse
+import asyncio
+import os
+import resource
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from aiogram import Bot  # noqa: E402
+from aiogram.client.session.aiohttp import AiohttpSession  # noqa: E402
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware  # noqa: E402
+from aiogram.client.telegram import TelegramAPIServer  # noqa: E402
+from aiohttp import ClientSession, ClientError  # noqa: E402
+
+from infrastructure.database.models import Mailing  # noqa: E402
+from tgbot.services import broadcaster  # noqa: E402
+from tgbot.services.mailing import BatchResult, send_mailing_message  # noqa: E402
+from tgbot.services.rate_limiter import TokenBucket  # noqa: E402
+from tgbot.services.sender import BroadcastSender  # noqa: E402
+
+FAKE_SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_bot_api.py")
+TOKEN = "42:fake-token"
+
+
+class RequestTimer(BaseRequestMiddleware):
+    """Records the duration of every request the bot session makes."""
+
+    def __init__(self) -> None:
+        self.durations = []
+
+    async def __call__(self, make_request, bot, method):
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        finally:
+            self.durations.append(time.perf_counter() - started)
+
+
+def percentile(values: list[float], share: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+async def start_server(args) -> asyncio.subprocess.Process:
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, FAKE_SERVER, "--port", str(args.port),
+        "--latency", str(args.latency), "--limit", str(args.limit),
+        "--flood-share", str(args.flood_share), "--blocked-share", str(args.blocked_share),
+    )
+    async with ClientSession() as session:
+        for _ in range(50):
+            try:
+                async with session.get(f"http://127.0.0.1:{args.port}/stats"):
+                    return process
+            except ClientError:
+                await asyncio.sleep(0.1)
+    process.kill()
+    raise RuntimeError("Fake Bot API server did not start")
+
+
+async def run_mailing(bot: Bot, sender: BroadcastSender, size: int, batch_size: int) -> tuple[int, int, int]:
+    mailing = Mailing(id=0, source_chat_id=1, source_message_ids=[1], buttons=None)
+    success = failed = retried = 0
+    for start in range(1, size + 1, batch_size):
+        batch = list(range(start, min(start + batch_size, size + 1)))
+        result = BatchResult()
+        await sender.send_batch(batch, lambda user_id: send_mailing_message(bot, mailing, user_id), result)
+        success += result.success
+        failed += result.failed
+        retried += result.retried
+    return success, failed, retried
+
+
+async def run_broadcast(bot: Bot, sender: BroadcastSender, size: int) -> tuple[int, int, int]:
+    success = await broadcaster.broadcast(bot, range(1, size + 1), "Бенчмарк рассылки", sender=sender)
+    return success, size - success, 0
+
+
+async def run(args, base: str, size: int) -> dict:
+    timer = RequestTimer()
+    session = AiohttpSession(api=TelegramAPIServer.from_base(base))
+    session.middleware(timer)
+    bot = Bot(token=TOKEN, session=session)
+    sender = BroadcastSender(TokenBucket(rate=args.rate), concurrency=args.concurrency)
+
+    tracemalloc.reset_peak()
+    started = time.perf_counter()
+    try:
+        if args.path == "mailing":
+            success, failed, retried = await run_mailing(bot, sender, size, args.batch_size)
+        else:
+            success, failed, retried = await run_broadcast(bot, sender, size)
+    finally:
+        await bot.session.close()
+    elapsed = time.perf_counter() - started
+
+    return {
+        "size": size,
+        "elapsed": elapsed,
+        "rate": size / elapsed,
+        "success": success,
+        "failed": failed,
+        "retried": retried,
+        "p50": percentile(timer.durations, 0.50),
+        "p99": percentile(timer.durations, 0.99),
+        "heap_peak": tracemalloc.get_traced_memory()[1] / 2 ** 20,
+        # ru_maxrss is in kilobytes on Linux
+        "rss_peak": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2 ** 10,
+    }
+
+
+async def main(args) -> None:
+    process = None
+    base = args.server
+    if not base:
+        process = await start_server(args)
+        base = f"http://127.0.0.1:{args.port}"
+
+    tracemalloc.start()
+    results = []
+    try:
+        for size in sorted(int(size) for size in args.sizes.split(",")):
+            print(f"Sending {size} messages ({args.path})...")
+            results.append(await run(args, base, size))
+    finally:
+        if process is not None:
+            process.terminate()
+            await process.wait()
+
+    print("\n===== summary =====")
+    print(f"{'recipients':>10} {'msgs/s':>8} {'sent':>8} {'failed':>7} {'retried':>8} "
+          f"{'p50, ms':>8} {'p99, ms':>8} {'heap, MB':>9} {'rss, MB':>8}")
+    for r in results:
+        print(f"{r['size']:>10} {r['rate']:>8.1f} {r['success']:>8} {r['failed']:>7} {r['retried']:>8} "
+              f"{r['p50'] * 1000:>8.1f} {r['p99'] * 1000:>8.1f} {r['heap_peak']:>9.1f} {r['rss_peak']:>8.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Comma-separated mailing sizes.")
+    parser.add_argument("--path", choices=("mailing", "broadcast"), default="mailing")
+    parser.add_argument("--rate", type=float, default=25, help="Sender rate limit, messages per second.")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--server", help="Base URL of an already running fake server.")
+    parser.add_argument("--port", type=int, default=8081, help="Port for the fake server started here.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake server mean response time.")
+    parser.add_argument("--limit", type=float, default=30, help="Fake server requests per second before 429.")
+    parser.add_argument("--flood-share", type=float, default=0.0, help="Fake server share of random 429.")
+    parser.add_argument("--blocked-share", type=float, default=0.05, help="Share of recipients answering 403.")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,152 @@
+"""
+Local stand-in for the Telegram Bot API server, for load tests of mailings.
+
+Answers every /bot<token>/<method> request after a simulated latency. Recipients whose
+chat id falls into the blocked share get 403 "bot was blocked by the user"; requests above
+the global limit (and a random share on top of it) get 429 with retry_after, like the real
+flood control. Point a Bot at it with
+`AiohttpSession(api=TelegramAPIServer.from_base("http://127.0.0.1:8081"))`.
+
+Usage (from the repository root):
+    python scripts/mailing/fake_bot_api.py [--port 8081] [--latency 0.05] [--limit 30]
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+
+from aiohttp import web
+
+
+class FakeBotApi:
+    def __init__(self, latency: float = 0.05, jitter: float = 0.02, slow_share: float = 0.01,
+                 slow_latency: float = 1.0, limit: float = 30, retry_after: int = 1,
+                 flood_share: float = 0.0, blocked_share: float = 0.05) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.slow_share = slow_share
+        self.slow_latency = slow_latency
+        self.limit = limit
+        self.retry_after = retry_after
+        self.flood_share = flood_share
+        self.blocked_share = blocked_share
+        self.stats = Counter()
+        self._tokens = limit
+        self._updated = time.monotonic()
+        self._message_id = 0
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/stats", self.get_stats)
+        app.router.add_route("*", "/bot{token}/{method}", self.handle)
+        return app
+
+    async def get_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(dict(self.stats))
+
+    def _is_blocked(self, chat_id: str) -> bool:
+        # Deterministic and spread over the id range, so a retried recipient stays blocked
+        return (int(chat_id) * 2654435761) % 10_000 < self.blocked_share * 10_000
+
+    def _is_flooded(self) -> bool:
+        if self.flood_share and random.random() < self.flood_share:
+            return True
+        if not self.limit:
+            return False
+        now = time.monotonic()
+        self._tokens = min(self.limit, self._tokens + (now - self._updated) * self.limit)
+        self._updated = now
+        if self._tokens < 1:
+            return True
+        self._tokens -= 1
+        return False
+
+    def _delay(self) -> float:
+        if random.random() < self.slow_share:
+            return self.slow_latency
+        return max(0.0, random.gauss(self.latency, self.jitter))
+
+    def _message(self, chat_id: str, data) -> dict:
+        self._message_id += 1
+        return {
+            "message_id": self._message_id,
+            "date": int(time.time()),
+            "chat": {"id": int(chat_id), "type": "private"},
+            "text": data.get("text", ""),
+        }
+
+    def _result(self, method: str, data):
+        chat_id = data.get("chat_id", "0")
+        method = method.lower()
+        if method == "getme":
+            return {"id": 42, "is_bot": True, "first_name": "Fake bot", "username": "fake_bot"}
+        if method == "copymessage":
+            self._message_id += 1
+            return {"message_id": self._message_id}
+        if method == "copymessages":
+            message_ids = json.loads(data.get("message_ids", "[]"))
+            self._message_id += len(message_ids)
+            return [{"message_id": self._message_id - i} for i in reversed(range(len(message_ids)))]
+        if method.startswith("send") or method.startswith("edit"):
+            return self._message(chat_id, data)
+        return True
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        data = await request.post()
+        await asyncio.sleep(self._delay())
+
+        chat_id = data.get("chat_id")
+        if chat_id is not None and self._is_flooded():
+            self.stats["429"] += 1
+            return web.json_response({
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            }, status=429)
+        if chat_id is not None and self._is_blocked(chat_id):
+            self.stats["403"] += 1
+            return web.json_response({
+                "ok": False,
+                "error_code": 403,
+                "description": "Forbidden: bot was blocked by the user",
+            }, status=403)
+
+        self.stats["200"] += 1
+        return web.json_response({"ok": True, "result": self._result(method, data)})
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency", type=float, default=0.05, help="Mean response time, seconds.")
+    parser.add_argument("--jitter", type=float, default=0.02, help="Standard deviation of the response time.")
+    parser.add_argument("--slow-share", type=float, default=0.01, help="Share of requests answered slowly.")
+    parser.add_argument("--slow-latency", type=float, default=1.0, help="Response time of slow requests.")
+    parser.add_argument("--limit", type=float, default=30, help="Requests per second before 429; 0 disables.")
+    parser.add_argument("--retry-after", type=int, default=1, help="retry_after sent with 429.")
+    parser.add_argument("--flood-share", type=float, default=0.0, help="Share of random 429 on top of --limit.")
+    parser.add_argument("--blocked-share", type=float, default=0.05, help="Share of recipients answering 403.")
+
+
+def from_arguments(args: argparse.Namespace) -> FakeBotApi:
+    return FakeBotApi(
+        latency=args.latency,
+        jitter=args.jitter,
+        slow_share=args.slow_share,
+        slow_latency=args.slow_latency,
+        limit=args.limit,
+        retry_after=args.retry_after,
+        flood_share=args.flood_share,
+        blocked_share=args.blocked_share,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    add_arguments(parser)
+    args = parser.parse_args()
+    web.run_app(from_arguments(args).app(), host=args.host, port=args.port, access_log=None)
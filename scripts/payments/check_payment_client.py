@@ -0,0 +1,195 @@
+"""
+Check of the MAPI client against a local fake acquirer: signing, retries and error handling.
+
+Starts a fake MAPI server in-process that checks the Token of every request with its own
+implementation of the signing rules and answers Init and GetState the way each scenario asks
+(success, HTTP 500, a response slower than the client timeout). The scenarios assert that:
+
+- Init and GetState requests are signed correctly and HTTP notifications verify;
+- Init is sent exactly once, even when it fails or times out, so no duplicate payments appear;
+- GetState is retried after a server error and gives up within the deadline;
+- the event loop keeps running while a request is stuck.
+
+Nothing touches the database or the real acquirer. Exits with a non-zero status on failure.
+
+Usage (from the repository root):
+    python scripts/payments/check_payment_client.py
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from aiohttp import web  # noqa: E402
+
+from tgbot.services.catalog import ProductInfo  # noqa: E402
+from tgbot.utils.payment_utils import Payment  # noqa: E402
+
+TERMINAL_KEY = "TestTerminal"
+PASSWORD = "test-password"
+
+
+def sign(data: dict, password: str) -> str:
+    """MAPI token: sha256 over the top-level scalar values sorted by key, with Password added."""
+    values = {"Password": password}
+    for key, value in data.items():
+        if key == "Token" or isinstance(value, (dict, list)):
+            continue
+        values[key] = ("true" if value else "false") if isinstance(value, bool) else str(value)
+    return hashlib.sha256("".join(values[key] for key in sorted(values)).encode()).hexdigest()
+
+
+class FakeMapi:
+    def __init__(self, timeout: float) -> None:
+        self.timeout = timeout
+        self.mode = {"Init": "ok", "GetState": "ok"}
+        self.failures = 0
+        self.requests = Counter()
+        self.bad_tokens = 0
+
+    def reset(self, init: str = "ok", get_state: str = "ok", failures: int = 0) -> None:
+        self.mode = {"Init": init, "GetState": get_state}
+        self.failures = failures
+        self.requests.clear()
+        self.bad_tokens = 0
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/v2/{method}", self.handle)
+        return app
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        data = await request.json()
+        self.requests[method] += 1
+
+        if data.get("TerminalKey") != TERMINAL_KEY or data.get("Token") != sign(data, PASSWORD):
+            self.bad_tokens += 1
+            return web.json_response({"Success": False, "ErrorCode": "204", "Message": "Неверный токен"})
+
+        mode = self.mode[method]
+        if mode == "slow":
+            await asyncio.sleep(self.timeout * 4)
+        if mode == "error" or (mode == "flaky" and self.requests[method] <= self.failures):
+            return web.Response(status=500, text="Internal Server Error")
+
+        if method == "Init":
+            return web.json_response({
+                "Success": True,
+                "ErrorCode": "0",
+                "TerminalKey": TERMINAL_KEY,
+                "Status": "NEW",
+                "PaymentId": "1000001",
+                "OrderId": data["OrderId"],
+                "Amount": data["Amount"],
+                "PaymentURL": "https://pay.example/1000001",
+            })
+        return web.json_response({
+            "Success": True,
+            "ErrorCode": "0",
+            "TerminalKey": TERMINAL_KEY,
+            "Status": "CONFIRMED",
+            "PaymentId": data["PaymentId"],
+        })
+
+
+async def max_loop_lag(coro) -> tuple[object, float]:
+    """Runs the coroutine and measures the longest event loop stall meanwhile."""
+    lag = 0.0
+    done = asyncio.Event()
+
+    async def ticker() -> None:
+        nonlocal lag
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(0.01)
+            lag = max(lag, time.perf_counter() - started - 0.01)
+
+    task = asyncio.create_task(ticker())
+    try:
+        return await coro, lag
+    finally:
+        done.set()
+        await task
+
+
+async def main(timeout: float, deadline: float) -> int:
+    fake = FakeMapi(timeout)
+    runner = web.AppRunner(fake.app())
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    payment = Payment(TERMINAL_KEY, PASSWORD, url=f"http://127.0.0.1:{port}", timeout=timeout, deadline=deadline)
+    product = ProductInfo(id=1, name="Курс", info="", description=None, price=4990)
+    failures = 0
+
+    def check(name: str, ok: bool, details: str) -> None:
+        nonlocal failures
+        failures += not ok
+        print(f"{name:28} {'ok' if ok else 'FAIL'}   {details}")
+
+    try:
+        fake.reset()
+        response = await payment.create_payment("17", product.name, "user@example.com", product)
+        check("init signed", response.get("Success") is True and fake.bad_tokens == 0
+              and response.get("PaymentId") == "1000001" and response.get("PaymentURL"),
+              f"requests {dict(fake.requests)}, payment {response.get('PaymentId')}")
+
+        for mode in ("error", "slow"):
+            fake.reset(init=mode)
+            started = time.perf_counter()
+            response, lag = await max_loop_lag(
+                payment.create_payment("18", product.name, "user@example.com", product)
+            )
+            elapsed = time.perf_counter() - started
+            check(f"init {mode} not retried", "error" in response and fake.requests["Init"] == 1
+                  and elapsed < deadline and lag < 0.1,
+                  f"{fake.requests['Init']} requests in {elapsed:.2f} s, loop lag {lag * 1000:.0f} ms")
+
+        fake.reset()
+        status = await payment.get_payment_status("1000001")
+        check("get_state signed", status is True and fake.bad_tokens == 0, f"requests {dict(fake.requests)}")
+
+        fake.reset(get_state="flaky", failures=2)
+        status = await payment.get_payment_status("1000001")
+        check("get_state retried", status is True and fake.requests["GetState"] == 3,
+              f"{fake.requests['GetState']} requests")
+
+        fake.reset(get_state="slow")
+        started = time.perf_counter()
+        status, lag = await max_loop_lag(payment.get_payment_status("1000001"))
+        elapsed = time.perf_counter() - started
+        check("get_state within deadline", status is False and elapsed < deadline + 0.5 and lag < 0.1,
+              f"{fake.requests['GetState']} requests in {elapsed:.2f} s, loop lag {lag * 1000:.0f} ms")
+
+        notification = {
+            "TerminalKey": TERMINAL_KEY, "OrderId": "17", "Success": True, "Status": "CONFIRMED",
+            "PaymentId": 1000001, "ErrorCode": "0", "Amount": 499000, "Data": {"Source": "check"},
+        }
+        notification["Token"] = sign(notification, PASSWORD)
+        tampered = dict(notification, Amount=100)
+        foreign = dict(notification, TerminalKey="OtherTerminal")
+        check("notification verified", payment.verify_notification(notification)
+              and not payment.verify_notification(tampered) and not payment.verify_notification(foreign),
+              "signed accepted, tampered and foreign rejected")
+    finally:
+        await payment.close()
+        await runner.cleanup()
+
+    print(f"\n{'all checks passed' if not failures else f'{failures} checks failed'}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--timeout", type=float, default=0.5, help="Client timeout of a single request, seconds.")
+    parser.add_argument("--deadline", type=float, default=5.0, help="Client deadline of a call with retries.")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.timeout, args.deadline)))
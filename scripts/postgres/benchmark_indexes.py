@@ -0,0 +1,143 @@
+"""
+Query plans and timings of the hot audience/statistics queries with and without the lookup indexes.
+
+Builds a throwaway `bench` schema in the database from .env, fills it with a generated dataset
+(1M users by default), runs EXPLAIN ANALYZE for every query without the indexes declared on the
+models, then creates them and runs the same queries again. The schema is dropped at the end.
+
+Usage (from the repository root):
+    python scripts/postgres/benchmark_indexes.py [--users 1000000]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from sqlalchemy import func, or_, select, text  # noqa: E402
+from sqlalchemy.dialects import postgresql  # noqa: E402
+from sqlalchemy.orm import aliased  # noqa: E402
+from sqlalchemy.schema import CreateIndex, DropIndex  # noqa: E402
+
+from infrastructure.database.models import Base, User, Purchase, Lesson  # noqa: E402
+from infrastructure.database.setup import create_engine  # noqa: E402
+from tgbot.config import load_config  # noqa: E402
+
+SCHEMA = "bench"
+
+
+def queries() -> dict:
+    """The same statements UserRepo/PurchaseRepo issue."""
+    lesson_alias = aliased(Lesson)
+    return {
+        "UserRepo.get_all_users": (
+            select(User, Purchase.is_paid, lesson_alias.lesson_number)
+            .outerjoin(Purchase, User.id == Purchase.user_id)
+            .outerjoin(lesson_alias, User.id == lesson_alias.user_id)
+        ),
+        "UserRepo.get_users_with_payment": (
+            select(User, Purchase.is_paid)
+            .join(Purchase, User.id == Purchase.user_id)
+            .where(Purchase.is_paid == True)
+        ),
+        "UserRepo.get_users_without_payment": (
+            select(User, Purchase.is_paid)
+            .outerjoin(Purchase, User.id == Purchase.user_id)
+            .where(or_(Purchase.is_paid == False, Purchase.is_paid == None))
+        ),
+        "PurchaseRepo.get_paid_users_count": (
+            select(func.count(User.id))
+            .join(Purchase, Purchase.user_id == User.id)
+            .filter(Purchase.is_paid == True)
+        ),
+        "users by deeplink": (
+            select(func.count(User.id)).where(User.deeplink == 7)
+        ),
+    }
+
+
+def indexes():
+    return [index for table in (User.__table__, Purchase.__table__) for index in table.indexes]
+
+
+def compile_sql(stmt) -> str:
+    return str(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+async def fill(conn, users: int) -> None:
+    await conn.execute(text(
+        "INSERT INTO users (id, full_name, username, deeplink, is_premium) "
+        "SELECT g, 'user ' || g, 'user' || g, CASE WHEN g % 5 = 0 THEN g % 50 END, g % 7 = 0 "
+        "FROM generate_series(1, :n) g"
+    ), {"n": users})
+    await conn.execute(text(
+        "INSERT INTO products (id, name, info, price) VALUES (1, 'bench', 'bench', 2490)"
+    ))
+    # 30% of users started a payment, a third of them paid
+    await conn.execute(text(
+        "INSERT INTO purchases (id, payment_id, user_id, product_id, amount, is_paid) "
+        "SELECT nextval('purchase_id_seq'), g, g, 1, 2490, g % 3 = 0 "
+        "FROM generate_series(1, :n) g WHERE g % 10 < 3"
+    ), {"n": users})
+    await conn.execute(text(
+        "INSERT INTO lessons (user_id, lesson_number) "
+        "SELECT g, 1 + g % 3 FROM generate_series(1, :n) g WHERE g % 2 = 0"
+    ), {"n": users})
+    await conn.execute(text("ANALYZE"))
+
+
+async def explain_all(conn, title: str) -> dict:
+    print(f"\n===== {title} =====")
+    timings = {}
+    for name, stmt in queries().items():
+        sql = compile_sql(stmt)
+        started = time.perf_counter()
+        result = await conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {sql}"))
+        timings[name] = time.perf_counter() - started
+        print(f"\n--- {name}: {timings[name] * 1000:.1f} ms")
+        for row in result:
+            print(row[0])
+    return timings
+
+
+async def main(users: int) -> None:
+    config = load_config(".env")
+    engine = create_engine(config.db)
+
+    async with engine.connect() as conn:
+        await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        await conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        await conn.execute(text(f"SET search_path TO {SCHEMA}"))
+        await conn.run_sync(Base.metadata.create_all)
+        for index in indexes():
+            await conn.execute(DropIndex(index))
+
+        print(f"Generating {users} users...")
+        await fill(conn, users)
+        await conn.commit()
+
+        before = await explain_all(conn, "without indexes")
+
+        for index in indexes():
+            await conn.execute(CreateIndex(index))
+        await conn.execute(text("ANALYZE"))
+        await conn.commit()
+
+        after = await explain_all(conn, "with indexes")
+
+        print("\n===== summary =====")
+        for name in before:
+            print(f"{name:40} {before[name] * 1000:10.1f} ms -> {after[name] * 1000:10.1f} ms")
+
+        await conn.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+        await conn.commit()
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=1_000_000)
+    asyncio.run(main(parser.parse_args().users))
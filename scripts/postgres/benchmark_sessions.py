@@ -0,0 +1,117 @@
+"""
+Per-update database overhead: an engine per update versus one shared engine and session pool.
+
+"per-update" reproduces the code before the shared pool: every DB-touching update built its
+own engine, ran create_all and then the query. "shared" is the current setup: one engine and
+sessionmaker for the process, a session checked out per update. Both run the same user lookup
+for --updates updates, --concurrency at a time, in a throwaway `bench` schema of the database
+from .env, and report updates/s and p50/p99 latency.
+
+Usage (from the repository root):
+    python scripts/postgres/benchmark_sessions.py [--updates 2000] [--concurrency 20]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from sqlalchemy import select, text  # noqa: E402
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+
+from infrastructure.database.models import Base, User  # noqa: E402
+from infrastructure.database.setup import create_engine, create_session_pool  # noqa: E402
+from tgbot.config import load_config  # noqa: E402
+
+SCHEMA = "bench"
+
+
+def percentile(values: list[float], share: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+async def per_update(url: str, user_id: int) -> None:
+    engine = create_async_engine(url, connect_args={"server_settings": {"search_path": SCHEMA}})
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with engine.connect() as conn:
+            await conn.execute(select(User).where(User.id == user_id))
+    finally:
+        await engine.dispose()
+
+
+async def run(name: str, handle, updates: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    durations = []
+
+    async def one(user_id: int) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            await handle(user_id)
+            durations.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i % 1000 + 1) for i in range(updates)))
+    elapsed = time.perf_counter() - started
+    print(f"{name}: {updates} updates in {elapsed:.1f} s")
+    return {
+        "rate": updates / elapsed,
+        "p50": percentile(durations, 0.50),
+        "p99": percentile(durations, 0.99),
+    }
+
+
+async def main(updates: int, concurrency: int) -> None:
+    config = load_config(".env")
+    url = config.db.construct_sqlalchemy_url()
+
+    setup_engine = create_engine(config.db)
+    async with setup_engine.begin() as conn:
+        await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        await conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        await conn.execute(text(f"SET search_path TO {SCHEMA}"))
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(text(
+            "INSERT INTO users (id, full_name, username, is_premium) "
+            "SELECT g, 'user ' || g, 'user' || g, false FROM generate_series(1, 1000) g"
+        ))
+    await setup_engine.dispose()
+
+    # per-update connections add up quickly; keep them under max_connections
+    results = {"per-update": await run(
+        "per-update", lambda user_id: per_update(url, user_id), updates, min(concurrency, 20)
+    )}
+
+    engine = create_async_engine(
+        url, pool_size=10, max_overflow=200, connect_args={"server_settings": {"search_path": SCHEMA}}
+    )
+    session_pool = create_session_pool(engine)
+
+    async def shared(user_id: int) -> None:
+        async with session_pool() as session:
+            await session.execute(select(User).where(User.id == user_id))
+
+    results["shared"] = await run("shared", shared, updates, concurrency)
+    await engine.dispose()
+
+    setup_engine = create_engine(config.db)
+    async with setup_engine.begin() as conn:
+        await conn.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+    await setup_engine.dispose()
+
+    print("\n===== summary =====")
+    for name, r in results.items():
+        print(f"{name:12} {r['rate']:10.1f} updates/s   p50 {r['p50'] * 1000:8.1f} ms   "
+              f"p99 {r['p99'] * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.updates, args.concurrency))
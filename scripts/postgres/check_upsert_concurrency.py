@@ -0,0 +1,88 @@
+"""
+Concurrency check of the first-contact upserts: no duplicate rows, no IntegrityError.
+
+Creates the schema in a throwaway `bench` schema of the database from .env and fires --calls
+concurrent UserRepo.get_or_create_user and LessonRepo.get_or_create_lesson_progress calls for
+the same user id, each in its own session and transaction like separate updates. Exits with
+a non-zero status if any call fails or more than one row exists afterwards.
+
+This is a manual check, not part of an automated suite: the repository has no test runner and
+the check needs a live PostgreSQL. Run it after changing UserRepo.get_or_create_user,
+LessonRepo.get_or_create_lesson_progress or the unique constraints they rely on.
+
+Usage (from the repository root):
+    python scripts/postgres/check_upsert_concurrency.py [--calls 50] [--rounds 20]
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from sqlalchemy import func, select, text  # noqa: E402
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+
+from infrastructure.database.models import Base, User, Lesson  # noqa: E402
+from infrastructure.database.repo.requests import RequestsRepo  # noqa: E402
+from infrastructure.database.setup import create_session_pool  # noqa: E402
+from tgbot.config import load_config  # noqa: E402
+
+SCHEMA = "bench"
+
+
+async def first_contact(session_pool, user_id: int, n: int) -> None:
+    async with session_pool() as session:
+        repo = RequestsRepo(session)
+        await repo.users.get_or_create_user(user_id, f"user {n}", False, f"user{n}")
+        await repo.lessons.get_or_create_lesson_progress(user_id)
+        await session.commit()
+
+
+async def main(calls: int, rounds: int) -> int:
+    config = load_config(".env")
+    engine = create_async_engine(
+        config.db.construct_sqlalchemy_url(),
+        pool_size=calls,
+        connect_args={"server_settings": {"search_path": SCHEMA}},
+    )
+    async with engine.begin() as conn:
+        await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        await conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        await conn.run_sync(Base.metadata.create_all)
+    session_pool = create_session_pool(engine)
+
+    failures = 0
+    try:
+        for user_id in range(1, rounds + 1):
+            results = await asyncio.gather(
+                *(first_contact(session_pool, user_id, n) for n in range(calls)), return_exceptions=True
+            )
+            errors = [r for r in results if isinstance(r, BaseException)]
+            async with session_pool() as session:
+                users = (await session.execute(select(func.count()).where(User.id == user_id))).scalar_one()
+                lessons = (await session.execute(
+                    select(func.count()).where(Lesson.user_id == user_id)
+                )).scalar_one()
+
+            ok = not errors and users == 1 and lessons == 1
+            failures += not ok
+            print(f"user {user_id}: {calls} calls, {len(errors)} errors, {users} users, {lessons} lessons"
+                  f" - {'ok' if ok else 'FAIL'}")
+            for error in errors[:3]:
+                print(f"    {error!r}")
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+        await engine.dispose()
+
+    print(f"\n{rounds - failures}/{rounds} rounds passed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=50, help="Concurrent calls per user id.")
+    parser.add_argument("--rounds", type=int, default=20, help="Number of user ids to try.")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.calls, args.rounds)))
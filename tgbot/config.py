@@ -79,6 +79,49 @@ class DbConfig:
         )
 
 
+@dataclass
+class RedisConfig:
+    """
+    Redis configuration class.
+
+    Attributes
+    ----------
+    redis_pass : Optional(str)
+        The password used to authenticate with Redis.
+    redis_port : Optional(int)
+        The port where Redis server is listening.
+    redis_host : Optional(str)
+        The host where Redis server is located.
+    """
+
+    redis_pass: Optional[str]
+    redis_port: Optional[int]
+    redis_host: Optional[str]
+
+    def dsn(self) -> str:
+        """
+        Constructs and returns a Redis DSN (Data Source Name) for this database configuration.
+        """
+        if self.redis_pass:
+            return f"redis://:{self.redis_pass}@{self.redis_host}:{self.redis_port}/0"
+        else:
+            return f"redis://{self.redis_host}:{self.redis_port}/0"
+
+    @staticmethod
+    def from_env(env: Env):
+        """
+        Creates the RedisConfig object from environment variables.
+        Defaults point to a plain local Redis without a password.
+        """
+        redis_pass = env.str("REDIS_PASSWORD", None)
+        redis_port = env.int("REDIS_PORT", 6379)
+        redis_host = env.str("REDIS_HOST", "localhost")
+
+        return RedisConfig(
+            redis_pass=redis_pass, redis_port=redis_port, redis_host=redis_host
+        )
+
+
 @dataclass
 class TgBot:
     """
@@ -106,13 +149,249 @@ class TgBot:
 class Payment:
     terminal_key: str
     password: str
+    timeout: float = 10
+    deadline: float = 20
+    reconcile_interval: int = 60
+    reconcile_max_age_hours: int = 24
+    reconcile_concurrency: int = 5
+    check_cache_ttl: float = 5
 
     @staticmethod
     def from_env(env: Env):
         terminal_key = env.str("PAYMENT_TERMINAL_KEY")
         password = env.str("PAYMENT_PASSWORD")
+        # Per HTTP request, and per call including retries
+        timeout = env.float("PAYMENT_TIMEOUT", 10)
+        deadline = env.float("PAYMENT_DEADLINE", 20)
+        # Background GetState checks of unpaid purchases
+        reconcile_interval = env.int("PAYMENT_RECONCILE_INTERVAL", 60)
+        reconcile_max_age_hours = env.int("PAYMENT_RECONCILE_MAX_AGE_HOURS", 24)
+        reconcile_concurrency = env.int("PAYMENT_RECONCILE_CONCURRENCY", 5)
+        # How long the result of a "check payment" press is reused
+        check_cache_ttl = env.float("PAYMENT_CHECK_CACHE_TTL", 5)
+
+        return Payment(
+            terminal_key=terminal_key,
+            password=password,
+            timeout=timeout,
+            deadline=deadline,
+            reconcile_interval=reconcile_interval,
+            reconcile_max_age_hours=reconcile_max_age_hours,
+            reconcile_concurrency=reconcile_concurrency,
+            check_cache_ttl=check_cache_ttl,
+        )
+
+
+@dataclass
+class CacheConfig:
+    """
+    In-memory cache settings.
+
+    Attributes
+    ----------
+    user_cache_enabled : bool
+        Switch for the user existence cache in front of UserRepo.
+    user_cache_size : int
+        Maximum number of cached users.
+    user_cache_ttl : int
+        Lifetime of a cached entry in seconds.
+    scenario_cache_size : int
+        Maximum number of compiled deeplink scenarios kept in memory.
+    scenario_cache_ttl : int
+        Lifetime of a compiled scenario in seconds; edits from any process are caught by the version check.
+    catalog_refresh_interval : int
+        How often the in-memory product catalog is reloaded, in seconds.
+    """
+
+    user_cache_enabled: bool = True
+    user_cache_size: int = 50_000
+    user_cache_ttl: int = 600
+    scenario_cache_size: int = 256
+    scenario_cache_ttl: int = 3600
+    catalog_refresh_interval: int = 3600
+
+    @staticmethod
+    def from_env(env: Env):
+        """
+        Creates the CacheConfig object from environment variables.
+        """
+        user_cache_enabled = env.bool("USER_CACHE_ENABLED", True)
+        user_cache_size = env.int("USER_CACHE_SIZE", 50_000)
+        user_cache_ttl = env.int("USER_CACHE_TTL", 600)
+        scenario_cache_size = env.int("SCENARIO_CACHE_SIZE", 256)
+        scenario_cache_ttl = env.int("SCENARIO_CACHE_TTL", 3600)
+        catalog_refresh_interval = env.int("CATALOG_REFRESH_INTERVAL", 3600)
+        return CacheConfig(
+            user_cache_enabled=user_cache_enabled,
+            user_cache_size=user_cache_size,
+            user_cache_ttl=user_cache_ttl,
+            scenario_cache_size=scenario_cache_size,
+            scenario_cache_ttl=scenario_cache_ttl,
+            catalog_refresh_interval=catalog_refresh_interval,
+        )
+
+
+@dataclass
+class RequestSchedulerConfig:
+    """
+    Outgoing Bot API request scheduler settings.
 
-        return Payment(terminal_key=terminal_key, password=password)
+    Attributes
+    ----------
+    rate : float
+        Global limit of chat requests per second, shared by interactive and bulk traffic.
+    per_chat_rate : float
+        Sustained limit of requests per second to one chat.
+    per_chat_burst : int
+        How many requests to one chat may go out back to back before per_chat_rate applies.
+    """
+
+    rate: float = 30
+    per_chat_rate: float = 1.0
+    per_chat_burst: int = 3
+
+    @staticmethod
+    def from_env(env: Env):
+        """
+        Creates the RequestSchedulerConfig object from environment variables.
+        """
+        rate = env.float("API_RATE", 30)
+        per_chat_rate = env.float("API_PER_CHAT_RATE", 1.0)
+        per_chat_burst = env.int("API_PER_CHAT_BURST", 3)
+        return RequestSchedulerConfig(rate=rate, per_chat_rate=per_chat_rate, per_chat_burst=per_chat_burst)
+
+
+@dataclass
+class InviteLinkConfig:
+    """
+    Invite link pool settings.
+
+    Attributes
+    ----------
+    pool_size : int
+        How many free single-use links to the channel are kept ready.
+    low_watermark : int
+        Issuing a link that leaves fewer free links than this starts a refill right away.
+    refill_interval : int
+        How often, in seconds, the pool is topped up otherwise.
+    """
+
+    pool_size: int = 20
+    low_watermark: int = 5
+    refill_interval: int = 300
+
+    @staticmethod
+    def from_env(env: Env):
+        """
+        Creates the InviteLinkConfig object from environment variables.
+        """
+        pool_size = env.int("INVITE_POOL_SIZE", 20)
+        low_watermark = env.int("INVITE_POOL_LOW_WATERMARK", 5)
+        refill_interval = env.int("INVITE_POOL_REFILL_INTERVAL", 300)
+        return InviteLinkConfig(pool_size=pool_size, low_watermark=low_watermark, refill_interval=refill_interval)
+
+
+@dataclass
+class MailingConfig:
+    """
+    Mailing worker settings.
+
+    Attributes
+    ----------
+    batch_size : int
+        Recipients read and checkpointed per batch.
+    poll_interval : int
+        How often, in seconds, the worker looks for jobs when nobody wakes it up.
+    rate : float
+        Global limit of outgoing mass messages per second (Telegram allows about 30).
+    concurrency : int
+        How many send requests may be in flight at once.
+    max_retries : int
+        How many times a recipient is re-queued after a flood wait before it counts as failed.
+    progress_interval : int
+        How often, in seconds, the status message of a running mailing is updated.
+    reports_dir : str
+        Directory for the per-recipient delivery reports. In "redis" mode every mailing_worker.py
+        writes its report part here and the bot reads them all, so the directory must be shared
+        between the bot and the workers (a common volume).
+    report_retention_days : int
+        Reports older than this are deleted.
+    timezone : str
+        Time zone in which admins enter the send time of scheduled mailings.
+    peak_hours_enabled : bool
+        Whether large mailings are slowed down during peak hours; off by default.
+    peak_start : int
+        Hour (in `timezone`) when peak interactive traffic starts.
+    peak_end : int
+        Hour (in `timezone`) when peak interactive traffic ends.
+    peak_rate_factor : float
+        Share of `rate` that large mailings may use during peak hours.
+    large_job_size : int
+        Remaining audience from which a mailing counts as large.
+    mode : str
+        "local" sends from the bot process; "redis" only queues recipient batches in Redis
+        for separate `mailing_worker.py` processes.
+    max_backlog : int
+        In "redis" mode, how many queued recipients per job are allowed before the bot
+        stops reading the audience ahead.
+    """
+
+    batch_size: int = 200
+    poll_interval: int = 30
+    rate: float = 25
+    concurrency: int = 10
+    max_retries: int = 3
+    progress_interval: int = 5
+    reports_dir: str = "reports"
+    report_retention_days: int = 7
+    timezone: str = "Europe/Moscow"
+    peak_hours_enabled: bool = False
+    peak_start: int = 18
+    peak_end: int = 23
+    peak_rate_factor: float = 0.3
+    large_job_size: int = 5000
+    mode: str = "local"
+    max_backlog: int = 2000
+
+    @staticmethod
+    def from_env(env: Env):
+        """
+        Creates the MailingConfig object from environment variables.
+        """
+        batch_size = env.int("MAILING_BATCH_SIZE", 200)
+        poll_interval = env.int("MAILING_POLL_INTERVAL", 30)
+        rate = env.float("MAILING_RATE", 25)
+        concurrency = env.int("MAILING_CONCURRENCY", 10)
+        max_retries = env.int("MAILING_MAX_RETRIES", 3)
+        progress_interval = env.int("MAILING_PROGRESS_INTERVAL", 5)
+        reports_dir = env.str("MAILING_REPORTS_DIR", "reports")
+        report_retention_days = env.int("MAILING_REPORT_RETENTION_DAYS", 7)
+        timezone = env.str("MAILING_TIMEZONE", "Europe/Moscow")
+        peak_hours_enabled = env.bool("MAILING_PEAK_HOURS_ENABLED", False)
+        peak_start = env.int("MAILING_PEAK_START", 18)
+        peak_end = env.int("MAILING_PEAK_END", 23)
+        peak_rate_factor = env.float("MAILING_PEAK_RATE_FACTOR", 0.3)
+        large_job_size = env.int("MAILING_LARGE_JOB_SIZE", 5000)
+        mode = env.str("MAILING_MODE", "local")
+        max_backlog = env.int("MAILING_MAX_BACKLOG", 2000)
+        return MailingConfig(
+            batch_size=batch_size,
+            poll_interval=poll_interval,
+            rate=rate,
+            concurrency=concurrency,
+            max_retries=max_retries,
+            progress_interval=progress_interval,
+            reports_dir=reports_dir,
+            report_retention_days=report_retention_days,
+            timezone=timezone,
+            peak_hours_enabled=peak_hours_enabled,
+            peak_start=peak_start,
+            peak_end=peak_end,
+            peak_rate_factor=peak_rate_factor,
+            large_job_size=large_job_size,
+            mode=mode,
+            max_backlog=max_backlog,
+        )
 
 
 @dataclass
@@ -178,12 +457,25 @@ class Config:
         Holds the settings specific to the database (default is None).
     redis : Optional[RedisConfig]
         Holds the settings specific to Redis (default is None).
+    cache : Optional[CacheConfig]
+        Holds the settings of the in-memory caches (default is None).
+    mailing : Optional[MailingConfig]
+        Holds the settings of the mailing worker (default is None).
+    request_scheduler : Optional[RequestSchedulerConfig]
+        Holds the settings of the outgoing request scheduler (default is None).
+    invite_links : Optional[InviteLinkConfig]
+        Holds the settings of the invite link pool (default is None).
     """
 
     tg_bot: TgBot
     payment: Payment
     db: Optional[DbConfig] = None
+    redis: Optional[RedisConfig] = None
     messages: Optional[Messages] = None
+    cache: Optional[CacheConfig] = None
+    mailing: Optional[MailingConfig] = None
+    request_scheduler: Optional[RequestSchedulerConfig] = None
+    invite_links: Optional[InviteLinkConfig] = None
 
 
 def load_config(path: str = None) -> Config:
@@ -203,5 +495,10 @@ def load_config(path: str = None) -> Config:
         tg_bot=TgBot.from_env(env),
         payment=Payment.from_env(env),
         db=DbConfig.from_env(env),
-        messages=Messages.from_env(env)
+        redis=RedisConfig.from_env(env),
+        messages=Messages.from_env(env),
+        cache=CacheConfig.from_env(env),
+        mailing=MailingConfig.from_env(env),
+        request_scheduler=RequestSchedulerConfig.from_env(env),
+        invite_links=InviteLinkConfig.from_env(env),
     )
@@ -1,27 +1,36 @@
-import asyncio
 import os
-from datetime import datetime
+from datetime import datetime, timezone
 from linecache import cache
+from typing import Optional
+from zoneinfo import ZoneInfo
 
 from aiogram import Router, F, Bot
-from aiogram.exceptions import TelegramRetryAfter, TelegramForbiddenError
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message, CallbackQuery, InputFile, FSInputFile
 from aiogram.utils.deep_linking import create_start_link
 
+from infrastructure.database.models import MailingStatus
+from infrastructure.database.repo.requests import RequestsRepo
 from tgbot.config import Config
 from tgbot.filters.admin import AdminFilter
-from tgbot.keyboards.callback_data import SourceData, TargetData, AudienceData
+from tgbot.keyboards.callback_data import SourceData, TargetData, AudienceData, MailingJobData
 from tgbot.keyboards.inline import admin_keyboard, deeplink_keyboard, source_keyboard, target_keyboard, \
     statistics_keyboard, mailing_keyboard, create_url_keyboard, audience_keyboard, confirm_mailing_keyboard, \
-    enter_keyboard, admin_back_keyboard
+    admin_back_keyboard, mailing_job_keyboard
 from tgbot.misc.states import DeeplinkStates, MailingStates, GrantAccessStates
-from tgbot.utils.admin_utils import save_to_excel, process_mailing_data
-from tgbot.utils.db_utils import get_repo
+from tgbot.services.access import send_channel_invite
+from tgbot.services.catalog import ProductCatalog
+from tgbot.services.invite_links import InviteLinkPool
+from tgbot.middlewares.album import AlbumMiddleware
+from tgbot.services.mailing import MailingWorker, copy_content
+from tgbot.services.request_scheduler import RequestScheduler
+from tgbot.utils.admin_utils import save_to_excel
 
 admin_router = Router()
 admin_router.message.filter(AdminFilter())
+admin_router.message.middleware(AlbumMiddleware())
 
 
 @admin_router.message(Command("admin"))
@@ -29,6 +38,12 @@ async def admin_start(message: Message):
     await message.answer("Привет, админ!", reply_markup=admin_keyboard())
 
 
+@admin_router.message(Command("reload_products"))
+async def reload_products(message: Message, catalog: ProductCatalog):
+    count = await catalog.reload()
+    await message.answer(f"Каталог продуктов обновлён: {count}")
+
+
 @admin_router.callback_query(F.data == "admin_deeplink")
 async def admin_deeplink(call: CallbackQuery):
     await call.message.edit_text("Меню диплинков: ", reply_markup=deeplink_keyboard())
@@ -50,8 +65,7 @@ async def target_admin(call: CallbackQuery, callback_data: TargetData, state: FS
     await call.message.edit_text("Введи ссылку: ")
 
 @admin_router.message(DeeplinkStates.link)
-async def deeplink_link(message: Message, config: Config, state: FSMContext, bot: Bot):
-    repo = await get_repo(config)
+async def deeplink_link(message: Message, config: Config, state: FSMContext, bot: Bot, repo: RequestsRepo):
     data = await state.get_data()
     deeplink = await repo.deeplink.create_deeplink(
         data.get("source"),
@@ -62,20 +76,28 @@ async def deeplink_link(message: Message, config: Config, state: FSMContext, bot
     await message.answer(f"Диплинк: {link}")
 
 @admin_router.callback_query(F.data == "stats")
-async def admin_stats(call: CallbackQuery, config: Config):
-    repo = await get_repo(config)
+async def admin_stats(call: CallbackQuery, config: Config, repo: RequestsRepo,
+                      request_scheduler: Optional[RequestScheduler] = None):
     users_count = await repo.purchases.count_users()
     paid_users_count = await repo.purchases.get_paid_users_count()
     text = (
         f"Количество пользователей: {users_count}\n",
         f"Количество покупок: {paid_users_count}"
     )
+    if repo.user_cache is not None and repo.user_cache.enabled:
+        stats = repo.user_cache.stats()
+        text += (f"\nКэш пользователей: {stats['hits']} попаданий / {stats['misses']} промахов",)
+    if request_scheduler is not None:
+        for lane, stats in request_scheduler.stats().items():
+            text += (
+                f"\nОчередь {lane}: {stats['queued']} в ожидании, ожидание в среднем "
+                f"{stats['avg_wait']:.2f} с, максимум {stats['max_wait']:.2f} с",
+            )
     await call.message.answer("\n".join(text), reply_markup=statistics_keyboard())
 
 
 @admin_router.callback_query(F.data == "table")
-async def admin_table(call: CallbackQuery, config: Config):
-    repo = await get_repo(config)
+async def admin_table(call: CallbackQuery, config: Config, repo: RequestsRepo):
     users = await repo.users.get_all_users()
 
     if not users:
@@ -97,64 +119,44 @@ async def admin_mailing(call: CallbackQuery, config: Config, state: FSMContext):
 
 
 @admin_router.message(MailingStates.message)
-async def mailing_message(message: Message, state: FSMContext):
-    await message.delete()
-    success = await process_mailing_data(message, state)
-    if not success:
-        await message.answer("Тип сообщения не поддерживается. Отправь текст, медиа или документ.",
-                             reply_markup=admin_back_keyboard())
-        return
-
+async def mailing_message(message: Message, state: FSMContext, album: list[Message]):
+    # Сообщение админа не удаляется: рассылка копирует именно его
+    await state.update_data(
+        source_chat_id=message.chat.id,
+        source_message_ids=[item.message_id for item in album],
+    )
     await message.answer("Настройка рассылки:", reply_markup=mailing_keyboard())
 
 
 @admin_router.callback_query(F.data == "preview")
-async def preview_mailing(call: CallbackQuery, state: FSMContext):
+async def preview_mailing(call: CallbackQuery, state: FSMContext, bot: Bot):
     await call.message.delete()
     data = await state.get_data()
-    content_type = data.get("content_type")
-    content = data.get("content")
-    file_id = data.get("file_id")
+    source_message_ids = data.get("source_message_ids")
     buttons = data.get("buttons", [])
 
-    if not content_type:
+    if not source_message_ids:
         await call.answer("Нет данных для предпросмотра. Сначала добавь сообщение.", show_alert=True)
         return
 
-    reply_markup = create_url_keyboard(buttons, preview=True)
-
-    send_kwargs = {
-        "caption": content,
-        "reply_markup": reply_markup
-    } if content_type != "text" else {
-        "text": content,
-        "reply_markup": reply_markup
-    }
-
-    match content_type:
-        case "text":
-            await call.message.answer(**send_kwargs)
-        case "photo":
-            await call.message.answer_photo(photo=file_id, **send_kwargs)
-        case "video":
-            await call.message.answer_video(video=file_id, **send_kwargs)
-        case "animation":
-            await call.message.answer_animation(animation=file_id, **send_kwargs)
-        case "audio":
-            await call.message.answer_audio(audio=file_id, **send_kwargs)
-        case "document":
-            await call.message.answer_document(document=file_id, **send_kwargs)
-        case "sticker":
-            await call.message.answer_sticker(sticker=file_id, **send_kwargs)
-        case "video_note":
-            await call.message.answer_video_note(video_note=file_id, **send_kwargs)
-        case "voice":
-            await call.message.answer_voice(voice=file_id, **send_kwargs)
-        case _:
-            await call.message.answer("Не удалось отобразить данный тип контента.")
+    try:
+        await copy_content(
+            bot,
+            call.message.chat.id,
+            data.get("source_chat_id"),
+            source_message_ids,
+            create_url_keyboard(buttons, preview=True),
+        )
+    except TelegramBadRequest:
+        await call.message.answer("Не удалось отобразить сообщение. Возможно, оно было удалено.")
 
 @admin_router.callback_query(F.data == "mailing_buttons")
 async def ask_for_buttons(call: CallbackQuery, state: FSMContext):
+    data = await state.get_data()
+    if len(data.get("source_message_ids") or []) > 1:
+        await call.answer("К альбому нельзя прикрепить кнопки.", show_alert=True)
+        return
+
     await state.set_state(MailingStates.buttons)
     await call.message.edit_text(
         "Отправь кнопки в формате:\n\n"
@@ -217,92 +219,141 @@ async def private_user_id(message: Message, state: FSMContext):
     )
 
 
+def mailing_data_error(data: dict) -> Optional[str]:
+    if data.get("target_audience") not in ("all", "bought", "nonbought", "private"):
+        return "Не удалось определить аудиторию."
+    if not data.get("source_message_ids"):
+        return "Нет сообщения для рассылки. Сначала добавь сообщение."
+    return None
+
+
+async def create_mailing_job(message: Message, admin_id: int, data: dict, repo: RequestsRepo,
+                             mailing_worker: MailingWorker, scheduled_at: Optional[datetime] = None,
+                             scheduled_text: Optional[str] = None):
+    """
+    Сохраняет задание рассылки и будит воркер. scheduled_at - время запуска в UTC.
+    """
+    target_audience = data.get("target_audience")
+
+    # Это сообщение воркер будет редактировать, показывая ход рассылки
+    status_message = await message.answer("Рассылка создаётся...")
+    mailing = await repo.mailings.create_mailing(
+        created_by=admin_id,
+        content_type="copy",
+        source_chat_id=data.get("source_chat_id"),
+        source_message_ids=data.get("source_message_ids"),
+        buttons=data.get("buttons") or None,
+        audience=target_audience,
+        private_user_id=int(data.get("private_user_id")) if target_audience == "private" else None,
+        status_message_id=status_message.message_id,
+        scheduled_at=scheduled_at,
+    )
+    # Задание должно быть видно воркеру до того, как он проснётся
+    await repo.session.commit()
+    mailing_worker.notify()
+
+    text = f"Рассылка #{mailing.id} запланирована на {scheduled_text}" if scheduled_at \
+        else f"Рассылка #{mailing.id} запущена"
+    await status_message.edit_text(text, reply_markup=mailing_job_keyboard(mailing.id, mailing.status))
+
+
 @admin_router.callback_query(F.data == "confirm_mailing")
-async def confirm_mailing(call: CallbackQuery, config: Config, state: FSMContext):
-    await call.message.delete()
-    repo = await get_repo(config)
+async def confirm_mailing(call: CallbackQuery, config: Config, state: FSMContext, repo: RequestsRepo,
+                          mailing_worker: MailingWorker):
     data = await state.get_data()
+    error = mailing_data_error(data)
+    if error:
+        await call.answer(error, show_alert=True)
+        return
+
+    await call.message.delete()
+    await state.clear()
+    await create_mailing_job(call.message, call.from_user.id, data, repo, mailing_worker)
+
+
+@admin_router.callback_query(F.data == "schedule_mailing")
+async def schedule_mailing(call: CallbackQuery, config: Config, state: FSMContext):
+    error = mailing_data_error(await state.get_data())
+    if error:
+        await call.answer(error, show_alert=True)
+        return
+
+    await state.set_state(MailingStates.send_time)
+    await call.message.edit_text(
+        f"Введи время отправки в формате ДД.ММ.ГГГГ ЧЧ:ММ ({config.mailing.timezone}):",
+        reply_markup=admin_back_keyboard()
+    )
 
-    content_type = data.get("content_type")
-    content = data.get("content")
-    file_id = data.get("file_id")
-    buttons = data.get("buttons", [])
-    target_audience = data.get("target_audience")
 
+@admin_router.message(MailingStates.send_time)
+async def mailing_send_time(message: Message, config: Config, state: FSMContext, repo: RequestsRepo,
+                            mailing_worker: MailingWorker):
+    try:
+        local_time = datetime.strptime(message.text.strip(), "%d.%m.%Y %H:%M")
+    except (AttributeError, ValueError):
+        await message.answer("Неверный формат. Пример: 31.12.2025 10:00")
+        return
 
-    # Получение целевой аудитории
-    if target_audience == "all":
-        users = await repo.users.get_all_users()
-    elif target_audience == "bought":
-        users = await repo.users.get_users_with_payment()
-    elif target_audience == "nonbought":
-        users = await repo.users.get_users_without_payment()
-    elif target_audience == "private":
-        private_user_id = data.get("private_user_id")
-        users = [int(private_user_id)]
-    else:
-        await call.answer("Не удалось определить аудиторию.", show_alert=True)
+    scheduled_at = local_time.replace(tzinfo=ZoneInfo(config.mailing.timezone)) \
+        .astimezone(timezone.utc).replace(tzinfo=None)
+    if scheduled_at <= datetime.utcnow():
+        await message.answer("Это время уже прошло. Введи время в будущем.")
         return
 
-    user_ids = [user["user"].id for user in users] if target_audience != "private" else users
-    reply_markup = create_url_keyboard(buttons) if buttons else None
+    data = await state.get_data()
+    await state.clear()
+    await create_mailing_job(
+        message, message.from_user.id, data, repo, mailing_worker,
+        scheduled_at=scheduled_at,
+        scheduled_text=message.text.strip(),
+    )
+
+
+@admin_router.message(Command("mailings"))
+async def mailings_list(message: Message, repo: RequestsRepo, mailing_worker: MailingWorker):
+    mailings = await repo.mailings.get_unfinished_mailings()
+    if not mailings:
+        await message.answer("Активных рассылок нет.")
+        return
 
-    send_kwargs = {
-        "caption": content,
-        "reply_markup": reply_markup
-    } if content_type != "text" else {
-        "text": content,
-        "reply_markup": reply_markup
+    progress = mailing_worker.progress
+    for mailing in mailings:
+        if progress and progress.mailing_id == mailing.id:
+            text = progress.render()
+        else:
+            text = (
+                f"Рассылка #{mailing.id} ({mailing.status})\n"
+                f"Успешно: {mailing.success}\nОшибок: {mailing.failed}\nПовторов: {mailing.retried}"
+            )
+        await message.answer(
+            text,
+            reply_markup=mailing_job_keyboard(mailing.id, mailing.status)
+        )
+
+
+@admin_router.callback_query(MailingJobData.filter())
+async def mailing_job_action(call: CallbackQuery, callback_data: MailingJobData, repo: RequestsRepo,
+                             mailing_worker: MailingWorker):
+    transitions = {
+        "pause": (MailingStatus.PAUSED, (MailingStatus.RUNNING,)),
+        "resume": (MailingStatus.RUNNING, (MailingStatus.PAUSED,)),
+        "cancel": (MailingStatus.CANCELLED, (MailingStatus.SCHEDULED, MailingStatus.RUNNING, MailingStatus.PAUSED)),
     }
+    status, from_statuses = transitions[callback_data.action]
+
+    changed = await repo.mailings.set_status(callback_data.mailing_id, status, from_statuses)
+    if not changed:
+        await call.answer("Статус рассылки уже изменился.", show_alert=True)
+        return
+
+    if status == MailingStatus.RUNNING:
+        await repo.session.commit()
+        mailing_worker.notify()
 
-    error_logs = []
-    success, failed = 0, 0
-
-    for user_id in user_ids:
-        try:
-            match content_type:
-                case "text":
-                    await call.bot.send_message(chat_id=user_id, **send_kwargs)
-                case "photo":
-                    await call.bot.send_photo(chat_id=user_id, photo=file_id, **send_kwargs)
-                case "video":
-                    await call.bot.send_video(chat_id=user_id, video=file_id, **send_kwargs)
-                case "animation":
-                    await call.bot.send_animation(chat_id=user_id, animation=file_id, **send_kwargs)
-                case "audio":
-                    await call.bot.send_audio(chat_id=user_id, audio=file_id, **send_kwargs)
-                case "document":
-                    await call.bot.send_document(chat_id=user_id, document=file_id, **send_kwargs)
-                case "sticker":
-                    await call.bot.send_sticker(chat_id=user_id, sticker=file_id, **send_kwargs)
-                case "video_note":
-                    await call.bot.send_video_note(chat_id=user_id, video_note=file_id, **send_kwargs)
-                case "voice":
-                    await call.bot.send_voice(chat_id=user_id, voice=file_id, **send_kwargs)
-                case _:
-                    failed += 1
-                    error_logs.append(f"[{user_id}] ❌ Unsupported content type: {content_type}")
-                    continue
-            success += 1
-            await asyncio.sleep(0.03)
-        except TelegramRetryAfter as e:
-            await asyncio.sleep(e.retry_after)
-        except TelegramForbiddenError:
-            failed += 1
-            error_logs.append(f"[{user_id}] ❌ Bot was blocked by user.")
-        except Exception as e:
-            failed += 1
-            error_logs.append(f"[{user_id}] ❌ {repr(e)}")
-
-    await call.message.answer(f"Рассылка завершена ✅\nУспешно: {success}\nОшибок: {failed}")
-
-    if error_logs:
-        print(error_logs)
-        log_filename = f"mailing_errors_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
-        with open(log_filename, "w", encoding="utf-8") as f:
-            f.write("\n".join(error_logs))
-
-        await call.message.answer_document(FSInputFile(log_filename))
+    await call.message.edit_text(
+        f"Рассылка #{callback_data.mailing_id} ({status})",
+        reply_markup=mailing_job_keyboard(callback_data.mailing_id, status)
+    )
 
 
 @admin_router.callback_query(F.data == "grant_access")
@@ -314,8 +365,8 @@ async def grant_access(call: CallbackQuery, config: Config, state: FSMContext):
     await state.set_state(GrantAccessStates.chat_id)
 
 @admin_router.message(GrantAccessStates.chat_id)
-async def grant_access(message: Message, state: FSMContext, config: Config, bot: Bot):
-    repo = await get_repo(config)
+async def grant_access(message: Message, state: FSMContext, config: Config, bot: Bot, repo: RequestsRepo,
+                       invite_links: InviteLinkPool):
     user = await repo.users.get_user_by_id(int(message.text))
     if not user:
         await message.answer("Пользователя нет в базе!")
@@ -326,16 +377,7 @@ async def grant_access(message: Message, state: FSMContext, config: Config, bot:
         2490
     )
     await repo.purchases.toggle_is_paid(purchase.id)
-    link = await bot.create_chat_invite_link(
-        config.tg_bot.channel_id,
-        name=message.text,
-        member_limit=1
-    )
-    await bot.send_message(
-        chat_id=int(message.text),
-        text="Ссылка на канал: ",
-        reply_markup=enter_keyboard(link.invite_link)
-    )
+    await send_channel_invite(bot, invite_links, int(message.text))
     await message.answer("Доступ успешно выдан!")
 
 @admin_router.callback_query(F.data == "admin_back")
@@ -1,4 +1,4 @@
-import json
+import logging
 
 from aiogram import Router, F, Bot
 from aiogram.enums import ParseMode
@@ -6,16 +6,21 @@ from aiogram.filters import CommandStart, CommandObject
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message, CallbackQuery, InputMediaPhoto
 
+from infrastructure.database.repo.requests import RequestsRepo
 from tgbot.config import Config
 from tgbot.keyboards.callback_data import AcceptCreditData
-from tgbot.keyboards.inline import start_keyboard, buy_keyboard, offer_keyboard, product_keyboard, enter_keyboard, \
+from tgbot.keyboards.inline import start_keyboard, buy_keyboard, offer_keyboard, product_keyboard, \
     payment_method_keyboard, credit_keyboard, approve_credit
 from tgbot.misc.states import PaymentStates, CreditStates
-from tgbot.utils.db_utils import get_repo
-from tgbot.utils.deeplink_utils import ScenarioHandler
+from tgbot.services.access import send_channel_invite
+from tgbot.services.catalog import ProductCatalog
+from tgbot.services.invite_links import InviteLinkPool
+from tgbot.services.payment_checker import PaymentChecker
+from tgbot.utils.deeplink_utils import ScenarioHandler, load_scenario, parse_deeplink_id
 from tgbot.utils.payment_utils import Payment
 
 user_router = Router()
+logger = logging.getLogger(__name__)
 
 # @user_router.message(Command("test_deeplink_132123"))
 # async def start_handler(message: Message, state: FSMContext, config: Config):
@@ -132,37 +137,39 @@ user_router = Router()
 #     await scenario_handler.handle_scenario(scenario_json)
 
 @user_router.callback_query(F.data.startswith("callback:"))
-async def handle_callback_query(callback: CallbackQuery, state: FSMContext, config: Config):
+async def handle_callback_query(callback: CallbackQuery, state: FSMContext, config: Config, repo: RequestsRepo):
     """
     Обработка всех нажатий на кнопки, у которых callback_data начинается с "callback:".
     """
     callback_id = callback.data.split("callback:", 1)[-1]
-    handler = ScenarioHandler(callback.message, state, config)
+    handler = ScenarioHandler(callback.message, state, config, repo)
     await handler.handle_callback(callback_id)
     await callback.answer()
 
 
 
 @user_router.message(CommandStart(deep_link=True))
-async def user_deeplink(message: Message, command: CommandObject, state: FSMContext, config: Config):
+async def user_deeplink(message: Message, command: CommandObject, state: FSMContext, config: Config,
+                        repo: RequestsRepo):
     await state.update_data(deeplink=command.args)
-    repo = await get_repo(config)
-    user = await repo.users.get_user_by_id(message.from_user.id)
+    user = await repo.users.user_exists_active(message.from_user.id)
     if not user:
         text = config.messages.offer_agreement
         await message.answer(text,
                              reply_markup=offer_keyboard(),
                              parse_mode=ParseMode.HTML)
     else:
-        deeplink = await repo.deeplink.get_deeplink_by_id(int(command.args))
-        scenario_handler = ScenarioHandler(message, state, config)
-        await scenario_handler.handle_scenario(json.loads(deeplink.scenario))
+        scenario = await load_scenario(repo, parse_deeplink_id(command.args))
+        if not scenario:
+            logger.warning(f"Deeplink {command.args} not found")
+            return
+        scenario_handler = ScenarioHandler(message, state, config, repo)
+        await scenario_handler.handle_scenario(scenario)
 
 
 @user_router.message(CommandStart())
-async def user_start(message: Message, config: Config):
-    repo = await get_repo(config)
-    user = await repo.users.get_user_by_id(message.from_user.id)
+async def user_start(message: Message, config: Config, repo: RequestsRepo):
+    user = await repo.users.user_exists_active(message.from_user.id)
     if user:
         text = config.messages.course_intro
         photo = config.messages.photo_go_intro
@@ -179,8 +186,7 @@ async def user_start(message: Message, config: Config):
 
 
 @user_router.callback_query(F.data == "accept_offer")
-async def accept_offer(call: CallbackQuery, config: Config, state: FSMContext):
-    repo = await get_repo(config)
+async def accept_offer(call: CallbackQuery, config: Config, state: FSMContext, repo: RequestsRepo):
     data = await state.get_data()
     await call.message.delete()
     await repo.users.get_or_create_user(
@@ -188,12 +194,12 @@ async def accept_offer(call: CallbackQuery, config: Config, state: FSMContext):
         call.message.chat.full_name,
         call.message.from_user.is_premium,
         call.message.chat.username,
-        None if not data.get("deeplink") else int(data.get("deeplink")),
+        parse_deeplink_id(data.get("deeplink")),
     )
-    if data.get("deeplink"):
-        deeplink = await repo.deeplink.get_deeplink_by_id(int(data.get("deeplink")))
-        scenario_handler = ScenarioHandler(call.message, state, config)
-        await scenario_handler.handle_scenario(json.loads(deeplink.scenario))
+    scenario = await load_scenario(repo, parse_deeplink_id(data.get("deeplink")))
+    if scenario:
+        scenario_handler = ScenarioHandler(call.message, state, config, repo)
+        await scenario_handler.handle_scenario(scenario)
     else:
         await state.clear()
         text = config.messages.course_intro
@@ -231,21 +237,13 @@ async def screenshot(message: Message, config: Config, bot: Bot, state: FSMConte
     await state.clear()
 
 @user_router.callback_query(AcceptCreditData.filter())
-async def accept_credit(call: CallbackQuery, config: Config, state: FSMContext, callback_data: AcceptCreditData, bot: Bot):
+async def accept_credit(call: CallbackQuery, config: Config, state: FSMContext, callback_data: AcceptCreditData, bot: Bot,
+                        repo: RequestsRepo, catalog: ProductCatalog, invite_links: InviteLinkPool):
     response = callback_data.response
     await call.message.answer("Ответ направлен пользователю")
     if response:
-        repo = await get_repo(config)
-        link = await bot.create_chat_invite_link(
-            config.tg_bot.channel_id,
-            name=str(call.message.chat.id),
-            member_limit=1
-        )
-        await bot.send_message(
-            chat_id=callback_data.chat_id,
-            text="Ссылка на канал: ",
-                    reply_markup=enter_keyboard(link.invite_link))
-        product = await repo.products.get_product_by_id(product_id=1)
+        await send_channel_invite(bot, invite_links, callback_data.chat_id)
+        product = catalog.get(1)
         purchase = await repo.purchases.create_purchase(
             callback_data.chat_id,
             1,
@@ -274,68 +272,45 @@ async def buy_callback(call: CallbackQuery, state: FSMContext):
 
 
 @user_router.message(PaymentStates.email)
-async def payment_email(message: Message, state: FSMContext, config: Config):
-    repo = await get_repo(config)
-    tripwire = await repo.products.get_product_by_id(product_id=1)
-    description = str(tripwire.description).replace('+br+', '\n')
-    text = f"{tripwire.name}\n\n{description}"
+async def payment_email(message: Message, state: FSMContext, config: Config, repo: RequestsRepo,
+                        catalog: ProductCatalog, payment: Payment):
+    product = catalog.get(1)
+    description = str(product.description).replace('+br+', '\n')
+    text = f"{product.name}\n\n{description}"
     purchase = await repo.purchases.get_purchase_by_user(message.from_user.id)
     if not purchase:
-        product = await repo.products.get_product_by_id(product_id=1)
         purchase = await repo.purchases.create_purchase(
             message.from_user.id,
             1,
             int(product.price)
         )
-        payment = Payment(
-            config.payment.terminal_key,
-            config.payment.password
-        )
-        await payment.create_payment(
+    payment_url = purchase.link
+    if not payment_url:
+        # New purchase, or Init failed last time.
+        # Покупка фиксируется до запроса к эквайеру: соединение с базой не держится на время Init
+        await repo.session.commit()
+        response = await payment.create_payment(
             str(purchase.id),
             product.name,
             message.text,
-            product,
-            repo
+            product
         )
-        payment_url = payment.get_url
-    else:
-        payment_url = purchase.link
+        payment_url = response.get("PaymentURL")
+        if not response.get("Success") or not payment_url:
+            logger.error(f"Payment init failed for purchase {purchase.id}: {response}")
+            await message.answer("Не удалось создать платёж, попробуйте позже")
+            return
+        await repo.purchases.update_purchase(purchase.id, int(response["PaymentId"]), payment_url)
     await message.answer(text, reply_markup=product_keyboard(payment_url))
 
 @user_router.callback_query(F.data == "check_payment")
-async def check_payment_callback(call: CallbackQuery, bot: Bot, config: Config):
-    repo = await get_repo(config)
-    purchase = await repo.purchases.get_purchase_by_user(call.message.chat.id)
-    if purchase.is_paid:
+async def check_payment_callback(call: CallbackQuery, payment_checker: PaymentChecker):
+    # Повторные нажатия ждут одну и ту же проверку, доступ выдаётся один раз
+    status = await payment_checker.check(call.message.chat.id, call.message.chat.username)
+    if status is None:
+        await call.answer("Платёж не найден", show_alert=True)
+    elif status:
         await call.answer("Оплата прошла", show_alert=True)
-        return
-    payment = Payment(
-        config.payment.terminal_key,
-        config.payment.password
-    )
-    status = payment.get_payment_status(str(purchase.payment_id))
-    if status:
-        await call.answer("Оплата прошла", show_alert=True)
-        text = ("Оплата",
-                f"{call.message.chat.id} {'@' + call.message.chat.username if call.message.chat.username else ''}",
-                f"{purchase.amount}₽"
-                )
-        for admin in config.tg_bot.admin_ids:
-            await bot.send_message(
-                chat_id=admin,
-                text="\n".join(text)
-            )
-        await repo.purchases.toggle_is_paid(purchase.id)
-        link = await bot.create_chat_invite_link(
-            config.tg_bot.channel_id,
-            name=str(call.message.chat.id),
-            member_limit=1
-        )
-        await call.message.answer("Ссылка на канал: ",
-                                  reply_markup=enter_keyboard(link.invite_link),
-                                  parse_mode=ParseMode.HTML)
-
     else:
         await call.answer("Оплата не прошла", show_alert=True)
 
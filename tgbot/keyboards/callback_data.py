@@ -13,3 +13,7 @@ class AcceptCreditData(CallbackData, prefix="accept_credit"):
 
 class AudienceData(CallbackData, prefix="audience"):
     audience: str
+
+class MailingJobData(CallbackData, prefix="mailing_job"):
+    action: str
+    mailing_id: int
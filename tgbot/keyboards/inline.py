@@ -1,6 +1,6 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, WebAppInfo
 
-from tgbot.keyboards.callback_data import SourceData, TargetData, AcceptCreditData, AudienceData
+from tgbot.keyboards.callback_data import SourceData, TargetData, AcceptCreditData, AudienceData, MailingJobData
 
 
 def offer_keyboard():
@@ -203,10 +203,35 @@ def confirm_mailing_keyboard():
         [
             InlineKeyboardButton(text="✅", callback_data="confirm_mailing"),
             InlineKeyboardButton(text="❌", callback_data="admin_mailing")
+        ],
+        [
+            InlineKeyboardButton(text="🕒 Запланировать", callback_data="schedule_mailing")
         ]
     ])
     return keyboard
 
+def mailing_job_keyboard(mailing_id: int, status: str):
+    buttons = []
+    if status == "running":
+        buttons.append(InlineKeyboardButton(text="⏸ Пауза", callback_data=MailingJobData(
+            action="pause",
+            mailing_id=mailing_id
+        ).pack()))
+    elif status == "paused":
+        buttons.append(InlineKeyboardButton(text="▶️ Продолжить", callback_data=MailingJobData(
+            action="resume",
+            mailing_id=mailing_id
+        ).pack()))
+
+    if status in ("scheduled", "running", "paused"):
+        buttons.append(InlineKeyboardButton(text="⏹ Отменить", callback_data=MailingJobData(
+            action="cancel",
+            mailing_id=mailing_id
+        ).pack()))
+
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[buttons] if buttons else [])
+    return keyboard
+
 def create_url_keyboard(buttons_data: list, preview=False) -> InlineKeyboardMarkup:
     keyboard_rows = [
         [InlineKeyboardButton(text=btn["text"], url=btn["url"])]
@@ -0,0 +1,44 @@
+import asyncio
+from typing import Callable, Dict, Any, Awaitable
+
+from aiogram import BaseMiddleware
+from aiogram.types import Message
+
+
+class AlbumMiddleware(BaseMiddleware):
+    """
+    Collects the messages of a media group into one handler call.
+
+    Telegram delivers every item of an album as a separate update. The first message of a group
+    waits `latency` seconds, and the rest of the group is appended to it meanwhile and not
+    handled on its own. The handler gets all messages, in order, as `album`; single messages
+    get `album` with one element.
+    """
+
+    def __init__(self, latency: float = 0.6) -> None:
+        self.latency = latency
+        self._albums: Dict[str, list[Message]] = {}
+
+    async def __call__(
+        self,
+        handler: Callable[[Message, Dict[str, Any]], Awaitable[Any]],
+        event: Message,
+        data: Dict[str, Any],
+    ) -> Any:
+        if not event.media_group_id:
+            data["album"] = [event]
+            return await handler(event, data)
+
+        album = self._albums.get(event.media_group_id)
+        if album is not None:
+            album.append(event)
+            return None
+
+        self._albums[event.media_group_id] = album = [event]
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            del self._albums[event.media_group_id]
+
+        data["album"] = sorted(album, key=lambda message: message.message_id)
+        return await handler(event, data)
@@ -7,8 +7,18 @@ from infrastructure.database.repo.requests import RequestsRepo
 
 
 class DatabaseMiddleware(BaseMiddleware):
-    def __init__(self, session_pool) -> None:
+    """
+    Gives every update exactly one RequestsRepo bound to a fresh session.
+
+    The session checks out a pool connection only on its first query, so handlers
+    that never touch the database never hold a connection. The transaction is
+    committed once after the handler returns and rolled back if it raises.
+    """
+
+    def __init__(self, session_pool, user_cache=None, scenario_cache=None) -> None:
         self.session_pool = session_pool
+        self.user_cache = user_cache
+        self.scenario_cache = scenario_cache
 
     async def __call__(
         self,
@@ -17,18 +27,14 @@ class DatabaseMiddleware(BaseMiddleware):
         data: Dict[str, Any],
     ) -> Any:
         async with self.session_pool() as session:
-            repo = RequestsRepo(session)
-
-            user = await repo.users.get_or_create_user(
-                event.from_user.id,
-                event.from_user.full_name,
-                event.from_user.language_code,
-                event.from_user.username
-            )
+            data["repo"] = RequestsRepo(session, self.user_cache, self.scenario_cache)
 
-            data["session"] = session
-            data["repo"] = repo
-            data["user"] = user
+            try:
+                result = await handler(event, data)
+            except Exception:
+                await session.rollback()
+                raise
 
-            result = await handler(event, data)
+            if session.in_transaction():
+                await session.commit()
         return result
@@ -16,6 +16,7 @@ class MailingStates(StatesGroup):
     message = State()
     buttons = State()
     private_user_id = State()
+    send_time = State()
 
 class GrantAccessStates(StatesGroup):
     chat_id = State()
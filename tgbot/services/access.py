@@ -0,0 +1,97 @@
+import logging
+from datetime import timedelta
+from typing import Optional
+
+from aiogram import Bot
+from aiogram.enums import ParseMode
+from aiogram.exceptions import TelegramNetworkError
+
+from infrastructure.database.models.purchases import Purchase
+from infrastructure.database.repo.requests import RequestsRepo
+from tgbot.config import Config
+from tgbot.keyboards.inline import enter_keyboard
+from tgbot.services.invite_links import InviteLinkPool
+
+# How long a process owns the delivery of a purchase before another one may retry it
+delivery_lease = timedelta(minutes=5)
+
+
+async def send_channel_invite(bot: Bot, invite_links: InviteLinkPool, user_id: int) -> None:
+    """
+    Issues a single-use invite link to the course channel from the pool and sends it to the user.
+
+    If Telegram rejects the message, the link goes back to the pool. After a network error the
+    message may still have been delivered, so the link stays issued to the user.
+    """
+    link = await invite_links.issue(user_id)
+    try:
+        await bot.send_message(
+            chat_id=user_id,
+            text="Ссылка на канал: ",
+            reply_markup=enter_keyboard(link),
+            parse_mode=ParseMode.HTML
+        )
+    except TelegramNetworkError:
+        raise
+    except Exception:
+        await invite_links.release(link)
+        raise
+
+
+async def notify_admins_about_payment(bot: Bot, config: Config, purchase: Purchase,
+                                      username: Optional[str] = None) -> None:
+    text = ("Оплата",
+            f"{purchase.user_id} {'@' + username if username else ''}",
+            f"{purchase.amount}₽"
+            )
+    for admin in config.tg_bot.admin_ids:
+        try:
+            await bot.send_message(chat_id=admin, text="\n".join(text))
+        except Exception as e:
+            logging.error(f"Payment notification to admin {admin} failed: {e}")
+
+
+async def send_purchase_invite(bot: Bot, session_pool, invite_links: InviteLinkPool, purchase: Purchase) -> bool:
+    """
+    Sends the channel invite of a paid purchase unless it was already sent.
+
+    The delivery is claimed in the database first (PurchaseRepo.claim_delivery), so the webhook,
+    the payment check and the reconciler never send it at the same time, and `access_sent_at`
+    is set once the invite is out. A failed send releases the claim and the reconciler retries it;
+    a process that dies mid-send leaves the claim to expire after `delivery_lease`.
+
+    :return: True if this call sent the invite.
+    """
+    async with session_pool() as session:
+        claimed = await RequestsRepo(session).purchases.claim_delivery(purchase.id, delivery_lease)
+        await session.commit()
+    if claimed is None:
+        return False
+
+    try:
+        await send_channel_invite(bot, invite_links, purchase.user_id)
+    except Exception:
+        logging.exception(f"Channel invite for purchase {purchase.id} (user {purchase.user_id}) failed")
+        async with session_pool() as session:
+            await RequestsRepo(session).purchases.release_delivery(purchase.id)
+            await session.commit()
+        return False
+
+    async with session_pool() as session:
+        await RequestsRepo(session).purchases.mark_delivered(purchase.id)
+        await session.commit()
+    return True
+
+
+async def deliver_access(bot: Bot, config: Config, session_pool, invite_links: InviteLinkPool, purchase: Purchase,
+                         username: Optional[str] = None) -> None:
+    """
+    Tells the admins about a freshly paid purchase and sends its channel invite.
+
+    Call it only for the call that moved the purchase to paid (PurchaseRepo.mark_paid returned it),
+    after that change is committed, so the admins hear about every payment once. The invite itself
+    is tracked in the database (see send_purchase_invite): if it is not sent here, the reconciler
+    sends it later.
+    """
+    await notify_admins_about_payment(bot, config, purchase, username)
+    await send_purchase_invite(bot, session_pool, invite_links, purchase)
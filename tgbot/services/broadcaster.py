@@ -1,11 +1,14 @@
 import asyncio
 import logging
-from typing import Union
+from typing import Optional, Union
 
 from aiogram import Bot
 from aiogram import exceptions
 from aiogram.types import InlineKeyboardMarkup
 
+from tgbot.services.rate_limiter import TokenBucket
+from tgbot.services.sender import BroadcastSender
+
 
 async def send_message(
     bot: Bot,
@@ -13,6 +16,7 @@ async def send_message(
     text: str,
     disable_notification: bool = False,
     reply_markup: InlineKeyboardMarkup = None,
+    max_retries: int = 3,
 ) -> bool:
     """
     Safe messages sender
@@ -22,33 +26,43 @@ async def send_message(
     :param text: text of the message.
     :param disable_notification: disable notification or not.
     :param reply_markup: reply markup.
+    :param max_retries: how many times to wait out a flood limit before giving up.
     :return: success.
     """
-    try:
-        await bot.send_message(
-            user_id,
-            text,
-            disable_notification=disable_notification,
-            reply_markup=reply_markup,
-        )
-    except exceptions.TelegramBadRequest as e:
+    for attempt in range(max_retries + 1):
+        try:
+            await bot.send_message(
+                user_id,
+                text,
+                disable_notification=disable_notification,
+                reply_markup=reply_markup,
+            )
+        except exceptions.TelegramRetryAfter as e:
+            if attempt == max_retries:
+                _log_failure(user_id, e)
+                return False
+            logging.error(
+                f"Target [ID:{user_id}]: Flood limit is exceeded. Sleep {e.retry_after} seconds."
+            )
+            await asyncio.sleep(e.retry_after)
+        except exceptions.TelegramAPIError as e:
+            _log_failure(user_id, e)
+            return False
+        else:
+            logging.info(f"Target [ID:{user_id}]: success")
+            return True
+    return False
+
+
+def _log_failure(user_id: Union[int, str], error: BaseException) -> None:
+    if isinstance(error, exceptions.TelegramBadRequest):
         logging.error("Telegram server says - Bad Request: chat not found")
-    except exceptions.TelegramForbiddenError:
+    elif isinstance(error, exceptions.TelegramForbiddenError):
         logging.error(f"Target [ID:{user_id}]: got TelegramForbiddenError")
-    except exceptions.TelegramRetryAfter as e:
-        logging.error(
-            f"Target [ID:{user_id}]: Flood limit is exceeded. Sleep {e.retry_after} seconds."
-        )
-        await asyncio.sleep(e.retry_after)
-        return await send_message(
-            bot, user_id, text, disable_notification, reply_markup
-        )  # Recursive call
-    except exceptions.TelegramAPIError:
-        logging.exception(f"Target [ID:{user_id}]: failed")
+    elif isinstance(error, exceptions.TelegramRetryAfter):
+        logging.error(f"Target [ID:{user_id}]: Flood limit is exceeded. Giving up.")
     else:
-        logging.info(f"Target [ID:{user_id}]: success")
-        return True
-    return False
+        logging.error(f"Target [ID:{user_id}]: failed - {error!r}")
 
 
 async def broadcast(
@@ -57,6 +71,7 @@ async def broadcast(
     text: str,
     disable_notification: bool = False,
     reply_markup: InlineKeyboardMarkup = None,
+    sender: Optional[BroadcastSender] = None,
 ) -> int:
     """
     Simple broadcaster.
@@ -65,18 +80,32 @@ async def broadcast(
     :param text: Text of the message.
     :param disable_notification: Disable notification or not.
     :param reply_markup: Reply markup.
+    :param sender: Shared sender of the process. Without it a private one limited to 20 msg/s is used.
     :return: Count of messages.
     """
+    if sender is None:
+        sender = BroadcastSender(TokenBucket(rate=20))
+
     count = 0
+
+    async def deliver(user_id) -> None:
+        await bot.send_message(
+            user_id,
+            text,
+            disable_notification=disable_notification,
+            reply_markup=reply_markup,
+        )
+
+    def on_result(user_id, error, retries) -> None:
+        nonlocal count
+        if error is None:
+            logging.info(f"Target [ID:{user_id}]: success")
+            count += 1
+        else:
+            _log_failure(user_id, error)
+
     try:
-        for user_id in users:
-            if await send_message(
-                bot, user_id, text, disable_notification, reply_markup
-            ):
-                count += 1
-            await asyncio.sleep(
-                0.05
-            )  # 20 messages per second (Limit: 30 messages per second)
+        await sender.send_batch(users, deliver, on_result)
     finally:
         logging.info(f"{count} messages successful sent.")
 
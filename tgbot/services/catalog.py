@@ -0,0 +1,80 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Optional
+
+from infrastructure.database.repo.products import ProductRepo
+
+
+@dataclass(frozen=True)
+class ProductInfo:
+    """
+    Immutable snapshot of a Product row, safe to share between updates.
+    """
+    id: int
+    name: str
+    info: str
+    description: Optional[str]
+    price: int
+
+
+class ProductCatalog:
+    """
+    In-memory copy of the products table.
+
+    Loaded once at startup and refreshed in the background every refresh_interval seconds,
+    so handlers read product name, description and price without a database round trip.
+    Call reload() to pick up an edit immediately.
+    """
+
+    def __init__(self, session_pool, refresh_interval: float = 3600) -> None:
+        self.session_pool = session_pool
+        self.refresh_interval = refresh_interval
+        self._products: dict[int, ProductInfo] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def reload(self) -> int:
+        """
+        Reads all products from the database and swaps the snapshot atomically.
+
+        :return: Number of loaded products.
+        """
+        async with self.session_pool() as session:
+            products = await ProductRepo(session).get_all_products()
+
+        self._products = {
+            product.id: ProductInfo(
+                id=product.id,
+                name=product.name,
+                info=product.info,
+                description=product.description,
+                price=int(product.price),
+            )
+            for product in products
+        }
+        logging.info(f"Product catalog loaded: {len(self._products)} products")
+        return len(self._products)
+
+    def get(self, product_id: int) -> Optional[ProductInfo]:
+        return self._products.get(product_id)
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.reload()
+            except Exception:
+                logging.exception("Product catalog refresh failed, keeping the previous snapshot")
+
+    async def start(self) -> None:
+        await self.reload()
+        self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
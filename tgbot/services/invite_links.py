@@ -0,0 +1,114 @@
+import asyncio
+import logging
+from typing import Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+
+from infrastructure.database.repo.requests import RequestsRepo
+
+
+class InviteLinkPool:
+    """
+    Buffer of single-use invite links to the channel, kept in the invite_links table.
+
+    A background task tops the pool up to `size` free links every `refill_interval` seconds, or
+    right after issuing leaves fewer than `low_watermark`. issue() only claims a stored link, so
+    createChatInviteLink is off the user's path; when the pool is empty it falls back to creating
+    a link on the spot. Every issued link records the user it went to; release() puts back a link
+    whose message was rejected. Processes that only issue
+    (the API) use the pool without start().
+    """
+
+    def __init__(self, bot: Bot, session_pool, chat_id: int, size: int = 20, low_watermark: int = 5,
+                 refill_interval: float = 300) -> None:
+        self.bot = bot
+        self.session_pool = session_pool
+        self.chat_id = chat_id
+        self.size = size
+        self.low_watermark = low_watermark
+        self.refill_interval = refill_interval
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def _create_link(self, name: Optional[str] = None) -> str:
+        link = await self.bot.create_chat_invite_link(self.chat_id, name=name, member_limit=1)
+        return link.invite_link
+
+    async def issue(self, user_id: int) -> str:
+        """
+        :return: A single-use invite link now assigned to user_id.
+        """
+        async with self.session_pool() as session:
+            repo = RequestsRepo(session)
+            link = await repo.invite_links.claim(self.chat_id, user_id)
+            if link is None:
+                logging.warning("Invite link pool is empty, creating a link on the spot")
+                link = await self._create_link(name=str(user_id))
+                await repo.invite_links.add_issued(self.chat_id, user_id, link)
+            free = await repo.invite_links.count_free(self.chat_id)
+            await session.commit()
+
+        if free < self.low_watermark:
+            self._wakeup.set()
+        return link
+
+    async def release(self, link: str) -> None:
+        """
+        Puts an issued link back into the pool, for when it never reached the user.
+        """
+        async with self.session_pool() as session:
+            await RequestsRepo(session).invite_links.release(link)
+            await session.commit()
+
+    async def refill(self) -> int:
+        """
+        Creates links until the pool has `size` free ones.
+
+        :return: Number of links created.
+        """
+        async with self.session_pool() as session:
+            missing = self.size - await RequestsRepo(session).invite_links.count_free(self.chat_id)
+
+        created = 0
+        while created < missing:
+            try:
+                link = await self._create_link()
+            except TelegramRetryAfter as e:
+                await asyncio.sleep(e.retry_after)
+                continue
+            # Each link is stored right away, so a crash loses at most the one being created
+            async with self.session_pool() as session:
+                await RequestsRepo(session).invite_links.add_links(self.chat_id, [link])
+                await session.commit()
+            created += 1
+
+        if created:
+            logging.info(f"Invite link pool refilled with {created} links")
+        return created
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refill()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logging.exception("Invite link pool refill failed")
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.refill_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,364 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional
+from zoneinfo import ZoneInfo
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError, TelegramBadRequest
+from aiogram.types import FSInputFile
+
+from infrastructure.database.cache import TTLCache
+from infrastructure.database.models import Mailing, MailingStatus
+from infrastructure.database.repo.requests import RequestsRepo
+from tgbot.keyboards.inline import create_url_keyboard, mailing_job_keyboard
+from tgbot.services.progress import MailingProgress
+from tgbot.services.report import DeliveryReport, cleanup_reports
+from tgbot.services.sender import BroadcastSender
+
+
+def is_chat_not_found(error: BaseException) -> bool:
+    return isinstance(error, TelegramBadRequest) and "chat not found" in error.message.lower()
+
+
+async def copy_content(bot: Bot, chat_id: int, from_chat_id: int, message_ids: list[int],
+                       reply_markup=None) -> None:
+    """
+    Copies the admin's message to chat_id with all entities and any content type.
+    An album goes through copyMessages in one request; Telegram does not attach buttons to albums.
+    """
+    if len(message_ids) == 1:
+        await bot.copy_message(
+            chat_id=chat_id,
+            from_chat_id=from_chat_id,
+            message_id=message_ids[0],
+            reply_markup=reply_markup,
+        )
+    else:
+        await bot.copy_messages(chat_id=chat_id, from_chat_id=from_chat_id, message_ids=message_ids)
+
+
+async def send_mailing_message(bot: Bot, mailing: Mailing, user_id: int) -> None:
+    """
+    Copies the mailing content to one recipient. Telegram errors are propagated to the caller.
+    """
+    reply_markup = create_url_keyboard(mailing.buttons) if mailing.buttons else None
+    await copy_content(bot, user_id, mailing.source_chat_id, mailing.source_message_ids, reply_markup)
+
+
+class BatchResult:
+    """
+    Collects the outcome of one batch; the instance is passed to BroadcastSender.send_batch as on_result.
+    """
+
+    def __init__(self, progress: Optional[MailingProgress] = None) -> None:
+        self.progress = progress
+        self.success = 0
+        self.failed = 0
+        self.retried = 0
+        self.done = set()
+        self.unreachable = []
+        self.records = []
+
+    def __call__(self, user_id: int, error: Optional[BaseException], retries: int) -> None:
+        self.done.add(user_id)
+        self.records.append(DeliveryReport.record(user_id, error, retries))
+        if self.progress is not None:
+            self.progress.record(error is None, retries > 0)
+        if retries:
+            self.retried += 1
+        if error is None:
+            self.success += 1
+            return
+
+        self.failed += 1
+        if isinstance(error, TelegramForbiddenError) or is_chat_not_found(error):
+            self.unreachable.append(user_id)
+
+    def processed_prefix(self, batch: list[int], cursor: int) -> int:
+        """Recipients finish out of order: the cursor may only move over the processed prefix."""
+        for user_id in batch:
+            if user_id not in self.done:
+                break
+            cursor = user_id
+        return cursor
+
+
+async def save_batch_result(session_pool, mailing_id: int, result: BatchResult, cursor: Optional[int] = None,
+                            send_rate: Optional[float] = None, user_cache: Optional[TTLCache] = None) -> None:
+    """
+    Adds the batch counters to the job and deactivates unreachable users in one transaction.
+    The deactivated users are then evicted from `user_cache`, so their next /start reactivates them.
+    """
+    async with session_pool() as session:
+        repo = RequestsRepo(session)
+        await repo.mailings.checkpoint(
+            mailing_id, cursor, result.success, result.failed, result.retried, send_rate
+        )
+        await repo.users.deactivate_users(result.unreachable)
+        await session.commit()
+
+    if user_cache is not None:
+        for user_id in result.unreachable:
+            user_cache.invalidate(user_id)
+
+
+@dataclass(frozen=True)
+class PeakHours:
+    """
+    Hours of peak interactive traffic, [start, end) in the given time zone; may wrap past midnight.
+    """
+    start: int
+    end: int
+    rate_factor: float
+    large_job_size: int
+    timezone: str = "Europe/Moscow"
+
+    def is_peak(self, moment: datetime) -> bool:
+        hour = moment.astimezone(ZoneInfo(self.timezone)).hour
+        if self.start <= self.end:
+            return self.start <= hour < self.end
+        return hour >= self.start or hour < self.end
+
+
+class MailingWorker:
+    """
+    Background runner of persistent mailing jobs.
+
+    Jobs are processed one at a time, oldest first. Recipients are read in users.id order in
+    batches of `batch_size`; a batch is sent concurrently through the shared `sender`, after
+    which the last processed id and the counters are checkpointed in the mailings table, together
+    with the users who turned out to be unreachable (bot blocked, chat not found), so future
+    audiences skip them; they are also evicted from the bot's `user_cache`. On shutdown the worker checkpoints the longest fully processed prefix
+    of the current batch, so a restart re-sends at most the few messages that were in flight.
+    The job status is re-read before every batch, which is how pause and cancel take effect.
+
+    While a job runs, `progress` holds its live counters; every `progress_interval` seconds they
+    are rendered into the status message the admin got when the job was created. Per-recipient
+    results go to a DeliveryReport in `reports_dir`, sent to the admin when the job ends; reports
+    older than `report_retention_days` are deleted.
+
+    Scheduled jobs live in the same table: every loop iteration starts the ones that are due and
+    the worker sleeps no longer than until the next one, so schedules survive restarts. During
+    `peak_hours` a large job only gets a share of the rate, leaving room for interactive traffic.
+    """
+
+    def __init__(self, bot: Bot, session_pool, sender: BroadcastSender, batch_size: int = 200,
+                 poll_interval: float = 30, progress_interval: float = 5, reports_dir: str = "reports",
+                 report_retention_days: int = 7, peak_hours: Optional[PeakHours] = None,
+                 user_cache: Optional[TTLCache] = None) -> None:
+        self.bot = bot
+        self.session_pool = session_pool
+        self.sender = sender
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.progress_interval = progress_interval
+        self.reports_dir = reports_dir
+        self.report_retention_days = report_retention_days
+        self.peak_hours = peak_hours
+        self.user_cache = user_cache
+        self.base_rate = sender.limiter.max_rate
+        self.progress: Optional[MailingProgress] = None
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def notify(self) -> None:
+        """Wakes the worker up after a job was created or resumed."""
+        self._wakeup.set()
+
+    async def start(self) -> None:
+        await asyncio.to_thread(cleanup_reports, self.reports_dir, self.report_retention_days)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if not self._task:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            timeout = self.poll_interval
+            try:
+                async with self.session_pool() as session:
+                    repo = RequestsRepo(session)
+                    started = await repo.mailings.start_due_mailings(datetime.utcnow())
+                    if started:
+                        await session.commit()
+                        logging.info(f"Scheduled mailings started: {started}")
+                    mailing = await repo.mailings.get_next_running_mailing()
+                    next_scheduled_at = await repo.mailings.get_next_scheduled_at()
+                if mailing:
+                    await self._process(mailing)
+                    continue
+                if next_scheduled_at:
+                    timeout = min(timeout, max((next_scheduled_at - datetime.utcnow()).total_seconds(), 1))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logging.exception("Mailing worker iteration failed")
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _load_batch(self, mailing: Mailing, cursor: int) -> list[int]:
+        if mailing.audience == "private":
+            return [mailing.private_user_id] if mailing.private_user_id > cursor else []
+
+        async with self.session_pool() as session:
+            repo = RequestsRepo(session)
+            return [
+                user_id async for user_id in repo.users.iter_audience(
+                    mailing.audience, batch_size=self.batch_size, after_id=cursor, limit=self.batch_size
+                )
+            ]
+
+    async def _queued_count(self, mailing: Mailing) -> int:
+        """Recipients already taken from the audience but not processed yet (see QueuedMailingWorker)."""
+        return 0
+
+    async def _start_progress(self, mailing: Mailing) -> MailingProgress:
+        if mailing.audience == "private":
+            remaining = 1 if mailing.private_user_id > mailing.cursor else 0
+        else:
+            async with self.session_pool() as session:
+                remaining = await RequestsRepo(session).users.count_audience(mailing.audience, mailing.cursor)
+
+        remaining += await self._queued_count(mailing)
+        progress = MailingProgress(
+            mailing_id=mailing.id,
+            total=mailing.success + mailing.failed + remaining,
+            sent=mailing.success,
+            failed=mailing.failed,
+            retried=mailing.retried,
+        )
+        async with self.session_pool() as session:
+            await RequestsRepo(session).mailings.set_total(mailing.id, progress.total)
+            await session.commit()
+        return progress
+
+    async def _edit_status(self, mailing: Mailing, text: str, reply_markup=None) -> None:
+        if not mailing.status_message_id:
+            return
+        # Edits are API calls too: they take their token from the same budget as the sends
+        await self.sender.limiter.acquire()
+        try:
+            await self.bot.edit_message_text(
+                text=text,
+                chat_id=mailing.created_by,
+                message_id=mailing.status_message_id,
+                reply_markup=reply_markup,
+            )
+        except TelegramBadRequest as e:
+            logging.debug(f"Mailing {mailing.id}: status message not edited: {e}")
+
+    async def _report_progress(self, mailing: Mailing, progress: MailingProgress) -> None:
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            await self._edit_status(
+                mailing, progress.render(), mailing_job_keyboard(mailing.id, MailingStatus.RUNNING)
+            )
+
+    async def _apply_peak_hours(self, progress: MailingProgress) -> None:
+        slow_down = (
+            self.peak_hours is not None
+            and progress.remaining >= self.peak_hours.large_job_size
+            and self.peak_hours.is_peak(datetime.now(timezone.utc))
+        )
+        rate = self.base_rate * self.peak_hours.rate_factor if slow_down else self.base_rate
+        if rate != self.sender.limiter.max_rate:
+            if slow_down:
+                logging.info(
+                    f"Mailing {progress.mailing_id}: peak hours, {progress.remaining} recipients left, "
+                    f"send rate limited to {rate:.1f} msg/s"
+                )
+            else:
+                logging.info(f"Mailing {progress.mailing_id}: send rate back to {rate:.1f} msg/s")
+            await self.sender.limiter.set_max_rate(rate)
+
+    async def _process(self, mailing: Mailing) -> None:
+        logging.info(f"Mailing {mailing.id}: running from cursor {mailing.cursor}")
+        self.progress = await self._start_progress(mailing)
+        reporter = asyncio.create_task(self._report_progress(mailing, self.progress))
+        report = DeliveryReport(self.reports_dir, mailing.id)
+        try:
+            status = await self._send_all(mailing, self.progress, report)
+        finally:
+            reporter.cancel()
+            self.progress = None
+            await self.sender.limiter.set_max_rate(self.base_rate)
+            await asyncio.shield(report.close())
+
+        if status == MailingStatus.RUNNING:
+            await self._finish(mailing)
+        elif status == MailingStatus.CANCELLED:
+            await self._send_report(mailing, f"Рассылка #{mailing.id} отменена")
+
+    async def _send_all(self, mailing: Mailing, progress: MailingProgress, report: DeliveryReport) -> str:
+        """
+        Sends the job batch by batch. Returns the status the job had when sending stopped:
+        RUNNING if the audience is exhausted, otherwise the status that interrupted it.
+        """
+        cursor = mailing.cursor
+
+        while True:
+            async with self.session_pool() as session:
+                status = await RequestsRepo(session).mailings.get_status(mailing.id)
+            if status != MailingStatus.RUNNING:
+                logging.info(f"Mailing {mailing.id}: stopped with status {status}")
+                return status
+
+            batch = await self._load_batch(mailing, cursor)
+            if not batch:
+                return status
+
+            await self._apply_peak_hours(progress)
+
+            result = BatchResult(progress)
+            try:
+                await self.sender.send_batch(
+                    batch, lambda user_id: send_mailing_message(self.bot, mailing, user_id), result
+                )
+            finally:
+                cursor = result.processed_prefix(batch, cursor)
+                # Checkpoint also when cancelled mid-batch, so a restart continues right after `cursor`
+                await asyncio.shield(
+                    save_batch_result(self.session_pool, mailing.id, result, cursor, progress.rate(), self.user_cache)
+                )
+                await asyncio.shield(report.write(result.records))
+
+    async def _finish(self, mailing: Mailing) -> None:
+        async with self.session_pool() as session:
+            repo = RequestsRepo(session)
+            await repo.mailings.set_status(mailing.id, MailingStatus.DONE, (MailingStatus.RUNNING,))
+            await session.commit()
+            mailing = await repo.mailings.get_mailing(mailing.id)
+
+        await self._edit_status(mailing, f"Рассылка #{mailing.id} завершена ✅")
+        await self._send_report(
+            mailing,
+            f"Рассылка #{mailing.id} завершена ✅\n"
+            f"Доставлено: {mailing.success}\nОшибок: {mailing.failed}\n"
+            f"Отправлено повторно из-за флуд-лимита: {mailing.retried}"
+        )
+
+    async def _send_report(self, mailing: Mailing, text: str) -> None:
+        await self.bot.send_message(mailing.created_by, text)
+        for path in DeliveryReport.files(self.reports_dir, mailing.id):
+            await self.bot.send_document(
+                mailing.created_by,
+                FSInputFile(path),
+                caption="Результат по каждому получателю (JSON Lines, gzip)",
+            )
+
+        removed = await asyncio.to_thread(cleanup_reports, self.reports_dir, self.report_retention_days)
+        if removed:
+            logging.info(f"Removed {removed} old mailing reports")
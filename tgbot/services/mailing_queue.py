@@ -0,0 +1,371 @@
+import asyncio
+import json
+import logging
+from typing import Optional
+
+from aiogram import Bot
+from redis.asyncio import Redis
+from redis.exceptions import ResponseError
+
+from infrastructure.database.models import Mailing, MailingStatus
+from infrastructure.database.repo.requests import RequestsRepo
+from tgbot.services.mailing import MailingWorker, BatchResult, save_batch_result, send_mailing_message
+from tgbot.services.progress import MailingProgress
+from tgbot.services.report import DeliveryReport
+from tgbot.services.sender import BroadcastSender
+
+
+class MailingQueue:
+    """
+    Redis stream of recipient batches, read by a consumer group of mailing workers.
+
+    A batch stays in the consumer's pending list until it is completed, so the batch of a worker
+    that died is claimed by another one after `claim_idle_ms`. A live worker renews its claim while
+    it sends, so a slow batch is not taken over. Completing is atomic and gated on XACK: only the
+    first completion of an entry changes the counters. `mailing:<id>:pending` counts the recipients
+    queued for a job; the bot uses it to limit the backlog, and the stream itself to see when
+    workers are done. Batches of a paused job are parked in `mailing:<id>:parked` instead of
+    cycling through the stream, and go back to it when the job runs again.
+    """
+
+    stream = "mailing:batches"
+    group = "mailing-workers"
+    # Users deactivated by the workers, for the bot process to evict them from its user cache
+    deactivated_channel = "mailing:users-deactivated"
+
+    # Resets the idle time of the entry, but only while it is still owned by this consumer
+    _renew_script = """
+    local entry = redis.call('XPENDING', KEYS[1], ARGV[1], ARGV[3], ARGV[3], 1)[1]
+    if not entry or entry[2] ~= ARGV[2] then
+        return 0
+    end
+    redis.call('XCLAIM', KEYS[1], ARGV[1], ARGV[2], 0, ARGV[3], 'JUSTID')
+    return 1
+    """
+
+    # Moves a batch of a paused job from the stream to the job's parked list, once
+    _park_script = """
+    if redis.call('XACK', KEYS[1], ARGV[1], ARGV[2]) == 0 then
+        return 0
+    end
+    redis.call('XDEL', KEYS[1], ARGV[2])
+    redis.call('RPUSH', KEYS[2], ARGV[3])
+    redis.call('EXPIRE', KEYS[2], ARGV[4])
+    return 1
+    """
+
+    # Puts all parked batches of a job back into the stream
+    _unpark_script = """
+    local batches = redis.call('LRANGE', KEYS[2], 0, -1)
+    for _, user_ids in ipairs(batches) do
+        redis.call('XADD', KEYS[1], '*', 'mailing_id', ARGV[1], 'user_ids', user_ids)
+    end
+    redis.call('DEL', KEYS[2])
+    return #batches
+    """
+
+    # Parked batches of a job that is cancelled while paused are not needed for long
+    parked_ttl = 7 * 24 * 3600
+
+    # A second completion of the same entry (after a claim race) acknowledges nothing and changes nothing
+    _complete_script = """
+    if redis.call('XACK', KEYS[1], ARGV[1], ARGV[2]) == 0 then
+        return 0
+    end
+    redis.call('XDEL', KEYS[1], ARGV[2])
+    redis.call('DECRBY', KEYS[2], ARGV[4])
+    if ARGV[5] ~= '' then
+        redis.call('XADD', KEYS[1], '*', 'mailing_id', ARGV[3], 'user_ids', ARGV[5])
+    end
+    return 1
+    """
+
+    def __init__(self, redis: Redis, claim_idle_ms: int = 60_000) -> None:
+        self.redis = redis
+        self.claim_idle_ms = claim_idle_ms
+        self._renew = redis.register_script(self._renew_script)
+        self._complete = redis.register_script(self._complete_script)
+        self._park = redis.register_script(self._park_script)
+        self._unpark = redis.register_script(self._unpark_script)
+
+    @staticmethod
+    def _pending_key(mailing_id: int) -> str:
+        return f"mailing:{mailing_id}:pending"
+
+    @staticmethod
+    def _parked_key(mailing_id: int) -> str:
+        return f"mailing:{mailing_id}:parked"
+
+    async def ensure_group(self) -> None:
+        try:
+            await self.redis.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def push(self, mailing_id: int, user_ids: list[int]) -> None:
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.incrby(self._pending_key(mailing_id), len(user_ids))
+            pipe.xadd(self.stream, {"mailing_id": mailing_id, "user_ids": json.dumps(user_ids)})
+            await pipe.execute()
+
+    async def pending(self, mailing_id: int) -> int:
+        return int(await self.redis.get(self._pending_key(mailing_id)) or 0)
+
+    async def has_batches(self, mailing_id: int) -> bool:
+        """
+        Whether any batch of the job is still queued or being sent. Entries leave the stream only
+        in complete(), so every entry is either undelivered or in the group's pending list; the
+        stream stays short because the bot keeps at most max_backlog recipients queued.
+        """
+        if await self.redis.exists(self._parked_key(mailing_id)):
+            return True
+        start = "-"
+        while True:
+            entries = await self.redis.xrange(self.stream, min=start, count=100)
+            if any(int(fields["mailing_id"]) == mailing_id for _, fields in entries):
+                return True
+            if len(entries) < 100:
+                return False
+            start = f"({entries[-1][0]}"
+
+    async def renew(self, consumer: str, entry_id: str) -> bool:
+        """
+        Keeps a batch that is still being sent from being claimed by another worker.
+        Returns False if the batch already belongs to someone else.
+        """
+        return bool(await self._renew(keys=[self.stream], args=[self.group, consumer, entry_id]))
+
+    async def publish_deactivated(self, user_ids: list[int]) -> None:
+        if user_ids:
+            await self.redis.publish(self.deactivated_channel, json.dumps(user_ids))
+
+    async def read(self, consumer: str, block_ms: int = 5000) -> Optional[tuple[str, int, list[int]]]:
+        """
+        The next batch for this consumer: an abandoned one first, otherwise a new one.
+        Returns (entry_id, mailing_id, user_ids) or None if nothing arrived within block_ms.
+        """
+        claimed = await self.redis.xautoclaim(
+            self.stream, self.group, consumer, min_idle_time=self.claim_idle_ms, start_id="0-0", count=1
+        )
+        messages = claimed[1]
+        if not messages:
+            response = await self.redis.xreadgroup(
+                self.group, consumer, {self.stream: ">"}, count=1, block=block_ms
+            )
+            messages = response[0][1] if response else []
+        if not messages:
+            return None
+
+        entry_id, fields = messages[0]
+        return entry_id, int(fields["mailing_id"]), json.loads(fields["user_ids"])
+
+    async def park(self, entry_id: str, mailing_id: int, user_ids: list[int]) -> bool:
+        """
+        Takes a batch of a paused job out of the stream until unpark(); the recipients stay
+        counted as pending. Returns False if the batch had already been completed by another worker.
+        """
+        parked = await self._park(
+            keys=[self.stream, self._parked_key(mailing_id)],
+            args=[self.group, entry_id, json.dumps(user_ids), self.parked_ttl],
+        )
+        return bool(parked)
+
+    async def unpark(self, mailing_id: int) -> int:
+        """Puts the parked batches of a job back into the stream; returns how many there were."""
+        return int(await self._unpark(keys=[self.stream, self._parked_key(mailing_id)], args=[mailing_id]))
+
+    async def complete(self, entry_id: str, mailing_id: int, processed: int, rest: Optional[list[int]] = None) -> bool:
+        """
+        Removes the batch from the stream. Recipients in `rest` were not processed and go back
+        to the end of the queue as a new batch.
+        Returns False if the batch had already been completed by another worker.
+        """
+        completed = await self._complete(
+            keys=[self.stream, self._pending_key(mailing_id)],
+            args=[self.group, entry_id, mailing_id, processed, json.dumps(rest) if rest else ""],
+        )
+        return bool(completed)
+
+
+class QueuedMailingWorker(MailingWorker):
+    """
+    MailingWorker for MAILING_MODE=redis: runs in the bot process but does not send.
+
+    It reads the audience in batches and pushes them to the MailingQueue, at most `max_backlog`
+    recipients ahead of the workers; `cursor` therefore means "queued up to". Scheduling, status
+    changes, progress messages and the final report stay here. The counters are written by the
+    workers and read back from the database for the progress message.
+    """
+
+    def __init__(self, bot: Bot, session_pool, sender: BroadcastSender, queue: MailingQueue,
+                 max_backlog: int = 2000, **kwargs) -> None:
+        super().__init__(bot, session_pool, sender, **kwargs)
+        self.queue = queue
+        self.max_backlog = max_backlog
+        self._evictor: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        await self.queue.ensure_group()
+        if self.user_cache is not None:
+            self._evictor = asyncio.create_task(self._evict_deactivated())
+        await super().start()
+
+    async def stop(self) -> None:
+        if self._evictor:
+            self._evictor.cancel()
+            try:
+                await self._evictor
+            except asyncio.CancelledError:
+                pass
+            self._evictor = None
+        await super().stop()
+
+    async def _evict_deactivated(self) -> None:
+        """
+        Evicts the users the workers deactivated from the user cache. Pub/sub does not keep
+        messages, so after every (re)subscription the whole cache is dropped instead.
+        """
+        while True:
+            try:
+                async with self.queue.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self.queue.deactivated_channel)
+                    self.user_cache.clear()
+                    async for message in pubsub.listen():
+                        if message["type"] != "message":
+                            continue
+                        for user_id in json.loads(message["data"]):
+                            self.user_cache.invalidate(user_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logging.exception("User cache eviction listener failed, resubscribing")
+                await asyncio.sleep(1)
+
+    async def _queued_count(self, mailing: Mailing) -> int:
+        return await self.queue.pending(mailing.id)
+
+    async def _sync_progress(self, mailing_id: int, progress: MailingProgress) -> str:
+        async with self.session_pool() as session:
+            mailing = await RequestsRepo(session).mailings.get_mailing(mailing_id)
+        progress.update(mailing.success, mailing.failed, mailing.retried)
+        return mailing.status
+
+    async def _send_all(self, mailing: Mailing, progress: MailingProgress, report: DeliveryReport) -> str:
+        cursor = mailing.cursor
+        exhausted = False
+
+        while True:
+            status = await self._sync_progress(mailing.id, progress)
+            if status != MailingStatus.RUNNING:
+                logging.info(f"Mailing {mailing.id}: stopped with status {status}")
+                return status
+
+            # Batches parked while the job was paused, also by a worker that saw the pause late
+            unparked = await self.queue.unpark(mailing.id)
+            if unparked:
+                logging.info(f"Mailing {mailing.id}: {unparked} parked batches queued again")
+
+            await self._apply_peak_hours(progress)
+
+            pending = await self.queue.pending(mailing.id)
+            if exhausted or pending >= self.max_backlog:
+                # Done once no batch of the job is queued or being sent; the counter may lag behind
+                if exhausted and not await self.queue.has_batches(mailing.id):
+                    return status
+                await asyncio.sleep(1)
+                continue
+
+            batch = await self._load_batch(mailing, cursor)
+            if not batch:
+                exhausted = True
+                continue
+
+            await self.queue.push(mailing.id, batch)
+            cursor = batch[-1]
+            async with self.session_pool() as session:
+                await RequestsRepo(session).mailings.checkpoint(mailing.id, cursor, 0, 0, 0, progress.rate())
+                await session.commit()
+
+
+class BatchConsumer:
+    """
+    Worker-process side of MAILING_MODE=redis.
+
+    Takes batches from the MailingQueue and sends them through a sender whose limiter is the
+    RedisTokenBucket shared by all workers. The batch counters and unreachable users go to the
+    database and per-recipient results to this worker's part of the job report; then the batch is
+    completed. On shutdown the unprocessed rest of the current batch is put back in the queue.
+    Batches of paused jobs are parked until the job is resumed, and batches of cancelled jobs
+    are dropped.
+
+    The report parts are written to the local `reports_dir`, and the bot collects them from its
+    own one when the job ends: all workers and the bot must share that directory (a common volume).
+    """
+
+    def __init__(self, bot: Bot, session_pool, sender: BroadcastSender, queue: MailingQueue, name: str,
+                 reports_dir: str = "reports", idle_sleep: float = 1.0) -> None:
+        self.bot = bot
+        self.session_pool = session_pool
+        self.sender = sender
+        self.queue = queue
+        self.name = name
+        self.reports_dir = reports_dir
+        self.idle_sleep = idle_sleep
+
+    async def run(self) -> None:
+        await self.queue.ensure_group()
+        logging.info(f"Mailing worker {self.name} started")
+        while True:
+            entry = await self.queue.read(self.name)
+            if entry is None:
+                continue
+            try:
+                await self._handle(*entry)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # The batch stays pending and is claimed again after claim_idle_ms
+                logging.exception(f"Mailing worker {self.name}: batch {entry[0]} failed")
+                await asyncio.sleep(self.idle_sleep)
+
+    async def _handle(self, entry_id: str, mailing_id: int, user_ids: list[int]) -> None:
+        async with self.session_pool() as session:
+            mailing = await RequestsRepo(session).mailings.get_mailing(mailing_id)
+
+        if mailing is None or mailing.status in (MailingStatus.CANCELLED, MailingStatus.DONE):
+            await self.queue.complete(entry_id, mailing_id, processed=len(user_ids))
+            return
+        if mailing.status != MailingStatus.RUNNING:
+            await self.queue.park(entry_id, mailing_id, user_ids)
+            return
+
+        result = BatchResult()
+        keeper = asyncio.create_task(self._keep_claimed(entry_id))
+        try:
+            await self.sender.send_batch(
+                user_ids, lambda user_id: send_mailing_message(self.bot, mailing, user_id), result
+            )
+        finally:
+            keeper.cancel()
+            await asyncio.shield(self._save(entry_id, mailing_id, user_ids, result))
+
+    async def _keep_claimed(self, entry_id: str) -> None:
+        """Renews the claim on the batch well within claim_idle_ms while it is being sent."""
+        while True:
+            await asyncio.sleep(self.queue.claim_idle_ms / 1000 / 3)
+            if not await self.queue.renew(self.name, entry_id):
+                logging.warning(f"Mailing worker {self.name}: batch {entry_id} was claimed by another worker")
+                return
+
+    async def _save(self, entry_id: str, mailing_id: int, user_ids: list[int], result: BatchResult) -> None:
+        await save_batch_result(self.session_pool, mailing_id, result)
+        await self.queue.publish_deactivated(result.unreachable)
+
+        report = DeliveryReport(self.reports_dir, mailing_id, part=self.name)
+        await report.write(result.records)
+        await report.close()
+
+        rest = [user_id for user_id in user_ids if user_id not in result.done]
+        if not await self.queue.complete(entry_id, mailing_id, processed=len(user_ids) - len(rest), rest=rest):
+            logging.warning(f"Mailing worker {self.name}: batch {entry_id} was already completed")
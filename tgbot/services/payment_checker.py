@@ -0,0 +1,84 @@
+import asyncio
+from typing import Optional
+
+from aiogram import Bot
+
+from infrastructure.database.cache import TTLCache
+from infrastructure.database.repo.requests import RequestsRepo
+from tgbot.config import Config
+from tgbot.services.access import deliver_access
+from tgbot.services.invite_links import InviteLinkPool
+from tgbot.utils.payment_utils import Payment
+
+_MISSING = object()
+
+
+class PaymentChecker:
+    """
+    Payment status check behind the "check payment" button, deduplicated per user.
+
+    Concurrent checks for the same user share one flight: one purchase lookup and one GetState
+    call, whose result is then served from a short-lived cache for `cache_ttl` seconds. The
+    flight runs in its own sessions and is shielded from the handlers waiting for it, so a
+    confirmed payment is always marked paid and delivered, once, even if they are cancelled.
+    Exactly-once across processes (the webhook, the reconciler) comes from PurchaseRepo.mark_paid.
+    """
+
+    def __init__(self, bot: Bot, config: Config, session_pool, payment: Payment, invite_links: InviteLinkPool,
+                 cache_ttl: float = 5, cache_size: int = 10_000) -> None:
+        self.bot = bot
+        self.config = config
+        self.session_pool = session_pool
+        self.payment = payment
+        self.invite_links = invite_links
+        self._results = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self._flights: dict[int, asyncio.Future] = {}
+
+    async def check(self, user_id: int, username: Optional[str] = None) -> Optional[bool]:
+        """
+        :return: True if the user's purchase is paid, False if not, None if there is no purchase.
+        """
+        result = self._results.get(user_id, _MISSING)
+        if result is not _MISSING:
+            return result
+
+        flight = self._flights.get(user_id)
+        if flight is None:
+            flight = asyncio.ensure_future(self._check(user_id, username))
+            self._flights[user_id] = flight
+            flight.add_done_callback(lambda _: self._flights.pop(user_id, None))
+        return await asyncio.shield(flight)
+
+    async def stop(self, timeout: float = 10) -> None:
+        """
+        Lets the running checks finish, so a confirmed payment is not left paid but undelivered;
+        the ones still running after `timeout` seconds are cancelled, the reconciler picks them up.
+        """
+        flights = list(self._flights.values())
+        if not flights:
+            return
+        _, running = await asyncio.wait(flights, timeout=timeout)
+        for flight in running:
+            flight.cancel()
+        await asyncio.gather(*flights, return_exceptions=True)
+
+    async def _check(self, user_id: int, username: Optional[str]) -> Optional[bool]:
+        async with self.session_pool() as session:
+            purchase = await RequestsRepo(session).purchases.get_purchase_by_user(user_id)
+
+        if purchase is None or purchase.is_paid or not purchase.payment_id:
+            result = None if purchase is None else purchase.is_paid
+            self._results.set(user_id, result)
+            return result
+
+        # No session is held while waiting for the acquirer
+        confirmed = await self.payment.get_payment_status(str(purchase.payment_id))
+        if confirmed:
+            async with self.session_pool() as session:
+                paid = await RequestsRepo(session).purchases.mark_paid(purchase.id)
+                await session.commit()
+            if paid:
+                await deliver_access(self.bot, self.config, self.session_pool, self.invite_links, paid, username)
+
+        self._results.set(user_id, confirmed)
+        return confirmed
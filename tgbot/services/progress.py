@@ -0,0 +1,72 @@
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Optional
+
+
+@dataclass
+class MailingProgress:
+    """
+    Live counters of a running mailing.
+
+    The rate is measured over the last `window` seconds, so it drops while sends are held back
+    by a flood wait and the ETA follows the current throughput rather than the average one.
+    Counters are fed either per recipient (`record`) or from totals read elsewhere (`update`).
+    """
+    mailing_id: int
+    total: int
+    sent: int = 0
+    failed: int = 0
+    retried: int = 0
+    window: float = 30.0
+    started_at: float = field(default_factory=time.monotonic)
+    _events: deque = field(default_factory=deque, repr=False)
+
+    @property
+    def processed(self) -> int:
+        return self.sent + self.failed
+
+    @property
+    def remaining(self) -> int:
+        return max(self.total - self.processed, 0)
+
+    def record(self, delivered: bool, retried: bool = False) -> None:
+        if delivered:
+            self.sent += 1
+        else:
+            self.failed += 1
+        if retried:
+            self.retried += 1
+        self._events.append((time.monotonic(), 1))
+
+    def update(self, sent: int, failed: int, retried: int) -> None:
+        processed = sent + failed - self.processed
+        self.sent, self.failed, self.retried = sent, failed, retried
+        if processed > 0:
+            self._events.append((time.monotonic(), processed))
+
+    def rate(self) -> float:
+        """Processed recipients per second over the sliding window."""
+        now = time.monotonic()
+        while self._events and self._events[0][0] < now - self.window:
+            self._events.popleft()
+        span = min(self.window, now - self.started_at)
+        return sum(count for _, count in self._events) / span if span > 0 else 0.0
+
+    def eta(self) -> Optional[float]:
+        """Seconds until the audience is processed at the current rate, None while nothing is sent."""
+        rate = self.rate()
+        return self.remaining / rate if rate else None
+
+    def render(self) -> str:
+        eta = self.eta()
+        return (
+            f"Рассылка #{self.mailing_id} выполняется ⏳\n"
+            f"Отправлено: {self.sent} из {self.total}\n"
+            f"Ошибок: {self.failed}\n"
+            f"Повторов: {self.retried}\n"
+            f"Осталось: {self.remaining}\n"
+            f"Скорость: {self.rate():.1f} сообщ./с\n"
+            f"До окончания: {timedelta(seconds=int(eta)) if eta is not None else '—'}"
+        )
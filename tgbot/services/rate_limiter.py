@@ -0,0 +1,169 @@
+import asyncio
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    Token-bucket rate limiter.
+
+    Tokens are added continuously at `rate` per second up to `capacity`; every send takes one.
+    Waiters are served in FIFO order, so a single bucket shared by all senders of the process
+    keeps the total throughput at `rate` no matter how many coroutines send concurrently.
+
+    When Telegram answers with a flood wait, `penalize` stops the bucket for the advertised
+    window and halves the rate; afterwards the rate grows back linearly to the configured
+    value over `recovery_time` seconds.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None, min_rate: float = 1.0,
+                 recovery_time: float = 60.0) -> None:
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.min_rate = min(min_rate, rate)
+        self.recovery_time = recovery_time
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        start = max(self._updated, self._paused_until)
+        if now > start:
+            elapsed = now - start
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + elapsed * self.max_rate / self.recovery_time)
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated = now
+
+    async def penalize(self, retry_after: float) -> None:
+        """
+        Reacts to a flood wait: no tokens are issued for `retry_after` seconds.
+        The rate is halved once per window, so simultaneous 429s of concurrent sends
+        do not push it down to the minimum.
+        """
+        self._refill()
+        now = time.monotonic()
+        if now >= self._paused_until:
+            self.rate = max(self.min_rate, self.rate / 2)
+        self._paused_until = max(self._paused_until, now + retry_after)
+        self._tokens = 0
+
+    async def set_max_rate(self, rate: float) -> None:
+        """
+        Changes the rate ceiling. Lowering takes effect at once, raising goes through the same
+        linear ramp as the recovery after a flood wait.
+        """
+        self._refill()
+        self.max_rate = rate
+        self.rate = min(self.rate, rate)
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        async with self._lock:
+            while True:
+                self._refill()
+                paused_for = self._paused_until - time.monotonic()
+                if paused_for > 0:
+                    await asyncio.sleep(paused_for)
+                    continue
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+
+class RedisTokenBucket:
+    """
+    The same token bucket kept in a Redis hash, so several processes share one rate limit.
+
+    Refill, flood-wait pause, halving and recovery follow TokenBucket and run atomically in Lua
+    scripts against the Redis server clock. `acquire` gets back how long to wait and sleeps
+    locally, so waiting does not hold any Redis connection.
+
+    The configured rate comes with every call, so a changed setting applies on restart. The hash
+    only keeps `rate_factor`, the share of it set by set_max_rate (peak hours), which every
+    process sharing the bucket follows.
+    """
+
+    _ACQUIRE = """
+    local now_parts = redis.call('TIME')
+    local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated', 'rate', 'rate_factor', 'paused_until')
+    local capacity = tonumber(ARGV[2])
+    local max_rate = tonumber(ARGV[1]) * (tonumber(state[4]) or 1)
+    local tokens = tonumber(state[1]) or capacity
+    local updated = tonumber(state[2]) or now
+    local rate = math.min(tonumber(state[3]) or max_rate, max_rate)
+    local paused_until = tonumber(state[5]) or 0
+    local requested = tonumber(ARGV[4])
+
+    local start = math.max(updated, paused_until)
+    if now > start then
+        local elapsed = now - start
+        rate = math.min(max_rate, rate + elapsed * max_rate / tonumber(ARGV[3]))
+        tokens = math.min(capacity, tokens + elapsed * rate)
+    end
+
+    local wait = 0
+    if now < paused_until then
+        wait = paused_until - now
+    elseif tokens >= requested then
+        tokens = tokens - requested
+    else
+        wait = (requested - tokens) / rate
+    end
+
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now), 'rate', tostring(rate))
+    redis.call('EXPIRE', KEYS[1], 86400)
+    return tostring(wait)
+    """
+
+    _PENALIZE = """
+    local now_parts = redis.call('TIME')
+    local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+    local state = redis.call('HMGET', KEYS[1], 'rate', 'paused_until')
+    local rate = tonumber(state[1]) or tonumber(ARGV[1])
+    local paused_until = tonumber(state[2]) or 0
+
+    if now >= paused_until then
+        rate = math.max(tonumber(ARGV[2]), rate / 2)
+    end
+    paused_until = math.max(paused_until, now + tonumber(ARGV[3]))
+
+    redis.call('HSET', KEYS[1], 'tokens', '0', 'updated', tostring(now), 'rate', tostring(rate),
+               'paused_until', tostring(paused_until))
+    redis.call('EXPIRE', KEYS[1], 86400)
+    return 1
+    """
+
+    def __init__(self, redis, rate: float, key: str = "mailing:rate_limit", capacity: Optional[float] = None,
+                 min_rate: float = 1.0, recovery_time: float = 60.0) -> None:
+        self.redis = redis
+        self.key = key
+        self.configured_rate = rate
+        self.max_rate = rate
+        self.capacity = capacity or rate
+        self.min_rate = min(min_rate, rate)
+        self.recovery_time = recovery_time
+        self._acquire = redis.register_script(self._ACQUIRE)
+        self._penalize = redis.register_script(self._PENALIZE)
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        while True:
+            wait = float(await self._acquire(
+                keys=[self.key],
+                args=[self.configured_rate, self.capacity, self.recovery_time, tokens],
+            ))
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    async def penalize(self, retry_after: float) -> None:
+        await self._penalize(keys=[self.key], args=[self.max_rate, self.min_rate, retry_after])
+
+    async def set_max_rate(self, rate: float) -> None:
+        """Sets the ceiling for every process sharing the bucket, as a share of the configured rate."""
+        self.max_rate = rate
+        await self.redis.hset(self.key, "rate_factor", str(rate / self.configured_rate))
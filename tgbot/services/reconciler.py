@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import time
+from datetime import timedelta
+from typing import Optional
+
+from aiogram import Bot
+
+from infrastructure.database.models.purchases import Purchase
+from infrastructure.database.repo.requests import RequestsRepo
+from tgbot.config import Config
+from tgbot.services.access import deliver_access, send_purchase_invite, delivery_lease
+from tgbot.services.invite_links import InviteLinkPool
+from tgbot.utils.payment_utils import Payment
+
+
+class PaymentReconciler:
+    """
+    Finds payments nobody confirmed: users who paid but never pressed "check payment" and whose
+    notification was lost.
+
+    Every `interval` seconds it reads the unpaid purchases with a payment from the last
+    `max_age_hours`, asks GetState for the ones that are due, at most `concurrency` at a time,
+    marks the confirmed ones paid with one UPDATE and delivers their access. A purchase is
+    checked less often the older it gets (see `backoff`); the last check times are kept in
+    memory, so after a restart every candidate is checked once more.
+
+    Each pass also sends the invites that paid purchases of the same window are still missing:
+    the webhook delivers them in the background after answering, and a failed send or a restart
+    in between leaves the purchase paid with `access_sent_at` unset.
+    """
+
+    # (age up to, seconds between checks); older payments rarely turn out paid
+    backoff = (
+        (timedelta(minutes=15), 60),
+        (timedelta(hours=1), 5 * 60),
+        (timedelta(hours=6), 15 * 60),
+        (None, 60 * 60),
+    )
+
+    def __init__(self, bot: Bot, config: Config, session_pool, payment: Payment, invite_links: InviteLinkPool,
+                 interval: float = 60, max_age_hours: int = 24, concurrency: int = 5) -> None:
+        self.bot = bot
+        self.config = config
+        self.session_pool = session_pool
+        self.payment = payment
+        self.invite_links = invite_links
+        self.interval = interval
+        self.max_age = timedelta(hours=max_age_hours)
+        self.concurrency = concurrency
+        self._checked: dict[int, float] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def _period(self, age: float) -> float:
+        for limit, period in self.backoff:
+            if limit is None or age <= limit.total_seconds():
+                return period
+
+    async def redeliver(self) -> int:
+        """
+        Sends the invites of paid purchases that have not got one.
+
+        :return: Number of invites sent.
+        """
+        async with self.session_pool() as session:
+            pending = await RequestsRepo(session).purchases.get_undelivered_paid(self.max_age, delivery_lease)
+
+        sent = 0
+        for purchase in pending:
+            if await send_purchase_invite(self.bot, self.session_pool, self.invite_links, purchase):
+                logging.info(f"Purchase {purchase.id}: channel invite re-sent")
+                sent += 1
+        return sent
+
+    async def reconcile(self) -> int:
+        """
+        One pass over the candidates.
+
+        :return: Number of purchases this pass moved to paid.
+        """
+        await self.redeliver()
+
+        async with self.session_pool() as session:
+            candidates = await RequestsRepo(session).purchases.get_unpaid_with_payment(self.max_age)
+
+        now = time.monotonic()
+        self._checked = {
+            purchase.id: self._checked[purchase.id] for purchase, _ in candidates if purchase.id in self._checked
+        }
+        due = [
+            purchase for purchase, age in candidates
+            if now - self._checked.get(purchase.id, float("-inf")) >= self._period(age)
+        ]
+        if not due:
+            return 0
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def is_confirmed(purchase: Purchase) -> bool:
+            async with semaphore:
+                return await self.payment.get_payment_status(str(purchase.payment_id))
+
+        statuses = await asyncio.gather(*(is_confirmed(purchase) for purchase in due))
+        for purchase in due:
+            self._checked[purchase.id] = now
+        confirmed = [purchase.id for purchase, status in zip(due, statuses) if status]
+        if not confirmed:
+            return 0
+
+        async with self.session_pool() as session:
+            repo = RequestsRepo(session)
+            paid = await repo.purchases.mark_paid_many(confirmed)
+            usernames = {}
+            for purchase in paid:
+                user = await repo.users.get_user_by_id(purchase.user_id)
+                usernames[purchase.id] = user.username if user else None
+            await session.commit()
+
+        for purchase in paid:
+            logging.info(f"Purchase {purchase.id} paid (reconciled, payment {purchase.payment_id})")
+            await deliver_access(self.bot, self.config, self.session_pool, self.invite_links, purchase,
+                                 usernames[purchase.id])
+        return len(paid)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.reconcile()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logging.exception("Payment reconciliation failed")
+            await asyncio.sleep(self.interval)
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,82 @@
+import asyncio
+import gzip
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+
+class DeliveryReport:
+    """
+    Per-recipient results of a mailing as gzip-compressed JSON lines.
+
+    Results are written after every batch from a worker thread, so the event loop never blocks on
+    disk I/O and memory is bounded by the batch size, not by the audience. The file is created on
+    the first write and opened in append mode: a resumed job continues the same report (gzip
+    members concatenate into one valid stream). Separate worker processes write their own `part`.
+    """
+
+    def __init__(self, directory: str, mailing_id: int, part: Optional[str] = None) -> None:
+        suffix = f"_{part}" if part else ""
+        self.path = Path(directory) / f"mailing_{mailing_id}{suffix}.jsonl.gz"
+        self._file: Optional[gzip.GzipFile] = None
+
+    def _open(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        return gzip.open(self.path, "at", encoding="utf-8")
+
+    async def write(self, records: list[dict]) -> None:
+        if not records:
+            return
+        if self._file is None:
+            self._file = await asyncio.to_thread(self._open)
+        lines = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+        await asyncio.to_thread(self._file.write, lines)
+
+    async def close(self) -> None:
+        if self._file is not None:
+            await asyncio.to_thread(self._file.close)
+            self._file = None
+
+    @staticmethod
+    def files(directory: str, mailing_id: int) -> list[Path]:
+        """All report files of the job: the main one and the parts written by separate workers."""
+        path = Path(directory)
+        return sorted(
+            path.glob(f"mailing_{mailing_id}.jsonl.gz")
+        ) + sorted(
+            path.glob(f"mailing_{mailing_id}_*.jsonl.gz")
+        )
+
+    @staticmethod
+    def record(user_id: int, error: Optional[BaseException], retries: int) -> dict:
+        return {
+            "user_id": user_id,
+            "status": "delivered" if error is None else "failed",
+            "error": repr(error) if error is not None else None,
+            "retries": retries,
+            "ts": datetime.utcnow().isoformat(timespec="seconds"),
+        }
+
+
+def cleanup_reports(directory: str, max_age_days: int) -> int:
+    """
+    Deletes reports older than max_age_days. Returns the number of removed files.
+    """
+    path = Path(directory)
+    if not path.is_dir():
+        return 0
+
+    deadline = time.time() - max_age_days * 86400
+    removed = 0
+    for report in path.glob("mailing_*.jsonl.gz"):
+        try:
+            if report.stat().st_mtime < deadline:
+                os.remove(report)
+                removed += 1
+        except OSError as e:
+            logging.warning(f"Failed to remove report {report}: {e}")
+    return removed
@@ -0,0 +1,157 @@
+import asyncio
+import time
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Iterable
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+
+from tgbot.services.rate_limiter import TokenBucket
+
+
+class Lane:
+    INTERACTIVE = "interactive"
+    BULK = "bulk"
+
+
+# Lane of the requests made from the current task; mass senders switch their tasks to BULK
+request_lane: ContextVar[str] = ContextVar("request_lane", default=Lane.INTERACTIVE)
+
+
+@dataclass
+class LaneStats:
+    queued: int = 0
+    requests: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "queued": self.queued,
+            "requests": self.requests,
+            "avg_wait": self.total_wait / self.requests if self.requests else 0.0,
+            "max_wait": self.max_wait,
+        }
+
+
+class RequestScheduler(BaseRequestMiddleware):
+    """
+    Outgoing-request scheduler in front of the Bot session.
+
+    Only requests addressed to a chat are scheduled; getUpdates, answerCallbackQuery and other
+    service calls pass straight through. A scheduled request waits for a permit from the global
+    bucket; permits go to waiting interactive requests first, so bulk traffic only gets what
+    interactive traffic leaves over. Messages (send, copy, forward, edit) additionally wait for
+    their chat first: a small burst, then `per_chat_rate` per second. Chats in `exempt_chats`
+    (the admins, the course channel) and other methods such as createChatInviteLink are not paced.
+
+    The global bucket is process-local by default. With separate mailing workers pass a shared
+    RedisTokenBucket as `limiter`, so the bot and the workers stay within one `rate` together.
+    """
+
+    # Method name prefixes that put a message into the chat and count towards its limit
+    paced_methods = ("Send", "Copy", "Forward", "Edit")
+
+    # Redis key of the global bucket shared by the bot and the mailing workers
+    shared_limiter_key = "telegram:rate_limit"
+
+    def __init__(self, rate: float = 30, per_chat_rate: float = 1.0, per_chat_burst: int = 3,
+                 max_tracked_chats: int = 10_000, exempt_chats: Iterable[int] = (), limiter=None) -> None:
+        self.limiter = limiter or TokenBucket(rate)
+        self.per_chat_rate = per_chat_rate
+        self.per_chat_burst = per_chat_burst
+        self.max_tracked_chats = max_tracked_chats
+        self.exempt_chats = frozenset(exempt_chats)
+        self._chats: dict = {}
+        self._queues = {Lane.INTERACTIVE: deque(), Lane.BULK: deque()}
+        self._stats = {Lane.INTERACTIVE: LaneStats(), Lane.BULK: LaneStats()}
+        self._wakeup = asyncio.Event()
+        self._dispatcher = None
+
+    def stats(self) -> dict:
+        return {lane: stats.as_dict() for lane, stats in self._stats.items()}
+
+    async def close(self) -> None:
+        if self._dispatcher:
+            self._dispatcher.cancel()
+            try:
+                await self._dispatcher
+            except asyncio.CancelledError:
+                pass
+            self._dispatcher = None
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None:
+            return await make_request(bot, method)
+
+        lane = request_lane.get()
+        stats = self._stats[lane]
+        started = time.monotonic()
+        stats.queued += 1
+        try:
+            if self._is_paced(method, chat_id):
+                await self._pace_chat(chat_id)
+            await self._permit(lane)
+        finally:
+            stats.queued -= 1
+        waited = time.monotonic() - started
+        stats.requests += 1
+        stats.total_wait += waited
+        stats.max_wait = max(stats.max_wait, waited)
+
+        return await make_request(bot, method)
+
+    def _is_paced(self, method: TelegramMethod, chat_id) -> bool:
+        return chat_id not in self.exempt_chats and type(method).__name__.startswith(self.paced_methods)
+
+    async def _pace_chat(self, chat_id) -> None:
+        now = time.monotonic()
+        if len(self._chats) > self.max_tracked_chats:
+            # Chats whose bucket is full again carry no state worth keeping
+            horizon = now - self.per_chat_burst / self.per_chat_rate
+            self._chats = {chat: state for chat, state in self._chats.items() if state[1] > horizon}
+
+        tokens, updated = self._chats.get(chat_id, (self.per_chat_burst, now))
+        tokens = min(self.per_chat_burst, tokens + (now - updated) * self.per_chat_rate)
+        # Reserve the token right away, so concurrent requests to the chat line up behind each other
+        self._chats[chat_id] = (tokens - 1, now)
+        if tokens < 1:
+            await asyncio.sleep((1 - tokens) / self.per_chat_rate)
+
+    async def _permit(self, lane: str) -> None:
+        if self._dispatcher is None:
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues[lane].append(waiter)
+        self._wakeup.set()
+        await waiter
+
+    def _next_waiter(self):
+        for lane in (Lane.INTERACTIVE, Lane.BULK):
+            queue = self._queues[lane]
+            while queue:
+                waiter = queue.popleft()
+                if not waiter.done():
+                    return waiter
+        return None
+
+    async def _dispatch(self) -> None:
+        while True:
+            await self.limiter.acquire()
+            waiter = self._next_waiter()
+            while waiter is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                waiter = self._next_waiter()
+            waiter.set_result(None)
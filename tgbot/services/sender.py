@@ -0,0 +1,84 @@
+import asyncio
+from typing import Awaitable, Callable, Iterable, Optional, Union
+
+from aiogram import exceptions
+
+from tgbot.services.rate_limiter import TokenBucket, RedisTokenBucket
+from tgbot.services.request_scheduler import Lane, request_lane
+
+Recipient = Union[int, str]
+
+
+class BroadcastSender:
+    """
+    Shared sender for mass sends.
+
+    `concurrency` workers take recipients from a queue, while the token bucket caps how many
+    sends start per second. With enough concurrency the throughput stays at the limiter rate
+    whatever the Telegram API latency is.
+
+    A flood wait (TelegramRetryAfter) slows the whole bucket down and puts the recipient back
+    at the end of the queue; after `max_retries` repeated flood waits the recipient is reported
+    with the last TelegramRetryAfter as its error.
+
+    The workers mark their requests as bulk, so a RequestScheduler on the bot session lets
+    interactive replies go first.
+    """
+
+    def __init__(self, limiter: Union[TokenBucket, RedisTokenBucket], concurrency: int = 10, max_retries: int = 3) -> None:
+        self.limiter = limiter
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+
+    async def send_batch(
+            self,
+            recipients: Iterable[Recipient],
+            send: Callable[[Recipient], Awaitable[object]],
+            on_result: Optional[Callable[[Recipient, Optional[BaseException], int], None]] = None,
+    ) -> dict:
+        """
+        Calls send(recipient) for every recipient and waits for all of them.
+
+        :param recipients: Chat ids.
+        :param send: Coroutine function that delivers to one recipient and raises on failure.
+        :param on_result: Optional callback invoked as soon as a recipient is done,
+            with the error or None and the number of flood-wait retries it took.
+        :return: Mapping recipient -> error or None.
+        """
+        queue = asyncio.Queue()
+        for recipient in recipients:
+            queue.put_nowait((recipient, 0))
+        results = {}
+
+        async def worker() -> None:
+            request_lane.set(Lane.BULK)
+            while True:
+                recipient, retries = await queue.get()
+                try:
+                    await self.limiter.acquire()
+                    try:
+                        await send(recipient)
+                        error = None
+                    except exceptions.TelegramRetryAfter as e:
+                        await self.limiter.penalize(e.retry_after)
+                        if retries < self.max_retries:
+                            queue.put_nowait((recipient, retries + 1))
+                            continue
+                        error = e
+                    except Exception as e:
+                        error = e
+
+                    results[recipient] = error
+                    if on_result:
+                        on_result(recipient, error, retries)
+                finally:
+                    queue.task_done()
+
+        workers = [asyncio.create_task(worker()) for _ in range(min(self.concurrency, queue.qsize()))]
+        try:
+            await queue.join()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        return results
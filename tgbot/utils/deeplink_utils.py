@@ -1,127 +1,299 @@
+import json
 import logging
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
 
 from aiogram.enums import ParseMode
 from aiogram.exceptions import TelegramBadRequest
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message, InputMediaPhoto, \
-    InputMediaVideo, InputMediaAudio, InlineKeyboardMarkup, InlineKeyboardButton
+    InputMediaVideo, InputMediaAudio, InlineKeyboardMarkup, URLInputFile
 from sqlalchemy.exc import SQLAlchemyError
 
+from infrastructure.database.repo.requests import RequestsRepo
 from tgbot.config import _process_message
-from tgbot.utils.db_utils import get_repo
-from tgbot.utils.media import send_media, build_keyboard
+from tgbot.utils.media import MEDIA_ANSWER_METHODS, make_keyboard
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
 
-class ScenarioHandler:
-    def __init__(self, message: Message, state: FSMContext, config, params=None):
-        self.message = message
-        self.state = state
-        self.config = config
-        self.params = params or {}
-        self.callbacks = {}
+class ScenarioError(ValueError):
+    """Сценарий диплинка не прошёл проверку при компиляции."""
 
-    async def handle_scenario(self, scenario: dict):
-        self.callbacks = scenario.get("callbacks", {})
-        await self.state.update_data(callbacks=self.callbacks)  # ← Сохраняем в FSM
-        actions = scenario.get("actions", [])
-        for action in actions:
-            await self.handle_action(action)
 
+_NO_UPDATE = object()
 
-    async def handle_action(self, action: dict):
-        action_type = action.get("action")
-        params = action.get("params", {})
 
-        if action_type == "execute_function":
-            await self.handle_execute_function(params)
-        elif action_type == "send_text":
-            await self.handle_send_text(params)
-        elif action_type.startswith("send_"):
-            await self.handle_send_media(action_type, params)
-        else:
-            logger.warning(f"Unknown action type: {action_type}")
+def _compile_update_keyboard(params: dict):
+    if "update_keyboard" not in params:
+        return _NO_UPDATE
+    update_params = params["update_keyboard"]
+    if isinstance(update_params, dict):
+        update_params = update_params.get("keyboard", [])
+    return make_keyboard(update_params)
 
-    async def handle_execute_function(self, params: dict):
-        functions = params.get("functions", [])
-        for func in functions:
-            await self.execute_function(func.get("function_name"), func.get("params", {}))
 
-    async def handle_send_text(self, params: dict):
-        try:
-            text = params.get("text", "Default Text Message")
-            keyboard_data = params.get("keyboard", [])
-            keyboard = await build_keyboard(keyboard_data)
+@dataclass(frozen=True)
+class TextStep:
+    text: str
+    keyboard: Optional[InlineKeyboardMarkup]
+    update_keyboard: Any = _NO_UPDATE
 
-            sent_message = await self.message.answer(
-                text=_process_message(text),
-                reply_markup=keyboard,
+    async def run(self, handler: "ScenarioHandler"):
+        try:
+            sent_message = await handler.message.answer(
+                text=self.text,
+                reply_markup=self.keyboard,
                 parse_mode=ParseMode.HTML
             )
 
-            if "update_keyboard" in params:
-                await self.update_keyboard(params["update_keyboard"], sent_message)
+            if self.update_keyboard is not _NO_UPDATE:
+                await handler.update_keyboard(self.update_keyboard, sent_message)
 
         except TelegramBadRequest as e:
             logger.exception(f"Failed to send text message: {e}")
 
-    async def handle_send_media(self, media_type: str, params: dict):
+
+@dataclass(frozen=True)
+class MediaStep:
+    media_type: str
+    answer_method: str
+    file_id: Optional[str]
+    url: Optional[str]
+    caption: Optional[str]
+    keyboard: Optional[InlineKeyboardMarkup]
+    update_keyboard: Any = _NO_UPDATE
+
+    async def run(self, handler: "ScenarioHandler"):
         try:
-            sent_message = await send_media(self.message, media_type, params)
-            if "update_keyboard" in params:
-                await self.update_keyboard(params["update_keyboard"], sent_message)
+            sender = getattr(handler.message, self.answer_method)
+            media = self.file_id or URLInputFile(self.url)
+            try:
+                sent_message = await sender(media, caption=self.caption, reply_markup=self.keyboard)
+            except TelegramBadRequest as e:
+                raise ValueError(f"Failed to send {self.media_type}: {e}")
+
+            if self.update_keyboard is not _NO_UPDATE:
+                await handler.update_keyboard(self.update_keyboard, sent_message)
         except Exception as e:
-            logger.exception(f"Failed to send media {media_type}: {e}")
+            logger.exception(f"Failed to send media {self.media_type}: {e}")
 
-    async def execute_function(self, function_path: str, params: dict):
-        if not function_path:
-            return
 
+@dataclass(frozen=True)
+class MediaGroupStep:
+    media: tuple
+
+    async def run(self, handler: "ScenarioHandler"):
         try:
-            if function_path.startswith("send_"):
-                await self.handle_send_media(function_path, params)
-                return
+            media_group = [
+                InputMediaPhoto(media=item) if item_type == "photo" else InputMediaVideo(media=item)
+                for item_type, item in self.media
+            ]
+            await handler.message.answer_media_group(media_group)
+        except Exception as e:
+            logger.exception(f"Failed to send media send_media_group: {e}")
 
-            repo_name, func_name = function_path.split(".", 1)
-            repo = await get_repo(self.config)
-            repo_obj = getattr(repo, repo_name, None)
-            if not repo_obj:
-                raise AttributeError(f"Repository '{repo_name}' not found")
 
-            func = getattr(repo_obj, func_name, None)
-            if not func:
-                raise AttributeError(f"Function '{func_name}' not found in '{repo_name}'")
+@dataclass(frozen=True)
+class FunctionStep:
+    function_path: str
+    repo_name: str
+    func: Callable
+    params: dict = field(default_factory=dict)
 
-            if "user_id" not in params:
-                params["user_id"] = self.message.chat.id
+    async def run(self, handler: "ScenarioHandler"):
+        params = dict(self.params)
+        if "user_id" not in params:
+            params["user_id"] = handler.message.chat.id
 
-            await func(**params)
-            logger.info(f"Executed function: {function_path} with {params}")
+        try:
+            await self.func(getattr(handler.repo, self.repo_name), **params)
+            logger.info(f"Executed function: {self.function_path} with {params}")
 
         except (ValueError, AttributeError, SQLAlchemyError) as e:
-            logger.exception(f"Error executing function {function_path}: {e}")
-            await self.message.answer(f"Error: {e}")
+            logger.exception(f"Error executing function {self.function_path}: {e}")
+            await handler.message.answer(f"Error: {e}")
         except Exception as e:
             logger.exception(f"Unexpected error: {e}")
-            await self.message.answer("An unexpected error occurred.")
+            await handler.message.answer("An unexpected error occurred.")
+
+
+@dataclass(frozen=True)
+class CompiledScenario:
+    """
+    Разобранный и проверенный сценарий диплинка, готовый к выполнению без повторного разбора.
+    """
+    deeplink_id: int
+    actions: tuple
+    callbacks: dict
+
+
+def _resolve_function(function_path: str):
+    repo_name, _, func_name = function_path.partition(".")
+    prop = getattr(RequestsRepo, repo_name, None)
+    if not isinstance(prop, property):
+        raise ScenarioError(f"Repository '{repo_name}' not found")
+
+    repo_cls = prop.fget.__annotations__.get("return")
+    func = getattr(repo_cls, func_name, None)
+    if not func_name or not callable(func):
+        raise ScenarioError(f"Function '{func_name}' not found in '{repo_name}'")
+    return repo_name, func
+
+
+def compile_step(name: str, params: dict):
+    """
+    Компилирует одно действие: отправку текста/медиа или вызов функции репозитория.
+    """
+    if not name:
+        raise ScenarioError("Action without a name")
+
+    if name == "send_text":
+        return TextStep(
+            text=_process_message(params.get("text", "Default Text Message")),
+            keyboard=make_keyboard(params.get("keyboard", [])),
+            update_keyboard=_compile_update_keyboard(params),
+        )
+
+    if name == "send_media_group":
+        return MediaGroupStep(media=tuple(
+            (item["type"], item["media"]) for item in params.get("media", [])
+        ))
+
+    if name.startswith("send_"):
+        answer_method = MEDIA_ANSWER_METHODS.get(name)
+        if not answer_method:
+            raise ScenarioError(f"No sender for media type: {name}")
+
+        media_content = params.get(name.split("_")[-1], {})
+        if not media_content.get("id") and not media_content.get("url"):
+            raise ScenarioError(f"Media for {name} has neither 'id' nor 'url'")
 
-    async def update_keyboard(self, update_params, sent_message):
-        if isinstance(update_params, dict):
-            new_keyboard_data = update_params.get("keyboard", [])
+        return MediaStep(
+            media_type=name,
+            answer_method=answer_method,
+            file_id=media_content.get("id"),
+            url=media_content.get("url"),
+            caption=_process_message(params.get("caption")),
+            keyboard=make_keyboard(params.get("keyboard", [])),
+            update_keyboard=_compile_update_keyboard(params),
+        )
+
+    repo_name, func = _resolve_function(name)
+    return FunctionStep(function_path=name, repo_name=repo_name, func=func, params=dict(params))
+
+
+def compile_callbacks(callbacks: dict) -> dict:
+    return {
+        callback_id: tuple(
+            compile_step(action.get("function_name"), action.get("params", {}))
+            for action in actions
+        )
+        for callback_id, actions in callbacks.items()
+    }
+
+
+def compile_scenario(deeplink_id: int, scenario) -> CompiledScenario:
+    """
+    Разбирает сценарий (JSON-строку или dict), проверяет его и заранее собирает клавиатуры
+    и ссылки на функции репозиториев.
+    """
+    raw = scenario if isinstance(scenario, str) else json.dumps(scenario, sort_keys=True)
+    data = json.loads(raw)
+
+    actions = []
+    for action in data.get("actions", []):
+        action_type = action.get("action")
+        params = action.get("params", {})
+
+        if action_type == "execute_function":
+            for func in params.get("functions", []):
+                actions.append(compile_step(func.get("function_name"), func.get("params", {})))
+        elif action_type and action_type.startswith("send_"):
+            actions.append(compile_step(action_type, params))
         else:
-            new_keyboard_data = update_params
+            logger.warning(f"Unknown action type: {action_type}")
+
+    return CompiledScenario(
+        deeplink_id=deeplink_id,
+        actions=tuple(actions),
+        callbacks=compile_callbacks(data.get("callbacks", {})),
+    )
+
+
+def parse_deeplink_id(value) -> Optional[int]:
+    """
+    ID диплинка из аргумента /start или состояния; None, если это не число.
+    """
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+async def load_scenario(repo: RequestsRepo, deeplink_id: Optional[int]) -> Optional[CompiledScenario]:
+    """
+    Возвращает скомпилированный сценарий из кэша, при промахе читает диплинк из базы и компилирует его.
+    Запись кэша хранит версию сценария (md5 в базе) и сверяется с ней одним коротким запросом,
+    поэтому правки из API или другого процесса видны сразу, а не через TTL.
+    Некорректный сценарий логируется и даёт None, как отсутствующий диплинк.
+    """
+    if deeplink_id is None:
+        return None
 
-        if not new_keyboard_data:
+    cache = repo.scenario_cache
+    if cache is not None:
+        cached = cache.get(deeplink_id)
+        if cached is not None:
+            version = await repo.deeplink.get_scenario_version(deeplink_id)
+            if version is None:
+                cache.invalidate(deeplink_id)
+                return None
+            cached_version, plan = cached
+            if version == cached_version:
+                return plan
+
+    row = await repo.deeplink.get_deeplink_with_version(deeplink_id)
+    if not row:
+        return None
+    deeplink, version = row
+
+    try:
+        plan = compile_scenario(deeplink.id, deeplink.scenario)
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        # ScenarioError и ошибки JSON - подклассы ValueError
+        logger.error(f"Deeplink {deeplink_id}: invalid scenario: {e!r}")
+        return None
+    if cache is not None:
+        cache.set(deeplink_id, (version, plan))
+    return plan
+
+
+class ScenarioHandler:
+    def __init__(self, message: Message, state: FSMContext, config, repo: RequestsRepo, params=None):
+        self.message = message
+        self.state = state
+        self.config = config
+        self.repo = repo
+        self.params = params or {}
+
+    async def handle_scenario(self, scenario: CompiledScenario):
+        await self.state.update_data(scenario_id=scenario.deeplink_id)  # ← Сохраняем в FSM только id сценария
+        await self.run_steps(scenario.actions)
+
+    async def run_steps(self, steps):
+        for step in steps:
+            await step.run(self)
+
+    async def update_keyboard(self, new_keyboard: Optional[InlineKeyboardMarkup], sent_message):
+        if not new_keyboard:
             try:
                 await sent_message.edit_reply_markup(reply_markup=None)
             except TelegramBadRequest as e:
                 logger.exception(f"Error while removing keyboard: {e}")
             return
 
-        new_keyboard = await build_keyboard(new_keyboard_data)
-
         try:
             if sent_message.content_type == 'text':
                 await sent_message.edit_text(
@@ -167,21 +339,20 @@ class ScenarioHandler:
         Обрабатывает callback_id по нажатию на кнопку.
         """
         data = await self.state.get_data()
-        self.callbacks = data.get("callbacks", {})  # ← Загружаем сохранённые callbacks
 
-        callback_actions = self.callbacks.get(callback_id)
-        if not callback_actions:
+        callbacks = {}
+        if data.get("scenario_id") is not None:
+            scenario = await load_scenario(self.repo, parse_deeplink_id(data["scenario_id"]))
+            if scenario:
+                callbacks = scenario.callbacks
+        elif data.get("callbacks"):
+            # Состояние, сохранённое до кэширования сценариев, хранит сами callbacks
+            callbacks = compile_callbacks(data["callbacks"])
+
+        callback_steps = callbacks.get(callback_id)
+        if not callback_steps:
             logger.warning(f"No callback actions for id {callback_id}")
             await self.message.answer("Произошла ошибка: действие не найдено.")
             return
 
-        for action in callback_actions:
-            function_name = action.get("function_name")
-            params = action.get("params", {})
-
-            if function_name == "send_text":
-                await self.handle_send_text(params)
-            elif function_name.startswith("send_"):
-                await self.handle_send_media(function_name, params)
-            else:
-                await self.execute_function(function_name, params)
+        await self.run_steps(callback_steps)
@@ -14,18 +14,24 @@ from aiogram.exceptions import TelegramBadRequest
 from tgbot.config import _process_message
 
 
+# Действие сценария -> метод Message, которым отправляется медиа
+MEDIA_ANSWER_METHODS = {
+    "send_video": "answer_video",
+    "send_audio": "answer_audio",
+    "send_document": "answer_document",
+    "send_photo": "answer_photo",
+    "send_voice": "answer_voice",
+    "send_video_note": "answer_video_note",
+    "send_sticker": "answer_sticker",
+}
+
+
 async def send_media(message, media_type: str, params: dict):
     """
     Универсальная отправка медиа и возврат отправленного сообщения для дальнейшего редактирования.
     """
     media_senders = {
-        "send_video": message.answer_video,
-        "send_audio": message.answer_audio,
-        "send_document": message.answer_document,
-        "send_photo": message.answer_photo,
-        "send_voice": message.answer_voice,
-        "send_video_note": message.answer_video_note,
-        "send_sticker": message.answer_sticker,
+        name: getattr(message, method) for name, method in MEDIA_ANSWER_METHODS.items()
     }
 
     if media_type == "send_media_group":
@@ -53,6 +59,13 @@ async def send_media(message, media_type: str, params: dict):
 
 
 async def build_keyboard(keyboard_data, state=None):
+    return make_keyboard(keyboard_data)
+
+
+def make_keyboard(keyboard_data):
+    """
+    Собирает InlineKeyboardMarkup из описания сценария или имени клавиатуры из tgbot.keyboards.inline.
+    """
     if not keyboard_data:
         return None
 
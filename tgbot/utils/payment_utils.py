@@ -1,51 +1,77 @@
+import asyncio
 import hashlib
-import json
+import hmac
 
-import requests
-from sqlalchemy.util import await_only
+from aiohttp import ClientError, ClientTimeout
 
-from infrastructure.database.models import Product
-from infrastructure.database.repo.requests import RequestsRepo
+from infrastructure.some_api.base import BaseClient
+from tgbot.services.catalog import ProductInfo
 
 
-class Payment:
-    def __init__(self, terminal_key: str, password: str, url: str = "https://securepay.tinkoff.ru"):
+class Payment(BaseClient):
+    """
+    Асинхронный клиент MAPI Тинькофф.
+
+    Один экземпляр на процесс: он держит пул соединений aiohttp до вызова close().
+    Каждый HTTP-запрос ограничен `timeout`, а весь вызов вместе с повторами — `deadline`.
+    Повторяется только GetState: повтор Init после таймаута мог бы создать второй платёж.
+    """
+
+    def __init__(self, terminal_key: str, password: str, url: str = "https://securepay.tinkoff.ru",
+                 timeout: float = 10, deadline: float = 20):
         self.terminal_key = terminal_key
         self.password = password
         self.url = url
-        self.payment_data = None
+        self.deadline = deadline
+        super().__init__(base_url=url, timeout=ClientTimeout(total=timeout, connect=5))
 
     def _generate_token(self, request_data: dict) -> str:
         """
         Генерирует токен для MAPI (приватный метод).
         """
-        filtered_data = {k: str(v) for k, v in request_data.items() if isinstance(v, (str, int, float))}
+        filtered_data = {
+            k: (str(v).lower() if isinstance(v, bool) else str(v))
+            for k, v in request_data.items()
+            if isinstance(v, (str, int, float)) and k != 'Token'
+        }
         filtered_data['Password'] = self.password
         sorted_items = sorted(filtered_data.items())
         concatenated_string = ''.join(value for _, value in sorted_items)
         return hashlib.sha256(concatenated_string.encode('utf-8')).hexdigest()
 
-    def _send_post_request(self, method: str, data: dict) -> dict:
+    def verify_notification(self, data: dict) -> bool:
+        """
+        Проверяет подпись и терминал HTTP-уведомления об оплате.
+        """
+        token = data.get('Token')
+        if not token or data.get('TerminalKey') != self.terminal_key:
+            return False
+        return hmac.compare_digest(str(token), self._generate_token(data))
+
+    async def _send_post_request(self, method: str, data: dict, retry: bool = True) -> dict:
         """
         Отправляет POST-запрос к API (приватный метод).
+        С retry=False запрос выполняется один раз, для неидемпотентных методов.
         """
-        full_url = f"{self.url}{method}"
         headers = {
             'Content-Type': 'application/json',
             'Accept': 'application/json'
         }
+        make_request = self._make_request if retry else self._make_request_once
         try:
-            response = requests.post(full_url, json=data, headers=headers)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            return {"error": str(e)}
-        except requests.exceptions.JSONDecodeError:
-            return {"error": "Invalid JSON response"}
+            _, response = await asyncio.wait_for(
+                make_request("POST", method, json=data, headers=headers),
+                self.deadline
+            )
+        except (ClientError, asyncio.TimeoutError) as e:
+            self.log.warning(f"{method} failed: {e!r}")
+            return {"error": str(e) or e.__class__.__name__}
+        return response
 
-    async def create_payment(self, order_id: str, description: str, email: str, product: Product, repo: RequestsRepo) -> dict:
+    async def create_payment(self, order_id: str, description: str, email: str, product: ProductInfo) -> dict:
         """
-        Создает новый платеж и сохраняет данные.
+        Создает новый платеж. Ссылка на оплату — в ответе, ключ PaymentURL, id платежа — PaymentId.
+        Ничего не пишет в базу: вызывающий сохраняет их в покупке отдельной короткой транзакцией.
         """
         receipt = {
             "Email": email,
@@ -68,22 +94,9 @@ class Payment:
             "Receipt": receipt
         }
         data['Token'] = self._generate_token(data)
-        response = self._send_post_request("/v2/Init", data)
+        return await self._send_post_request("/v2/Init", data, retry=False)
 
-
-        if response.get("Success"):
-            await repo.purchases.update_purchase(
-                int(order_id),
-                int(response.get("PaymentId")),
-                response.get('PaymentURL')
-            )
-            self.payment_data = response  # Сохранение данных платежа
-            with open("payment_data.json", "w") as f:
-                json.dump(response, f, indent=4)
-
-        return response
-
-    def get_payment_status(self, payment_id: str) -> bool:
+    async def get_payment_status(self, payment_id: str) -> bool:
         """
         Получает статус платежа и анализирует его.
         Возвращает True, если платеж успешен, иначе False.
@@ -93,16 +106,10 @@ class Payment:
             "PaymentId": payment_id
         }
         data['Token'] = self._generate_token(data)
-        response = self._send_post_request("/v2/GetState", data)
-
-        print(response)
+        response = await self._send_post_request("/v2/GetState", data)
 
         # Анализируем ответ API
         if response.get("Success") and response.get("ErrorCode") == "0":
             payment_status = response.get("Status", "")
             return payment_status == "CONFIRMED"
         return False
-
-    @property
-    def get_url(self):
-        return self.payment_data['PaymentURL']